@@ -1,108 +1,169 @@
-import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
-from collections import deque
-
-# Constants
-earth_radius = 60000
-moon_radius = 31200
-moon_distance = 384400
-orbital_period = 27.3 * 24 * 60 * 60  # seconds in one orbit
-
-fig, ax = plt.subplots()
-ax.set_aspect('equal', 'box')
-ax.set_xlim(-moon_distance - moon_radius - 10000, moon_distance + moon_radius + 10000)
-ax.set_ylim(-moon_distance - moon_radius - 8000, moon_distance + moon_radius + 10000)
-ax.set_xlabel('Distance (km)', color='white')
-ax.set_ylabel('Distance (km)', color='white')
-ax.set_title('Moon Orbit', color='white')
-fig.set_facecolor('#000015')
-ax.set_facecolor('#000015')
-ax.tick_params(axis='x', colors='white')
-ax.tick_params(axis='y', colors='white')
-
-# Earth glow layers
-for i in range(1, 6):
-    glow = plt.Circle(
-        (0, 0),
-        earth_radius + i * 3000,
-        color='#ADD8E6',
-        alpha=0.05 * (6 - i),
-        zorder=2
-    )
-    ax.add_patch(glow)
-
-earth_circle = plt.Circle((0, 0), earth_radius, color='#ADD8E6', label='Earth', zorder=3)
-ax.add_patch(earth_circle)
-
-moon_circle = plt.Circle((moon_distance, 0), moon_radius, color='#F6F1D5', label='Moon', zorder=4)
-ax.add_patch(moon_circle)
-
-moon_trail, = ax.plot([], [], color='white', alpha=1, linewidth=2.5, zorder=1)
-
-# Orbit path (static)
-orbit_theta = np.linspace(0, 2 * np.pi, 300)
-orbit_x = moon_distance * np.cos(orbit_theta)
-orbit_y = moon_distance * np.sin(orbit_theta)
-moon_orbit, = ax.plot(orbit_x, orbit_y, color='darkgray', linestyle='--', label='Moon Orbit', zorder=0)
-
-# Moon glow layers
-moon_glow_layers = []
-for i in range(1, 6):
-    glow = plt.Circle(
-        (moon_distance, 0),
-        moon_radius + i * 3000,
-        color='#F6F1D5',
-        alpha=0.05 * (6 - i),
-        zorder=3
-    )
-    moon_glow_layers.append(glow)
-    ax.add_patch(glow)
-
-# Use deque for trail
-trail_length = 80
-trail_points_x = deque(maxlen=trail_length)
-trail_points_y = deque(maxlen=trail_length)
-
-speed_multiplier = 2000  # slower for smoother movement
-interval = 10  # milliseconds between frames (increase smoothness)
-
-def frame_generator():
-    i = 0
-    while True:
-        yield i
-        i += 1
-
-def init():
-    moon_trail.set_data([], [])
-    for glow in moon_glow_layers:
-        glow.set_center((moon_distance, 0))
-    moon_circle.set_center((moon_distance, 0))
-    return [moon_circle, moon_trail, *moon_glow_layers]
-
-def update(frame):
-    angle = 2 * np.pi * ((frame * speed_multiplier) % orbital_period) / orbital_period
-    moon_x = moon_distance * np.cos(angle)
-    moon_y = moon_distance * np.sin(angle)
-
-    moon_circle.set_center((moon_x, moon_y))
-
-    trail_points_x.append(moon_x)
-    trail_points_y.append(moon_y)
-    moon_trail.set_data(trail_points_x, trail_points_y)
-
-    for glow in moon_glow_layers:
-        glow.set_center((moon_x, moon_y))
-
-    return [moon_circle, moon_trail, *moon_glow_layers]
-
-ani = FuncAnimation(
-    fig, update,
-    frames=frame_generator(),
-    init_func=init,
-    interval=interval,
-    blit=True,
-    cache_frame_data=False  # <-- This suppresses the warning for infinite frames
-)
-
-plt.show()
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from nbody.kepler import propagate
+from nbody.trail import Trail
+from nbody.trajectory import write_trajectory
+
+# Constants
+G = 6.6743e-20  # km^3 kg^-1 s^-2
+M_earth = 5.972e24
+M_moon = 7.348e22
+mu = G * (M_earth + M_moon)  # km^3 / s^2
+earth_radius = 60000
+moon_radius = 31200
+
+# Moon's orbital elements (km, radians), drawn face-on in its own orbital plane
+moon_distance = 384400  # semi-major axis
+eccentricity = 0.0549
+moon_elements = (moon_distance, eccentricity, 0.0, 0.0, 0.0, 0.0)  # (a, e, inc, node, argp, M0): starts at perigee
+orbital_period = 2 * np.pi * np.sqrt(moon_distance ** 3 / mu)  # about 27.3 days
+apogee = moon_distance * (1 + eccentricity)
+
+# Ring-buffer trail (see nbody.trail)
+trail_length = 80
+
+speed_multiplier = 2000  # slower for smoother movement
+interval = 10  # milliseconds between frames (increase smoothness)
+
+def moon_state(t):
+    """Moon position (km) and velocity (km/s) relative to Earth at time t (seconds), from Kepler's equation.
+
+    t may be an array of any shape; pos and vel get a trailing axis of 3.
+    """
+    return propagate(moon_elements, mu, t)
+
+def moon_position(t):
+    """Moon (x, y) in km at time t (seconds); t may be an array."""
+    pos, _ = moon_state(t)
+    return pos[..., 0], pos[..., 1]
+
+def run(steps, dt=speed_multiplier, path=None):
+    """Evaluate the orbit headless (no figure) and return (t, pos, vel) for Earth and Moon.
+
+    pos and vel have shape (steps + 1, 2, 2) in km and km/s, Earth first. With path, the
+    trajectory is also written to that file and returned memory-mapped.
+    """
+    t = np.arange(steps + 1) * dt
+    moon_pos, moon_vel = moon_state(t)
+
+    pos = np.zeros((steps + 1, 2, 2))
+    vel = np.zeros((steps + 1, 2, 2))
+    pos[:, 1] = moon_pos[:, :2]
+    vel[:, 1] = moon_vel[:, :2]
+    if path is not None:
+        return write_trajectory(path, ["earth", "moon"], [M_earth, M_moon], dt, t, pos, vel,
+                                integrator="analytic", units="km")
+    return t, pos, vel
+
+def export_style():
+    """How nbody.export draws this run (see that module for the keys)."""
+    return {
+        "names": ["earth", "moon"],
+        "colors": ['#ADD8E6', '#F6F1D5'],
+        "radii": [earth_radius, moon_radius],
+        "trail_length": [0, trail_length],
+        "limits": (-apogee - moon_radius - 10000, apogee + moon_radius + 10000,
+                   -apogee - moon_radius - 8000, apogee + moon_radius + 10000),
+        "title": "Moon Orbit",
+        "facecolor": '#000015',
+    }
+
+def frame_generator():
+    i = 0
+    while True:
+        yield i
+        i += 1
+
+def main():
+    import matplotlib.pyplot as plt
+    from matplotlib.animation import FuncAnimation
+
+    fig, ax = plt.subplots()
+    ax.set_aspect('equal', 'box')
+    ax.set_xlim(-apogee - moon_radius - 10000, apogee + moon_radius + 10000)
+    ax.set_ylim(-apogee - moon_radius - 8000, apogee + moon_radius + 10000)
+    ax.set_xlabel('Distance (km)', color='white')
+    ax.set_ylabel('Distance (km)', color='white')
+    ax.set_title('Moon Orbit', color='white')
+    fig.set_facecolor('#000015')
+    ax.set_facecolor('#000015')
+    ax.tick_params(axis='x', colors='white')
+    ax.tick_params(axis='y', colors='white')
+
+    # Earth glow layers
+    for i in range(1, 6):
+        glow = plt.Circle(
+            (0, 0),
+            earth_radius + i * 3000,
+            color='#ADD8E6',
+            alpha=0.05 * (6 - i),
+            zorder=2
+        )
+        ax.add_patch(glow)
+
+    earth_circle = plt.Circle((0, 0), earth_radius, color='#ADD8E6', label='Earth', zorder=3)
+    ax.add_patch(earth_circle)
+
+    start = moon_position(0)
+    moon_circle = plt.Circle(start, moon_radius, color='#F6F1D5', label='Moon', zorder=4)
+    ax.add_patch(moon_circle)
+
+    moon_trail, = ax.plot([], [], color='white', alpha=1, linewidth=2.5, zorder=1)
+
+    # Orbit path (static)
+    orbit_x, orbit_y = moon_position(np.linspace(0, orbital_period, 300))
+    moon_orbit, = ax.plot(orbit_x, orbit_y, color='darkgray', linestyle='--', label='Moon Orbit', zorder=0)
+
+    # Moon glow layers
+    moon_glow_layers = []
+    for i in range(1, 6):
+        glow = plt.Circle(
+            start,
+            moon_radius + i * 3000,
+            color='#F6F1D5',
+            alpha=0.05 * (6 - i),
+            zorder=3
+        )
+        moon_glow_layers.append(glow)
+        ax.add_patch(glow)
+
+    trail = Trail(trail_length)
+
+    def init():
+        moon_trail.set_data([], [])
+        for glow in moon_glow_layers:
+            glow.set_center(start)
+        moon_circle.set_center(start)
+        return [moon_circle, moon_trail, *moon_glow_layers]
+
+    def update(frame):
+        moon_x, moon_y = moon_position(frame * speed_multiplier)
+
+        moon_circle.set_center((moon_x, moon_y))
+
+        trail.append((moon_x, moon_y))
+        moon_trail.set_data(*trail.data)
+
+        for glow in moon_glow_layers:
+            glow.set_center((moon_x, moon_y))
+
+        return [moon_circle, moon_trail, *moon_glow_layers]
+
+    ani = FuncAnimation(
+        fig, update,
+        frames=frame_generator(),
+        init_func=init,
+        interval=interval,
+        blit=True,
+        cache_frame_data=False  # <-- This suppresses the warning for infinite frames
+    )
+
+    plt.show()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,28 @@
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
+import os
+import sys
+
 import numpy as np
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from nbody import G, Body, System, get_integrator, integrate
+from nbody.diagnostics import Diagnostics
+from nbody.kepler import propagate, state_to_elements
+from nbody.profiling import Profiler
+from nbody.render import FramePacer, decimate, use_font
+from nbody.trail import Trail
+from nbody.trajectory import TrajectoryWriter
+
 lim = 32 * 1.496e11
 zoom = False
-
-plt.rcParams['font.family'] = 'cambria'
-fig, ax = plt.subplots()
-ax.set_aspect('equal')
-fig.set_facecolor('#010b19')
-ax.set_facecolor('#010b19')
+save_path = None  # Set to a file name to keep the animated run (open it with nbody.trajectory.Trajectory)
+substeps = 1  # Physics steps per drawn frame; trails keep every step and cover trail_length frames
+target_fps = None  # e.g. 30: adapt the steps per frame to the measured draw time instead
+integrator = "verlet"  # Any name in nbody.INTEGRATORS; "wisdom_holman" matches Verlet's accuracy at ~64x the dt
+diagnostics_every = None  # e.g. 100: print the energy, momentum and angular momentum drift every this many steps
+profile = None  # "phases": time forces, steps, trails, artists and blits and print a report at the end; "sample": also sample the stack
 
 # -- Constants -- #
-dt = 86400
+dt = 86400  # Step with zoom on; the whole system takes steps ten times longer (see time_step)
 planet_data = {
     "sun":      [1.989e30,     [0.0, 0.0],           [0.0, 0.0]],
     "mercury":  [3.301e23,     [5.79e10, 0.0],       [0.0, 47890.0]],
@@ -48,102 +58,195 @@ planet_sizes = {
     "neptune": 6      # 3.9x Earth
 }
 
-if not zoom:
-    ax.set_xlim(-lim, lim)
-    ax.set_ylim(-lim, lim)
-    ax.set_title("Solar System (time = 10 days)", color='white')
-    planet_sizes.update({"sun":1})
-    dt = 864000
-else:
-    ax.set_xlim(-lim / 10, lim / 10)
-    ax.set_ylim(-lim / 10, lim / 10)
-    del planet_data["jupiter"], planet_data["saturn"], planet_data["uranus"], planet_data["neptune"]
-    ax.set_title("Inner Planets (time = 1 day)", color='white')
-
-class Planet:
-    def __init__(self, name, mass, pos, vel):
-        self.name = name
-        self.mass = mass
-        self.pos = np.array(pos, dtype=float)
-        self.velocity = np.array(vel, dtype=float)
-        self.acceleration = np.zeros(2)
-
-planets = []
-
-
-
-for name, (mass, pos, vel) in planet_data.items():
-    planet = Planet(name, mass, pos, vel)
-    planets.append(planet)
-    color = planet_colors.get(name, "white")
-    size = planet_sizes.get(name, 4)
-    planet.color = color
-    planet.marker, = ax.plot([], [], 'o', color=color, markersize=size)
-    planet.trail, = ax.plot([], [], '-', lw=0.7, color=color, alpha=0.6)
-    planet.trail_x = []
-    planet.trail_y = []
-
-    # Assign trail length per planet
-    if name in {"mercury", "venus", "earth", "mars"}:
-        planet.trail_length = 250
+inner_planets = {"mercury", "venus", "earth", "mars"}
+
+# Read zoom when called, so it can be switched on the imported module (see nbody.scenarios)
+def time_step():
+    """The step of a run: dt zoomed in on the inner planets, ten days for the whole system."""
+    return dt if zoom else 10 * dt
+
+def planets_in_view():
+    """planet_data, without the outer planets when zoomed in."""
+    if not zoom:
+        return planet_data
+    return {name: entry for name, entry in planet_data.items() if name == "sun" or name in inner_planets}
+
+def planet_size(name):
+    """Marker size; the Sun shrinks to a dot when the whole system is in view."""
+    return 1 if name == "sun" and not zoom else planet_sizes.get(name, 4)
+
+class Planet(Body):
+    """A planet is a view onto one row of the shared System arrays."""
+
+def make_system():
+    system = System.from_dict(planets_in_view())
+    system.compute_acceleration()
+    return system
+
+def kepler_preview(t):
+    """Positions (..., N, 2) at times t (seconds) with no integration: each planet follows the
+    Kepler orbit around the Sun through its starting state, ignoring the other planets."""
+    data = planets_in_view()
+    names = list(data)
+    sun = data["sun"]
+    planets = [name for name in names if name != "sun"]
+    mu = G * (sun[0] + np.array([data[name][0] for name in planets]))
+    pos = np.array([data[name][1] for name in planets]) - sun[1]
+    vel = np.array([data[name][2] for name in planets]) - sun[2]
+    orbit, _ = propagate(state_to_elements(pos, vel, mu), mu, t)
+
+    preview = np.zeros(np.shape(t) + (len(names), 2))
+    preview[...] = sun[1] + np.multiply.outer(t, sun[2])[..., np.newaxis, :]
+    preview[..., [names.index(name) for name in planets], :] += orbit[..., :2]
+    return preview
+
+def make_stepper(system):
+    """The step function named by integrator. Wisdom-Holman moves each planet on its exact
+    Kepler orbit around the Sun and applies only the planet-planet pulls as kicks."""
+    if integrator == "wisdom_holman":
+        return get_integrator(integrator, central=system.index("sun"))
+    return get_integrator(integrator)
+
+def run(steps, dt=None, path=None, checkpoint=None):
+    """Integrate headless (no figure) and return (t, pos, vel) arrays of shape (steps + 1, N, 2).
+
+    dt defaults to time_step(). With path, the trajectory is streamed to that file and returned
+    memory-mapped instead. With checkpoint (an nbody.checkpoint.Checkpointer), a preempted run
+    picks up from its last checkpoint and only the remaining steps are integrated.
+    """
+    dt = time_step() if dt is None else dt
+    system = make_system()
+    frames = None  # trajectory frames already written, for a resumed run
+    if checkpoint is not None:
+        steps -= checkpoint.resume(system)
+        frames = checkpoint.frames
+    step = make_stepper(system)
+    writer = None if path is None else TrajectoryWriter.for_system(path, system, dt, step=step, resume=frames)
+    profiler = make_profiler()
+    profiler.instrument(system)
+    result = integrate(system, steps, dt, step=step, writer=writer, checkpoint=checkpoint, monitor=make_diagnostics(),
+                       profiler=profiler)
+    profiler.stop()
+    if profiler.enabled:
+        print(profiler.report())
+    return result
+
+def make_diagnostics():
+    """Conservation diagnostics printed every diagnostics_every steps, or None when they are off."""
+    return None if diagnostics_every is None else Diagnostics(diagnostics_every, log=print)
+
+def make_profiler():
+    """Profiler for the profile setting; when profile is None it is switched off and costs nothing."""
+    if profile not in (None, "phases", "sample"):
+        raise ValueError("Unknown profile %r, expected None, 'phases' or 'sample'" % (profile,))
+    return Profiler(sample_interval=0.005 if profile == "sample" else None, enabled=profile is not None)
+
+def export_style():
+    """How nbody.export draws this run (see that module for the keys)."""
+    names = list(planets_in_view())
+    half = lim if not zoom else lim / 10
+    return {
+        "names": names,
+        "colors": [planet_colors.get(name, "white") for name in names],
+        "sizes": [planet_size(name) for name in names],
+        "trail_length": [250 if name in inner_planets else 700 for name in names],
+        "limits": (-half, half, -half, half),
+        "title": "Solar System (time = 10 days)" if not zoom else "Inner Planets (time = 1 day)",
+        "facecolor": '#010b19',
+    }
+
+def main():
+    import matplotlib.pyplot as plt
+    from matplotlib.animation import FuncAnimation
+
+    use_font('cambria')
+    fig, ax = plt.subplots()
+    ax.set_aspect('equal')
+    fig.set_facecolor('#010b19')
+    ax.set_facecolor('#010b19')
+
+    if not zoom:
+        ax.set_xlim(-lim, lim)
+        ax.set_ylim(-lim, lim)
+        ax.set_title("Solar System (time = 10 days)", color='white')
     else:
-        planet.trail_length = 700
-
-def init():
-    for p in planets:
-        p.marker.set_data([p.pos[0]], [p.pos[1]])
-    return [p.marker for p in planets]
-
-
-def compute_acceleration(planets):
-    G = 6.67430e-11
-
-    for p in planets:
-        total_acceleration = np.zeros(2)
-
-        for other in planets:
-            if p is other:
-                continue
-
-            r = other.pos - p.pos
-            dist = np.linalg.norm(r)
-            if dist == 0:
-                continue
-
-            force_dir = r / dist
-            acc = G * other.mass / dist ** 2
-            total_acceleration += acc * force_dir
-        p.acceleration = total_acceleration
-
-
-# noinspection SpellCheckingInspection
-def velocity_verlet_step(planets, dt):
-
-    for p in planets:
-        p.pos += p.velocity * dt + 0.5 * p.acceleration * dt ** 2
-
-    old_accelerations = [p.acceleration.copy() for p in planets]
-    compute_acceleration(planets)
-
-    for p, a_old in zip(planets, old_accelerations):
-        p.velocity += 0.5 * (a_old + p.acceleration) * dt
-
-compute_acceleration(planets)
-
-def update(frame):
-    velocity_verlet_step(planets, dt)
-
-    for p in planets:
-        p.marker.set_data([p.pos[0]], [p.pos[1]])
-        p.trail_x.append(p.pos[0])
-        p.trail_y.append(p.pos[1])
-        if len(p.trail_x) > p.trail_length:
-            p.trail_x.pop(0)
-            p.trail_y.pop(0)
-        p.trail.set_data(p.trail_x, p.trail_y)
-    return [p.marker for p in planets] + [p.trail for p in planets]
-
-
-
-ani = FuncAnimation(fig, update, init_func=init, frames=1000, interval=15, blit=True)
-plt.show()
+        ax.set_xlim(-lim / 10, lim / 10)
+        ax.set_ylim(-lim / 10, lim / 10)
+        ax.set_title("Inner Planets (time = 1 day)", color='white')
+
+    dt = time_step()
+    system = make_system()
+    planets = system.bodies(Planet)
+    step = make_stepper(system)
+    writer = None
+    if save_path:
+        writer = TrajectoryWriter.for_system(save_path, system, dt, step=step)
+        writer.append(system.t, system.pos, system.vel)
+    diagnostics = make_diagnostics()
+    if diagnostics:
+        diagnostics(system)
+    profiler = make_profiler().start()
+    profiler.instrument(system)
+    profiler.instrument_figure(fig)
+
+    for planet in planets:
+        name = planet.name
+        color = planet_colors.get(name, "white")
+        size = planet_size(name)
+        planet.color = color
+        planet.marker, = ax.plot([], [], 'o', color=color, markersize=size)
+        planet.trail, = ax.plot([], [], '-', lw=0.7, color=color, alpha=0.6)
+
+        # Assign trail length per planet
+        if name in inner_planets:
+            planet.trail_length = 250
+        else:
+            planet.trail_length = 700
+
+    # One ring buffer holds every planet's trail at full resolution; each planet plots
+    # trail_length points decimated from its newest trail_length frames. With target_fps the
+    # steps per frame change as the run goes, so the buffer grows to match (up to a fixed size)
+    max_trail = max(p.trail_length for p in planets)
+    trails = Trail(max_trail * substeps, dim=system.dim, bodies=len(planets))
+    pacer = FramePacer(substeps, target_fps)
+
+    def advance():
+        with profiler.phase("step"):
+            step(system, dt)
+        system.t += dt
+        if writer:
+            with profiler.phase("record"):
+                writer.append(system.t, system.pos, system.vel)
+        if diagnostics:
+            with profiler.phase("monitor"):
+                diagnostics(system)
+        with profiler.phase("trails"):
+            trails.append(system.pos)
+
+    def init():
+        for p in planets:
+            p.marker.set_data([p.pos[0]], [p.pos[1]])
+        return [p.marker for p in planets]
+
+    def update(frame):
+        with profiler.phase("physics"):
+            pacer.run(advance)
+            trails.reserve(max_trail * pacer.substeps)
+
+        with profiler.phase("artists"):
+            for p in planets:
+                p.marker.set_data([p.pos[0]], [p.pos[1]])
+                p.trail.set_data(*decimate(trails.body(p.index, p.trail_length * pacer.substeps), p.trail_length))
+        return [p.marker for p in planets] + [p.trail for p in planets]
+
+    ani = FuncAnimation(fig, profiler.timed("update", update), init_func=init, frames=1000, interval=15, blit=True)
+    plt.show()
+    profiler.stop()
+    if writer:
+        writer.close()
+    if profiler.enabled:
+        print(profiler.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,96 +1,174 @@
-import matplotlib.pyplot as plt
-import numpy as np
-from matplotlib.animation import FuncAnimation
-
-# -- Constants -- #
-G = 6.67430e-11
-dt = 3600  # 1 hour
-M_sun = 1.989e30
-M_earth = 5.972e24
-M_moon = 7.348e22
-AU = 1.496e11
-r_earth_sun = AU
-r_moon_earth = 3.84e8
-
-# Simulation duration
-total_days = 365
-num_frames = int((total_days * 24 * 3600) / dt)
-
-# Initial orbital speeds
-v_earth = np.sqrt(G * M_sun / r_earth_sun)
-v_moon = np.sqrt(G * M_earth / r_moon_earth)
-
-# Toggle zoom on Earth
-zoom_on_earth = True  # Set to False to view the full Sun-Earth-Moon system
-
-# -- Plot setup -- #
-fig, ax = plt.subplots()
-ax.set_aspect('equal')
-fig.set_facecolor('black')
-ax.set_facecolor('black')
-ax.set_title("Sun-Earth-Moon System", color='white')
-ax.tick_params(colors='white')
-for spine in ax.spines.values():
-    spine.set_edgecolor('white')
-
-# Initial axis limits
-if not zoom_on_earth:
-    ax.set_xlim(-1.25 * AU, 1.25 * AU)
-    ax.set_ylim(-1.25 * AU, 1.25 * AU)
-
-# Celestial bodies
-earth_dot, = ax.plot([], [], 'bo', markersize=8, label='Earth')
-moon_dot, = ax.plot([], [], 'wo', markersize=4, label='Moon')
-sun_dot, = ax.plot(0, 0, 'yo', markersize=12, label='Sun')
-
-# Initial positions
-pos_sun = np.array([0.0, 0.0])
-pos_earth = np.array([r_earth_sun, 0.0])
-pos_moon = pos_earth + np.array([0.0, r_moon_earth])
-
-# Initial velocities
-vel_earth = np.array([0.0, v_earth])
-vel_moon = vel_earth + np.array([v_moon, 0.0])  # Orbiting Earth
-
-def init():
-    earth_dot.set_data([], [])
-    moon_dot.set_data([], [])
-    return earth_dot, moon_dot, sun_dot
-
-def update(frame):
-    global pos_earth, vel_earth, pos_moon, vel_moon
-
-    # Forces
-    r_es = pos_earth - pos_sun
-    f_earth = -G * M_sun * M_earth / np.linalg.norm(r_es)**3 * r_es
-
-    r_me = pos_moon - pos_earth
-    f_moon_from_earth = -G * M_earth * M_moon / np.linalg.norm(r_me)**3 * r_me
-
-    r_ms = pos_moon - pos_sun
-    f_moon_from_sun = -G * M_sun * M_moon / np.linalg.norm(r_ms)**3 * r_ms
-
-    # Accelerations
-    a_earth = f_earth / M_earth
-    a_moon = (f_moon_from_earth + f_moon_from_sun) / M_moon
-
-    # Euler update
-    vel_earth += a_earth * dt
-    vel_moon += a_moon * dt
-    pos_earth += vel_earth * dt
-    pos_moon += vel_moon * dt
-
-    # Dynamic zoom if toggled on
-    if zoom_on_earth:
-        ax.set_xlim(pos_earth[0] - 1e9, pos_earth[0] + 1e9)
-        ax.set_ylim(pos_earth[1] - 1e9, pos_earth[1] + 1e9)
-
-    # Set positions
-    earth_dot.set_data([pos_earth[0]], [pos_earth[1]])
-    moon_dot.set_data([pos_moon[0]], [pos_moon[1]])
-    return earth_dot, moon_dot, sun_dot
-
-# Animate
-ani = FuncAnimation(fig, update, init_func=init, frames=num_frames, interval=15, blit=True)
-ax.legend(facecolor='black', labelcolor='white', loc='upper left')
-plt.show()
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from nbody import System, get_integrator, integrate
+from nbody.ensemble import random_perturbations, run_ensemble
+from nbody.render import FramePacer
+from nbody.trajectory import TrajectoryWriter
+
+# -- Constants -- #
+G = 6.67430e-11
+dt = 3600  # 1 hour
+M_sun = 1.989e30
+M_earth = 5.972e24
+M_moon = 7.348e22
+AU = 1.496e11
+r_earth_sun = AU
+r_moon_earth = 3.84e8
+
+# Simulation duration
+total_days = 365
+num_frames = int((total_days * 24 * 3600) / dt)
+
+# Initial orbital speeds
+v_earth = np.sqrt(G * M_sun / r_earth_sun)
+v_moon = np.sqrt(G * M_earth / r_moon_earth)
+
+# Playback: physics steps per drawn frame, or a frame rate to hold by adapting them
+substeps = 1  # e.g. 24 draws one frame per simulated day
+target_fps = None
+
+# Integration scheme, any name in nbody.INTEGRATORS (e.g. "verlet" or "yoshida4")
+integrator = "euler"
+
+# Toggle zoom on Earth
+zoom_on_earth = True  # Set to False to view the full Sun-Earth-Moon system
+
+# Initial positions
+pos_sun = np.array([0.0, 0.0])
+pos_earth = np.array([r_earth_sun, 0.0])
+pos_moon = pos_earth + np.array([0.0, r_moon_earth])
+
+# Initial velocities
+vel_sun = np.array([0.0, 0.0])
+vel_earth = np.array([0.0, v_earth])
+vel_moon = vel_earth + np.array([v_moon, 0.0])  # Orbiting Earth
+
+# Who pulls on whom: row = body feeling the force, column = body pulling.
+# The Sun is held fixed, the Earth only feels the Sun, and the Moon feels both.
+interactions = np.array([
+    # sun    earth  moon
+    [False, False, False],  # sun
+    [True,  False, False],  # earth
+    [True,  True,  False],  # moon
+])
+
+def make_system():
+    system = System(
+        ["sun", "earth", "moon"],
+        [M_sun, M_earth, M_moon],
+        [pos_sun, pos_earth, pos_moon],
+        [vel_sun, vel_earth, vel_moon],
+        G=G,
+        interactions=interactions,
+    )
+    system.compute_acceleration()  # Verlet-type schemes start from the cached forces
+    return system
+
+def run(steps=num_frames, dt=dt, path=None, checkpoint=None):
+    """Integrate headless (no figure) and return (t, pos, vel) arrays of shape (steps + 1, 3, 2).
+
+    With path, the trajectory is streamed to that file and returned memory-mapped instead.
+    checkpoint (an nbody.checkpoint.Checkpointer) resumes from, and keeps saving to, its file.
+    """
+    system = make_system()
+    frames = None  # trajectory frames already written, for a resumed run
+    if checkpoint is not None:
+        steps -= checkpoint.resume(system)
+        frames = checkpoint.frames
+    step = get_integrator(integrator)
+    writer = None if path is None else TrajectoryWriter.for_system(path, system, dt, step=step, resume=frames)
+    return integrate(system, steps, dt, step=step, writer=writer, checkpoint=checkpoint)
+
+def ensemble(members=1000, moon_offset=1e3, moon_kick=1e-2, steps=num_frames, dt=dt,
+             processes=None, seed=0):
+    """Sensitivity to initial conditions: start the Moon within moon_offset metres and moon_kick m/s
+    of its nominal state and integrate every member across a process pool.
+
+    Returns the dict from nbody.ensemble.run_ensemble, with per-member divergence from the
+    nominal run (sampled every 24 steps) and Lyapunov exponent estimates.
+    """
+    system = make_system()
+    pos, vel = random_perturbations(system, members, moon_offset, moon_kick, bodies=["moon"], seed=seed)
+    return run_ensemble(system, pos, vel, steps, dt, step=get_integrator(integrator), record_every=24, processes=processes)
+
+def export_style():
+    """How nbody.export draws this run (see that module for the keys)."""
+    style = {
+        "names": ["sun", "earth", "moon"],
+        "colors": ["yellow", "blue", "white"],
+        "sizes": [12, 8, 4],
+        "title": "Sun-Earth-Moon System",
+        "facecolor": "black",
+    }
+    if zoom_on_earth:
+        style["follow"] = (1, 1e9)
+    else:
+        style["limits"] = (-1.25 * AU, 1.25 * AU, -1.25 * AU, 1.25 * AU)
+    return style
+
+def main():
+    import matplotlib.pyplot as plt
+    from matplotlib.animation import FuncAnimation
+
+    system = make_system()
+    sun, earth, moon = system.bodies()
+
+    # -- Plot setup -- #
+    fig, ax = plt.subplots()
+    ax.set_aspect('equal')
+    fig.set_facecolor('black')
+    ax.set_facecolor('black')
+    ax.set_title("Sun-Earth-Moon System", color='white')
+    ax.tick_params(colors='white')
+    for spine in ax.spines.values():
+        spine.set_edgecolor('white')
+
+    # Initial axis limits
+    if not zoom_on_earth:
+        ax.set_xlim(-1.25 * AU, 1.25 * AU)
+        ax.set_ylim(-1.25 * AU, 1.25 * AU)
+
+    # Celestial bodies
+    earth_dot, = ax.plot([], [], 'bo', markersize=8, label='Earth')
+    moon_dot, = ax.plot([], [], 'wo', markersize=4, label='Moon')
+    sun_dot, = ax.plot(0, 0, 'yo', markersize=12, label='Sun')
+
+    def init():
+        earth_dot.set_data([], [])
+        moon_dot.set_data([], [])
+        return earth_dot, moon_dot, sun_dot
+
+    pacer = FramePacer(substeps, target_fps)
+    step = get_integrator(integrator)
+
+    def advance():
+        step(system, dt)
+        system.t += dt
+
+    def update(frame):
+        # Forces and integration, as many steps as this frame gets
+        pacer.run(advance, limit=num_frames - pacer.steps)
+
+        # Dynamic zoom if toggled on
+        if zoom_on_earth:
+            ax.set_xlim(earth.pos[0] - 1e9, earth.pos[0] + 1e9)
+            ax.set_ylim(earth.pos[1] - 1e9, earth.pos[1] + 1e9)
+
+        # Set positions
+        earth_dot.set_data([earth.pos[0]], [earth.pos[1]])
+        moon_dot.set_data([moon.pos[0]], [moon.pos[1]])
+        return earth_dot, moon_dot, sun_dot
+
+    # Animate
+    ani = FuncAnimation(fig, update, init_func=init, frames=pacer.frames_until(num_frames), interval=15, blit=True,
+                        cache_frame_data=False)
+    ax.legend(facecolor='black', labelcolor='white', loc='upper left')
+    plt.show()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,268 +1,507 @@
-import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
-from matplotlib.patches import Circle
-
-# =========================
-# PHYSICAL CONSTANTS
-# =========================
-G = 6.6743e-11         # Gravitational constant (m^3 kg^-1 s^-2)
-c = 299792458          # Speed of light (m/s)
-R_ns = 12000           # Approximate radius of a neutron star (m)
-m1 = 2.78e30           # Mass of neutron star 1 (kg)
-m2 = 2.78e30           # Mass of neutron star 2 (kg)
-
-# Derived quantities
-init_dist = 1e5        # Initial separation (m)
-M = m1 + m2            # Total mass
-mu = (m1 * m2) / M     # Reduced mass
-eta = mu / M           # Symmetric mass ratio
-
-# =========================
-# SIMULATION PARAMETERS
-# =========================
-lim = init_dist * 1  # Initial plot limit
-merger_triggered = False
-explosion_frame = 0
-
-# Orbital parameters
-v = 0.98 * np.sqrt(G * M / init_dist) * m2 / M  # Initial orbital speed (reduced)
-T = np.pi * init_dist / v                       # Orbital period
-dt = (T / 1000) * 25                           # Timestep
-
-# =========================
-# VISUAL PARAMETERS
-# =========================
-start_color         = np.array([1.0, 1.0, 1.0])  # Merger start (white)
-end_color           = np.array([0.9, 0.2, 0.2])  # Merger end (red)
-start_ejecta_color  = np.array([1.0, 0.27, 0.0]) # Hot ejecta (orange)
-end_ejecta_color    = np.array([1.0, 0.41, 0.71])# Cooler ejecta (pink)
-
-# =========================
-# INITIAL CONDITIONS
-# =========================
-r1 = np.array([-init_dist / 2, 0], dtype=float)
-r2 = np.array([ init_dist / 2, 0], dtype=float)
-v1 = np.array([0,  v], dtype=float)
-v2 = np.array([0, -v], dtype=float)
-
-trail1_x, trail1_y = [], []
-trail2_x, trail2_y = [], []
-
-# =========================
-# EJECTA INITIALIZATION
-# =========================
-Num_ejecta = 150
-ejecta_positions = []
-ejecta_velocities = []
-
-# =========================
-# PLOTTING SETUP
-# =========================
-fig, ax = plt.subplots()
-ax.set_aspect('equal')
-ax.set_xlim(-lim, lim)
-ax.set_ylim(-lim, lim)
-fig.set_facecolor('#010b19')
-ax.set_facecolor('#010b19')
-ax.set_title("Kilonova Simulation", color='white')
-ax.tick_params(axis='x', colors='#010b19')
-ax.tick_params(axis='y', colors='#010b19')
-
-# Plot: static features
-plt.rcParams['font.family'] = 'Franklin Gothic Book'
-plt.scatter([0], [0], color='white', marker='x', label="Center of Mass")
-
-# Plot: dynamic features
-pos1_dot, = ax.plot([], [], 'o', color='#703be7', ms=17, label='Star 1', zorder=2)
-pos2_dot, = ax.plot([], [], 'o', color='#703be7', ms=17, label='Star 2', zorder=2)
-trail1_line, = ax.plot([], [], '-', color='r', lw=0.75, zorder=1)
-trail2_line, = ax.plot([], [], '-', color='w', lw=0.75, zorder=1)
-ejecta_scatter = ax.scatter([], [], s=5, alpha=0.8, zorder=2)
-
-# Merger visuals
-merger = Circle((0, 0), 1, visible=False, zorder=3)
-shockwave = Circle((0, 0), radius=1, fc='none', ec='white', lw=1.5, alpha=0.5, visible=False)
-ax.add_patch(merger)
-ax.add_patch(shockwave)
-
-# Glowing effect behind stars
-glow1_dot, = ax.plot([], [], 'o', color='#703be7', ms=30, alpha=0.15, zorder=1)
-glow2_dot, = ax.plot([], [], 'o', color='#703be7', ms=30, alpha=0.15, zorder=1)
-
-# White borderlines
-for spine in ax.spines.values():
-    spine.set_color('white')
-
-# =========================
-# PHYSICS CALCULATIONS
-# =========================
-def relative_vectors(r1, r2, v1, v2):
-    r_vec = r2 - r1
-    v_vec = v2 - v1
-    r = np.linalg.norm(r_vec)
-    v = np.linalg.norm(v_vec)
-    n_hat = r_vec / r
-    return r, v, n_hat, r_vec, v_vec
-
-def acceleration_newton(r, n_hat):
-    return - (G * M) / r**2 * n_hat
-
-def acceleration_1PN(r, v, n_hat, v_vec):
-    v_dot_n = np.dot(v_vec, n_hat)
-    term1 = (1 + 3 * eta) * v**2
-    term2 = -2 * (2 + eta) * (G * M / r)
-    term3 = -1.5 * eta * v_dot_n**2
-    return - (G * M) / r**2 * (n_hat * (term1 + term2 + term3) - 2 * (2 - eta) * v_dot_n * v_vec) / c**2
-
-def acceleration_2_5PN(r, v, n_hat, v_vec):
-    v_dot_n = np.dot(v_vec, n_hat)
-    coeff = (8/5) * eta * G**2 * M**2 / (c**5 * r**3)
-    return coeff * (n_hat * v_dot_n * (18 * v**2 + (2/3) * (G * M / r) - 25 * v_dot_n**2)
-                    - v_vec * (6 * v**2 - 2 * (G * M / r) - 15 * v_dot_n**2))
-
-def compute_accelerations(r1, r2, v1, v2):
-    r, v, n_hat, r_vec, v_vec = relative_vectors(r1, r2, v1, v2)
-    a_newton = acceleration_newton(r, n_hat)
-    a_1pn = acceleration_1PN(r, v, n_hat, v_vec)
-    a_2_5pn = acceleration_2_5PN(r, v, n_hat, v_vec)
-    a_total = a_newton + a_1pn + a_2_5pn
-    a1 = -(m2 / M) * a_total
-    a2 =  (m1 / M) * a_total
-    return a1, a2
-
-def rk4_step(r1, r2, v1, v2, dt):
-    """4th order Runge-Kutta integrator with post-Newtonian corrections."""
-    global merger_triggered
-
-    if np.linalg.norm(r2 - r1) < 2 * R_ns:
-        merger_triggered = True
-        return r1, r2, v1, v2
-
-    a1_k1, a2_k1 = compute_accelerations(r1, r2, v1, v2)
-    r1_k2 = r1 + 0.5 * dt * v1
-    r2_k2 = r2 + 0.5 * dt * v2
-    v1_k2 = v1 + 0.5 * dt * a1_k1
-    v2_k2 = v2 + 0.5 * dt * a2_k1
-    a1_k2, a2_k2 = compute_accelerations(r1_k2, r2_k2, v1_k2, v2_k2)
-
-    r1_k3 = r1 + 0.5 * dt * v1_k2
-    r2_k3 = r2 + 0.5 * dt * v2_k2
-    v1_k3 = v1 + 0.5 * dt * a1_k2
-    v2_k3 = v2 + 0.5 * dt * a2_k2
-    a1_k3, a2_k3 = compute_accelerations(r1_k3, r2_k3, v1_k3, v2_k3)
-
-    r1_k4 = r1 + dt * v1_k3
-    r2_k4 = r2 + dt * v2_k3
-    v1_k4 = v1 + dt * a1_k3
-    v2_k4 = v2 + dt * a2_k3
-    a1_k4, a2_k4 = compute_accelerations(r1_k4, r2_k4, v1_k4, v2_k4)
-
-    r1_new = r1 + (dt / 6) * (v1 + 2 * v1_k2 + 2 * v1_k3 + v1_k4)
-    r2_new = r2 + (dt / 6) * (v2 + 2 * v2_k2 + 2 * v2_k3 + v2_k4)
-    v1_new = v1 + (dt / 6) * (a1_k1 + 2 * a1_k2 + 2 * a1_k3 + a1_k4)
-    v2_new = v2 + (dt / 6) * (a2_k1 + 2 * a2_k2 + 2 * a2_k3 + a2_k4)
-    return r1_new, r2_new, v1_new, v2_new
-
-# =========================
-# ANIMATION FUNCTIONS
-# =========================
-def init():
-    pos1_dot.set_data([], [])
-    pos2_dot.set_data([], [])
-    trail1_line.set_data([], [])
-    trail2_line.set_data([], [])
-    merger.set_visible(False)
-    ejecta_scatter.set_offsets(np.empty((0, 2)))
-    ejecta_scatter.set_alpha(0.0)
-    glow1_dot.set_data([], [])
-    glow2_dot.set_data([], [])
-    return pos1_dot, pos2_dot, trail1_line, trail2_line, ejecta_scatter, glow1_dot, glow2_dot
-
-def update(frame):
-    global r1, r2, v1, v2, explosion_frame
-
-    r1, r2, v1, v2 = rk4_step(r1, r2, v1, v2, dt)
-
-    if merger_triggered:
-        pos1_dot.set_data([], [])
-        pos2_dot.set_data([], [])
-        trail1_line.set_data([], [])
-        trail2_line.set_data([], [])
-        glow1_dot.set_data([], [])
-        glow2_dot.set_data([], [])
-
-        merger.set_visible(True)
-        merger.set_radius(400000 * np.sqrt(explosion_frame + 1))
-
-        t = min(explosion_frame / 50, 1.0)
-        merger.set_facecolor((1 - t) * start_color + t * end_color)
-        merger.set_alpha(1.0 - t)
-
-        shockwave.set_visible(True)
-        shockwave.set_radius(300000 * np.sqrt(explosion_frame + 1))
-        shockwave.set_alpha(max(0.0, 1.0 - explosion_frame / 100))
-
-        if explosion_frame == 0:
-            ax.set_xlim(-lim * 30, lim * 30)
-            ax.set_ylim(-lim * 30, lim * 30)
-            ejecta_positions.clear()
-            ejecta_velocities.clear()
-            v_eq, v_pol = 0.05 * c, 0.2 * c
-
-            for _ in range(Num_ejecta):
-                angle = np.random.uniform(0, 2 * np.pi)
-                v_theta = v_eq + (v_pol - v_eq) * np.cos(angle)**2
-                vx, vy = v_theta * np.cos(angle), v_theta * np.sin(angle)
-                ejecta_velocities.append(np.array([vx, vy]))
-                ejecta_positions.append(np.array([0.0, 0.0]))
-
-        for i in range(Num_ejecta):
-            ejecta_positions[i] += ejecta_velocities[i] * (dt * 4)
-
-        ejecta_scatter.set_offsets(np.array(ejecta_positions))
-
-        t = min(explosion_frame / 100, 1.0)
-        current_color = (1 - t) * start_ejecta_color + t * end_ejecta_color
-        ejecta_scatter.set_facecolor(np.tile(current_color, (Num_ejecta, 1)))
-        ejecta_scatter.set_alpha(max(0.0, 1.0 - explosion_frame / 100))
-
-        explosion_frame += 1
-        if explosion_frame > 100:
-            ani.event_source.stop()
-
-        return merger, trail1_line, trail2_line, ejecta_scatter, glow1_dot, glow2_dot, shockwave
-
-    # Binary still orbiting
-    trail1_x.append(r1[0])
-    trail1_y.append(r1[1])
-    trail2_x.append(r2[0])
-    trail2_y.append(r2[1])
-    if len(trail1_x) > 50:
-        trail1_x.pop(0)
-        trail1_y.pop(0)
-        trail2_x.pop(0)
-        trail2_y.pop(0)
-
-    pos1_dot.set_data([r1[0]], [r1[1]])
-    pos2_dot.set_data([r2[0]], [r2[1]])
-    trail1_line.set_data(trail1_x, trail1_y)
-    trail2_line.set_data(trail2_x, trail2_y)
-    glow1_dot.set_data([r1[0]], [r1[1]])
-    glow2_dot.set_data([r2[0]], [r2[1]])
-
-    return pos1_dot, pos2_dot, trail1_line, trail2_line, merger, glow1_dot, glow2_dot, ejecta_scatter
-
-# =========================
-# ANIMATION LAUNCH
-# =========================
-ani = FuncAnimation(
-    fig,
-    update,
-    init_func=init,
-    frames=5000,
-    interval=15,
-    blit=True
-)
-
-plt.show()
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from nbody import System, get_integrator, integrate, integrate_batch, pn
+from nbody.kernels import binary_acceleration, binary_rk4_step
+from nbody.checkpoint import Checkpointer
+from nbody.gw import StrainRecorder
+from nbody.particles import Particles, anisotropic_velocities
+from nbody.perturbations import FirstPostNewtonian, Newtonian, Perturbations, RadiationReaction
+from nbody.render import FramePacer, decimate, use_font
+from nbody.trail import Trail
+from nbody.trajectory import TrajectoryWriter
+
+# =========================
+# PHYSICAL CONSTANTS
+# =========================
+G = 6.6743e-11         # Gravitational constant (m^3 kg^-1 s^-2)
+c = 299792458          # Speed of light (m/s)
+R_ns = 12000           # Approximate radius of a neutron star (m)
+m1 = 2.78e30           # Mass of neutron star 1 (kg)
+m2 = 2.78e30           # Mass of neutron star 2 (kg)
+init_dist = 1e5        # Initial separation (m)
+
+# =========================
+# SIMULATION PARAMETERS
+# =========================
+merger_triggered = False
+explosion_frame = 0
+checkpoint_path = None  # Save the animation here every 100 frames and resume from it on the next launch
+substeps = 1           # Integration steps per drawn frame during the inspiral
+integrator = "rk4"     # "rk4" (compiled), or "rk45"/"dop853" to adapt sub-steps within dt near merger
+pn_terms = ("1pn", "2.5pn")  # Corrections on top of Newtonian gravity: drop "2.5pn" for a binary that never merges
+period_fraction = None # e.g. 0.01: each step covers this fraction of the current orbit instead of dt
+start_separation = None  # e.g. 5e5 (500 km): start circular here and skip analytically (Peters) to init_dist
+target_fps = None      # e.g. 30: adapt the steps per frame to the measured draw time instead
+trail_length = 50      # Frames of trail behind each star
+gw_sample_rate = 4096  # Gravitational-wave strain samples per second (Hz)
+gw_distance = 1.23e24  # Observer distance (m), 40 Mpc as for GW170817
+gw_inclination = 0.0   # Observer angle from the orbital axis (radians); 0 is face-on
+
+# =========================
+# VISUAL PARAMETERS
+# =========================
+start_color         = np.array([1.0, 1.0, 1.0])  # Merger start (white)
+end_color           = np.array([0.9, 0.2, 0.2])  # Merger end (red)
+start_ejecta_color  = np.array([1.0, 0.27, 0.0]) # Hot ejecta (orange)
+end_ejecta_color    = np.array([1.0, 0.41, 0.71])# Cooler ejecta (pink)
+polar_ejecta_color  = np.array([0.55, 0.75, 1.0])# Fast polar ejecta (blue)
+
+trails = None  # Every step of both stars' recent path, a Trail made by main
+
+# =========================
+# EJECTA INITIALIZATION
+# =========================
+Num_ejecta = 150          # Up to ~10^6; above density_threshold they are drawn as a density map
+ejecta_dim = 3            # 3: ejecta fill a sphere, seen projected onto the orbital plane; 2: a ring
+density_threshold = 20000 # Particle count above which a scatter plot is too slow to redraw
+ejecta_bins = 400         # Resolution of the density map
+ejecta = Particles(ejecta_dim, capacity=Num_ejecta)
+ejecta_seed = 0
+rng = np.random.default_rng(ejecta_seed)  # Ejecta directions; its state is saved in checkpoints
+
+# =========================
+# PHYSICS CALCULATIONS
+# =========================
+# Newtonian + 1PN + 2.5PN terms live in nbody.pn; nbody.kernels compiles them with Numba when available.
+# Other choices of pn_terms are summed from the nbody.perturbations plugins instead.
+def make_forces():
+    """Newtonian gravity plus the pn_terms, as one nbody.perturbations pipeline."""
+    unknown = set(pn_terms) - {"1pn", "2.5pn"}
+    if unknown:
+        raise ValueError("Unknown pn_terms %s, expected any of '1pn' and '2.5pn'" % sorted(unknown))
+    plugins = {"1pn": FirstPostNewtonian(c), "2.5pn": RadiationReaction(c)}
+    return Perturbations(Newtonian(), *(plugins[term] for term in ("1pn", "2.5pn") if term in pn_terms))
+
+def full_pn():
+    """True when pn_terms asks for every term, which the compiled kernels evaluate in one pass."""
+    return set(pn_terms) == {"1pn", "2.5pn"}
+
+class Binary(System):
+    """Two neutron stars whose accelerations include the post-Newtonian corrections in pn_terms."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.forces = None if full_pn() else make_forces()
+
+    def acceleration(self, pos, vel=None, targets=None):
+        if self.forces is None:
+            acc = binary_acceleration(pos, vel, G, self.mass[..., 0], self.mass[..., 1], c)
+        else:
+            acc = self.forces.binary(pos, vel, self.mass, G, self.t)
+        return acc if targets is None else acc[..., targets, :]
+
+def rk4_step(system, dt):
+    """4th order Runge-Kutta integrator with post-Newtonian corrections (one binary or a batch)."""
+    system.pos[...], system.vel[...] = binary_rk4_step(system.pos, system.vel, dt, G,
+                                                       system.mass[..., 0], system.mass[..., 1], c)
+
+def make_stepper():
+    """The step function named by integrator; the PN forces depend on velocity, so use a Runge-Kutta scheme.
+
+    "rk4" uses the compiled step only for the full pn_terms; other terms take the generic RK4.
+    """
+    make_forces()  # reject unknown pn_terms before the run starts
+    if integrator == "rk4":
+        return rk4_step if full_pn() else get_integrator("rk4")
+    return get_integrator(integrator)
+
+def orbital_timestep(system):
+    """period_fraction of the current orbital period, so steps shrink as the stars spiral in."""
+    r = np.linalg.norm(system.pos[..., 1, :] - system.pos[..., 0, :], axis=-1)
+    M = system.mass[..., 0] + system.mass[..., 1]
+    return float(np.min(period_fraction * 2 * np.pi * np.sqrt(r ** 3 / (G * M))))
+
+def fast_forward(system, separation):
+    """Carry a circular binary along the Peters (1964) inspiral down to separation without integrating.
+
+    The stars are rotated by the orbital phase swept on the way, given the 1PN circular speed
+    plus the inspiral's radial drift, and system.t advances by the time skipped, which is returned.
+    """
+    star1, star2 = system.mass
+    total = star1 + star2
+    r_vec = system.pos[1] - system.pos[0]
+    v_vec = system.vel[1] - system.vel[0]
+    elapsed, phase = pn.peters_inspiral(np.linalg.norm(r_vec), separation, G, star1, star2, c)
+
+    sense = np.sign(r_vec[0] * v_vec[1] - r_vec[1] * v_vec[0])
+    angle = np.arctan2(r_vec[1], r_vec[0]) + sense * phase
+    radial = np.array([np.cos(angle), np.sin(angle)])
+    along = sense * np.array([-np.sin(angle), np.cos(angle)])
+    omega = pn.circular_angular_velocity(separation, G, star1, star2, c)
+    drift = -pn.peters_rate(G, star1, star2, c) / separation ** 3
+    rel_pos = separation * radial
+    rel_vel = drift * radial + omega * separation * along
+
+    com_vel = (star1 * system.vel[0] + star2 * system.vel[1]) / total
+    com = (star1 * system.pos[0] + star2 * system.pos[1]) / total + com_vel * elapsed
+    system.pos[0], system.pos[1] = com - star2 / total * rel_pos, com + star1 / total * rel_pos
+    system.vel[0], system.vel[1] = com_vel - star2 / total * rel_vel, com_vel + star1 / total * rel_vel
+    system.t += elapsed
+    system.compute_acceleration()
+    return elapsed
+
+def ejecta_colors(vel, v_eq, v_pol):
+    """Per-particle starting colour: slow equatorial ejecta orange, fast polar ejecta blue."""
+    speed = np.linalg.norm(vel, axis=-1, keepdims=True)
+    s = np.clip((speed - v_eq) / (v_pol - v_eq), 0, 1)
+    return (1 - s) * start_ejecta_color + s * polar_ejecta_color
+
+def spawn_ejecta():
+    """Launch Num_ejecta particles from the centre of mass, faster towards the poles (the x axis)."""
+    global ejecta
+    v_eq, v_pol = 0.05 * c, 0.2 * c
+    vel = anisotropic_velocities(rng, Num_ejecta, v_eq, v_pol, dim=ejecta_dim, axis=0)
+    ejecta = Particles(ejecta_dim, capacity=Num_ejecta)
+    ejecta.spawn(0.0, vel, ejecta_colors(vel, v_eq, v_pol))
+
+def has_merged(system):
+    """True once the stars touch; one flag per member for a batched system."""
+    return system.geometry().dist[..., 0] < 2 * R_ns  # the one pair, shared with the potential energy
+
+# The settings are read when these are called, so they can be changed on the imported module
+# (see nbody.scenarios); None stands for the setting of the same name
+def _setting(value, name):
+    return globals()[name] if value is None else value
+
+def time_step():
+    """Step of the inspiral: 1/40 of the starting orbit's period."""
+    M = m1 + m2
+    v = 0.98 * np.sqrt(G * M / init_dist) * m2 / M  # Initial orbital speed (reduced)
+    T = np.pi * init_dist / v                       # Orbital period
+    return (T / 1000) * 25
+
+def initial_state(m1=None, m2=None, init_dist=None, speed=0.98):
+    """Positions and velocities of shape (..., 2, 2) for binaries starting on the x axis.
+
+    Every argument broadcasts, so arrays give one binary per combination. speed is the
+    fraction of the circular relative speed: below 1 the stars start at apocentre of an
+    orbit with eccentricity 1 - speed**2.
+    """
+    m1, m2, init_dist = _setting(m1, "m1"), _setting(m2, "m2"), _setting(init_dist, "init_dist")
+    m1, m2, init_dist, speed = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (m1, m2, init_dist, speed)))
+    M = m1 + m2
+    v_rel = speed * np.sqrt(G * M / init_dist)
+    pos = np.zeros(M.shape + (2, 2))
+    vel = np.zeros(M.shape + (2, 2))
+    pos[..., 0, 0] = -init_dist * m2 / M
+    pos[..., 1, 0] = init_dist * m1 / M
+    vel[..., 0, 1] = v_rel * m2 / M
+    vel[..., 1, 1] = -v_rel * m1 / M
+    return pos, vel
+
+def make_system():
+    if start_separation is None:
+        pos, vel = initial_state(m1, m2, init_dist)
+        return Binary(["star 1", "star 2"], [m1, m2], pos, vel, G=G)
+    pos, vel = initial_state(m1, m2, start_separation, speed=1.0)
+    system = Binary(["star 1", "star 2"], [m1, m2], pos, vel, G=G)
+    fast_forward(system, init_dist)
+    return system
+
+def run(steps=5000, dt=None, path=None, checkpoint=None):
+    """Integrate the inspiral headless (no figure) until merger or the step limit.
+
+    Returns (t, pos, vel) arrays of shape (records, 2, 2); the last record is the merged state.
+    dt defaults to time_step(); with period_fraction set, it is ignored and each step follows
+    the shrinking orbit instead.
+    With path, the trajectory is streamed to that file and returned memory-mapped instead.
+    checkpoint (an nbody.checkpoint.Checkpointer) resumes from, and keeps saving to, its file.
+    """
+    dt = time_step() if dt is None else dt
+    system = make_system()
+    frames = None  # trajectory frames already written, for a resumed run
+    if checkpoint is not None:
+        steps -= checkpoint.resume(system)
+        frames = checkpoint.frames
+    step = make_stepper()
+    if period_fraction is not None:
+        dt = orbital_timestep
+    writer = None
+    if path is not None:
+        writer = TrajectoryWriter.for_system(path, system, None if callable(dt) else dt, step=step, resume=frames,
+                                             c=c, R_ns=R_ns)
+    return integrate(system, steps, dt, step=step, stop=has_merged, writer=writer, checkpoint=checkpoint)
+
+def binary_batch(m1, m2, init_dist, speed):
+    """One batch member per binary of initial_state(m1, m2, init_dist, speed), all starting at t = 0.
+
+    The batch steps every member with one fixed dt, so period_fraction is refused, and it starts
+    at init_dist itself: start_separation and its fast-forward do not apply.
+    """
+    if period_fraction is not None:
+        raise ValueError("A batch steps every binary with one fixed dt; set period_fraction = None")
+    pos, vel = initial_state(m1, m2, init_dist, speed)
+    masses = np.stack(np.broadcast_arrays(np.asarray(m1, dtype=float), np.asarray(m2, dtype=float)), axis=-1)
+    masses = np.broadcast_to(masses, pos.shape[:-1]).reshape(-1, 2)
+    pos, vel = pos.reshape(-1, 2, 2), vel.reshape(-1, 2, 2)
+    return Binary(["star 1", "star 2"], masses[0], pos[0], vel[0], G=G).batch(pos, vel, mass=masses)
+
+def sweep(m1=None, m2=None, init_dist=None, speed=0.98, steps=5000, dt=None, record_every=1):
+    """Integrate a whole grid of binaries in one batched pass (arguments as in initial_state).
+
+    Each binary stops at its own merger. Every member shares the same dt (by default
+    time_step()), so keep the sweep to separations whose orbits it resolves. Returns
+    (t, pos, vel, t_merge) with pos and vel of shape (records, M, 2, 2) and t_merge NaN for
+    binaries still inspiralling at the end. The times count from the start of the sweep (see
+    binary_batch).
+    """
+    m1, m2, init_dist = _setting(m1, "m1"), _setting(m2, "m2"), _setting(init_dist, "init_dist")
+    dt = time_step() if dt is None else dt
+    system = binary_batch(m1, m2, init_dist, speed)
+    t, pos, vel, t_end = integrate_batch(system, steps, dt, step=make_stepper(), record_every=record_every,
+                                         stop=has_merged)
+    merged = np.linalg.norm(pos[-1, :, 1] - pos[-1, :, 0], axis=-1) < 2 * R_ns
+    return t, pos, vel, np.where(merged, t_end, np.nan)
+
+def waveform(steps=5000, duration=None, sample_rate=None, distance=None, inclination=None):
+    """Integrate to merger and return the strain (t, h_plus, h_cross) sampled at sample_rate.
+
+    The strain is computed in-stream from the relative orbit and no trajectory is kept.
+    sample_rate, distance and inclination default to the gw_* settings.
+    duration sizes the output buffer; it defaults to steps * dt, or with period_fraction set
+    to twice the Peters merger time of the starting orbit.
+    """
+    sample_rate = _setting(sample_rate, "gw_sample_rate")
+    distance, inclination = _setting(distance, "gw_distance"), _setting(inclination, "gw_inclination")
+    dt = time_step()
+    system = make_system()
+    step_dt = dt if period_fraction is None else orbital_timestep
+    if duration is None and period_fraction is None:
+        duration = steps * dt
+    elif duration is None:
+        separation = np.linalg.norm(system.pos[1] - system.pos[0])
+        duration = 2 * pn.peters_merger_time(separation, G, m1, m2, c)
+    recorder = StrainRecorder(sample_rate, duration, c, distance, inclination, t0=system.t)
+    integrate(system, steps, step_dt, step=make_stepper(), record_every=steps, stop=has_merged, monitor=recorder)
+    return recorder.series()
+
+def templates(m1=None, m2=None, init_dist=None, speed=0.98, steps=5000, dt=None, sample_rate=None,
+              distance=None, inclination=None):
+    """Strain templates for a grid of binaries in one batched pass (arguments as in sweep).
+
+    Returns (t, h_plus, h_cross, t_merge) with the strains of shape (samples, M). Only the
+    strain is kept, so thousands of mass combinations fit in memory; each template is zero
+    after its merger. The samples count from the start of the templates (see binary_batch).
+    """
+    m1, m2, init_dist = _setting(m1, "m1"), _setting(m2, "m2"), _setting(init_dist, "init_dist")
+    sample_rate = _setting(sample_rate, "gw_sample_rate")
+    distance, inclination = _setting(distance, "gw_distance"), _setting(inclination, "gw_inclination")
+    dt = time_step() if dt is None else dt
+    system = binary_batch(m1, m2, init_dist, speed)
+    recorder = StrainRecorder(sample_rate, steps * dt, c, distance, inclination, members=len(system.pos),
+                              t0=system.t)
+    t, pos, vel, t_end = integrate_batch(system, steps, dt, step=make_stepper(), record_every=steps,
+                                         stop=has_merged, monitor=recorder)
+    merged = np.linalg.norm(pos[-1, :, 1] - pos[-1, :, 0], axis=-1) < 2 * R_ns
+    return recorder.series() + (np.where(merged, t_end, np.nan),)
+
+def export_style():
+    """How nbody.export draws the inspiral (see that module for the keys)."""
+    return {
+        "names": ["star 1", "star 2"],
+        "colors": ['#703be7', '#703be7'],
+        "sizes": [17, 17],
+        "trail_length": trail_length,
+        "limits": (-init_dist, init_dist, -init_dist, init_dist),
+        "title": "Kilonova Simulation",
+        "facecolor": '#010b19',
+    }
+
+def animation_state():
+    """Everything the animation keeps outside the System, as arrays for a checkpoint."""
+    return {
+        "merger_triggered": merger_triggered,
+        "explosion_frame": explosion_frame,
+        "ejecta_positions": ejecta.pos,
+        "ejecta_velocities": ejecta.vel,
+        "ejecta_colors": ejecta.color,
+        "trails": trails.data,
+    }
+
+def restore_animation(state):
+    global merger_triggered, explosion_frame, ejecta
+    merger_triggered = bool(state["merger_triggered"])
+    explosion_frame = int(state["explosion_frame"])
+    pos = state["ejecta_positions"]
+    ejecta = Particles(pos.shape[1], capacity=len(pos))
+    ejecta.spawn(pos, state["ejecta_velocities"], state["ejecta_colors"])
+    trails.clear()
+    trails.reserve(state["trails"].shape[-1])
+    trails.extend(state["trails"])
+
+def main():
+    global trails
+    import matplotlib.pyplot as plt
+    from matplotlib.animation import FuncAnimation
+    from matplotlib.patches import Circle
+
+    lim = init_dist  # Initial plot limit
+    dt = time_step()
+    trails = Trail(trail_length * substeps, dim=2, bodies=2)
+
+    # =========================
+    # PLOTTING SETUP
+    # =========================
+    fig, ax = plt.subplots()
+    ax.set_aspect('equal')
+    ax.set_xlim(-lim, lim)
+    ax.set_ylim(-lim, lim)
+    fig.set_facecolor('#010b19')
+    ax.set_facecolor('#010b19')
+    ax.set_title("Kilonova Simulation", color='white')
+    ax.tick_params(axis='x', colors='#010b19')
+    ax.tick_params(axis='y', colors='#010b19')
+
+    # Plot: static features
+    use_font('Franklin Gothic Book')
+    plt.scatter([0], [0], color='white', marker='x', label="Center of Mass")
+
+    # Plot: dynamic features
+    pos1_dot, = ax.plot([], [], 'o', color='#703be7', ms=17, label='Star 1', zorder=2)
+    pos2_dot, = ax.plot([], [], 'o', color='#703be7', ms=17, label='Star 2', zorder=2)
+    trail1_line, = ax.plot([], [], '-', color='r', lw=0.75, zorder=1)
+    trail2_line, = ax.plot([], [], '-', color='w', lw=0.75, zorder=1)
+    ejecta_scatter = ax.scatter([], [], s=5, alpha=0.8, zorder=2)
+    ejecta_extent = (-lim * 30, lim * 30, -lim * 30, lim * 30)
+    ejecta_image = ax.imshow(np.zeros((1, 1, 4)), extent=ejecta_extent, origin='lower',
+                             interpolation='nearest', zorder=2, visible=False)
+
+    # Merger visuals
+    merger = Circle((0, 0), 1, visible=False, zorder=3)
+    shockwave = Circle((0, 0), radius=1, fc='none', ec='white', lw=1.5, alpha=0.5, visible=False)
+    ax.add_patch(merger)
+    ax.add_patch(shockwave)
+
+    # Glowing effect behind stars
+    glow1_dot, = ax.plot([], [], 'o', color='#703be7', ms=30, alpha=0.15, zorder=1)
+    glow2_dot, = ax.plot([], [], 'o', color='#703be7', ms=30, alpha=0.15, zorder=1)
+
+    # White borderlines
+    for spine in ax.spines.values():
+        spine.set_color('white')
+
+    system = make_system()
+    checkpoint = None
+    if checkpoint_path:
+        checkpoint = Checkpointer(checkpoint_path, every_steps=100, rng=rng, extra=animation_state)
+        if checkpoint.resume(system):
+            restore_animation(checkpoint.restored["extra"])
+            if explosion_frame > 0:
+                ax.set_xlim(-lim * 30, lim * 30)
+                ax.set_ylim(-lim * 30, lim * 30)
+
+    # =========================
+    # ANIMATION FUNCTIONS
+    # =========================
+    def init():
+        pos1_dot.set_data([], [])
+        pos2_dot.set_data([], [])
+        trail1_line.set_data([], [])
+        trail2_line.set_data([], [])
+        merger.set_visible(False)
+        ejecta_scatter.set_offsets(np.empty((0, 2)))
+        ejecta_scatter.set_alpha(0.0)
+        glow1_dot.set_data([], [])
+        glow2_dot.set_data([], [])
+        return pos1_dot, pos2_dot, trail1_line, trail2_line, ejecta_scatter, glow1_dot, glow2_dot
+
+    def draw_ejecta(t, alpha):
+        if len(ejecta) > density_threshold:
+            rgba = ejecta.image(ejecta_extent, ejecta_bins, alpha=alpha)
+            rgba[..., :3] = (1 - t) * rgba[..., :3] + t * end_ejecta_color
+            ejecta_image.set_data(rgba)
+            ejecta_image.set_visible(True)
+        else:
+            ejecta_scatter.set_offsets(ejecta.pos[:, :2])
+            ejecta_scatter.set_facecolor((1 - t) * ejecta.color + t * end_ejecta_color)
+            ejecta_scatter.set_alpha(alpha)
+
+    pacer = FramePacer(substeps, target_fps)
+    step = make_stepper()
+    if checkpoint:
+        checkpoint.track(step)
+
+    def advance():
+        global merger_triggered
+        if has_merged(system):
+            merger_triggered = True
+            return True
+        h = dt if period_fraction is None else orbital_timestep(system)
+        step(system, h)
+        system.t += h
+        trails.append(system.pos)
+
+    def update(frame):
+        global merger_triggered, explosion_frame
+        if checkpoint:
+            checkpoint(system)
+
+        if not merger_triggered:
+            pacer.run(advance)
+            trails.reserve(trail_length * pacer.substeps)  # target_fps may have raised the steps per frame
+        r1, r2 = system.pos
+
+        if merger_triggered:
+            pos1_dot.set_data([], [])
+            pos2_dot.set_data([], [])
+            trail1_line.set_data([], [])
+            trail2_line.set_data([], [])
+            glow1_dot.set_data([], [])
+            glow2_dot.set_data([], [])
+
+            merger.set_visible(True)
+            merger.set_radius(400000 * np.sqrt(explosion_frame + 1))
+
+            t = min(explosion_frame / 50, 1.0)
+            merger.set_facecolor((1 - t) * start_color + t * end_color)
+            merger.set_alpha(1.0 - t)
+
+            shockwave.set_visible(True)
+            shockwave.set_radius(300000 * np.sqrt(explosion_frame + 1))
+            shockwave.set_alpha(max(0.0, 1.0 - explosion_frame / 100))
+
+            if explosion_frame == 0:
+                ax.set_xlim(-lim * 30, lim * 30)
+                ax.set_ylim(-lim * 30, lim * 30)
+                spawn_ejecta()
+
+            ejecta.advance(dt * 4)
+            draw_ejecta(min(explosion_frame / 100, 1.0), max(0.0, 1.0 - explosion_frame / 100))
+
+            explosion_frame += 1
+            if explosion_frame > 100:
+                ani.event_source.stop()
+
+            return merger, trail1_line, trail2_line, ejecta_scatter, ejecta_image, glow1_dot, glow2_dot, shockwave
+
+        # Binary still orbiting
+        pos1_dot.set_data([r1[0]], [r1[1]])
+        pos2_dot.set_data([r2[0]], [r2[1]])
+        trail1_line.set_data(*decimate(trails.body(0, trail_length * pacer.substeps), trail_length))
+        trail2_line.set_data(*decimate(trails.body(1, trail_length * pacer.substeps), trail_length))
+        glow1_dot.set_data([r1[0]], [r1[1]])
+        glow2_dot.set_data([r2[0]], [r2[1]])
+
+        return pos1_dot, pos2_dot, trail1_line, trail2_line, merger, glow1_dot, glow2_dot, ejecta_scatter
+
+    # =========================
+    # ANIMATION LAUNCH
+    # =========================
+    ani = FuncAnimation(
+        fig,
+        update,
+        init_func=init,
+        frames=5000,
+        interval=15,
+        blit=True
+    )
+
+    plt.show()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,21 @@
-import matplotlib.pyplot as plt
+import os
+import sys
+
 import numpy as np
-from matplotlib.animation import FuncAnimation
-from moon_dictionary import *
+from moon_dictionary import jupiter_data, moon_alpha, moon_colors, moon_sizes, orbital_params
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from nbody import G, System, get_integrator, integrate, pairwise_acceleration, tree_acceleration
+from nbody.diagnostics import Diagnostics
+from nbody.encounters import Collisions
+from nbody.system import pairwise_potential
+from nbody.blocksteps import BlockTimestepper, dynamical_timestep
+from nbody.kepler import propagate
+from nbody.perturbations import Frame, Perturbations, SolarTide, Zonal
+from nbody.profiling import Profiler
+from nbody.render import FramePacer, decimate, use_font
+from nbody.trail import Trail
+from nbody.trajectory import TrajectoryWriter
 # ===================================
 # CHANGE FOR VIEWING DIFFERENT GROUPS
 # ===================================
@@ -13,34 +27,56 @@ VIEW_INNER = False
 # =========================
 # CONSTANTS
 # =========================
-lim = 4e4 if VIEW_INNER else 4e6
+lim = None  # Half-width of the animated view; main starts it from the selected group
 render_speed = 1.03
-dt = 10 #--- Default Time Step
-inner_dt = 0.01 #--- Innermost Moons fly off if not small enough
-w1 = 1 / (2 - 2 ** (1/3))
-w2 = - (2 ** (1/3)) / ( 2- 2 ** (1/3))
+ETA = 0.05 #--- Each body steps by this fraction of its own orbital time scale
+MAX_LEVEL = 8 #--- Finest step allowed is dt / 2 ** MAX_LEVEL, so a frame takes at most 2 ** MAX_LEVEL sub-steps
 R_jup = 71492e3  # Jupiter's equatorial radius in meters
 J2 = 0.014736  # Jupiter's J₂ value
+J4 = -5.87e-4  # Jupiter's J₄ value
+M_sun = 1.989e30
+a_jup = 7.785e11  # Jupiter's distance from the Sun (m)
+year_jup = 3.743e8  # Jupiter's orbital period (s), 11.86 years
+obliquity_jup = 3.13  # Tilt of Jupiter's equator to its orbit (degrees)
 
 # =========================
-# PLOTTING
+# FORCE SOLVER
 # =========================
-plt.rcParams['font.family'] = 'cambria'
-fig = plt.figure('auto')
-ax = fig.add_subplot(111, projection='3d')
-ax.set_aspect("auto")
-ax.set_xlim(-lim, lim)
-ax.set_ylim(-lim, lim)
-ax.set_zlim(-lim, lim)
-ax.view_init(elev=30, azim=120)
-fig.patch.set_facecolor('#010b19')
-ax.set_facecolor('#010b19')
-ax.grid(False)
-for axis in [ax.xaxis, ax.yaxis, ax.zaxis]:
-    axis.set_pane_color((1, 1, 1, 0))
-    axis._axinfo["grid"]['color'] =  (0, 0, 0, 0)
-ax.set_title("Jupiter and its Moons in 3D", color='white')
-ax.set_axis_off()
+SOLVER = "jupiter"  #--- "jupiter" (moons feel Jupiter only), "direct" (all pairs) or "barnes-hut"
+THETA = 0.5  #--- Barnes-Hut opening angle: smaller is more accurate, larger is faster
+N_RING = 0  #--- Synthetic ring particles added on top of the moon catalogue
+SAVE_PATH = None  #--- Stream the animated run to this file (open it with nbody.trajectory.Trajectory)
+DIAGNOSTICS_EVERY = None  #--- e.g. 100: print the energy, momentum and angular momentum drift every this many steps
+PROFILE = None  #--- "phases": time forces, steps, trails, artists and redraws and print a report at the end; "sample": also sample the stack
+COLLISIONS = None  #--- "merge" or "bounce": bodies (and ring particles) that touch collide, found with a spatial hash
+DENSITY = 2000  #--- kg/m^3, sets the collision radius of every body but Jupiter from its mass
+SUBSTEPS = 1  #--- Steps of dt per drawn frame; trails keep every step and cover trail_length frames
+TARGET_FPS = None  #--- e.g. 30: adapt the steps per frame to the measured draw time instead
+INTEGRATOR = "block"  #--- "block" (per-body block time steps), "wisdom_holman" (Kepler drifts about Jupiter) or any name in nbody.INTEGRATORS
+
+# =========================
+# PERTURBATIONS
+# =========================
+PERTURBATIONS = ("j2",)  #--- Any of "j2", "j4" (Jupiter's oblateness) and "sun" (the solar tide), on every moon outside the inner group
+J2_STRENGTH = 0.1  #--- Fraction of Jupiter's J2 applied; 1 is the real planet
+SPIN_AXIS = (0.0, 0.0, 1.0)  #--- Jupiter's pole; the moon inclinations are measured from the x-y plane
+
+# =========================
+# TIME PER FRAME
+# =========================
+# Every body advances by the same physical time per frame. The inner moons orbit in under a
+# second, which only the inner view resolves; in the other views the block stepper moves them
+# along their Kepler orbits around Jupiter instead of refining every frame down to them
+# (with SOLVER = "jupiter"; the other solvers step them at the finest level).
+# A frame costs at most 2 ** MAX_LEVEL sub-steps: about 2 ms in the prograde and inner views
+# and 30 ms in the Galilean view, where the irregulars need level 7-8.
+def time_step():
+    '''Physical time per frame (s) for the selected group'''
+    if VIEW_INNER:
+        return 0.1
+    elif VIEW_GALILEAN:
+        return 1000
+    return 10
 
 # ==================================
 # INITIALIZING JUPITER AND ITS MOONS
@@ -67,25 +103,17 @@ def calc_circular_velocity(m, r):
     G = 6.67430e-11
     return np.sqrt(G * m / r)
 
-for moon, (mass, r, _, inc) in orbital_params.items():
-    '''Fill moon_data dictionary with inclined orbits'''
-    v = calc_circular_velocity(jupiter_data["jupiter"][0], r)
-    pos, vel = inclined_orbit(r, v, inc)
-    jupiter_data[moon] = [mass, pos, vel]
+def moon_states(params):
+    '''[mass, pos, vel] of each moon in params (rows like orbital_params) on its inclined orbit'''
+    states = {}
+    for moon, (mass, r, _, inc) in params.items():
+        v = calc_circular_velocity(jupiter_data["jupiter"][0], r)
+        pos, vel = inclined_orbit(r, v, inc)
+        states[moon] = [mass, pos, vel]
+    return states
+
+jupiter_data.update(moon_states(orbital_params))
 
-# =========================
-# MARKER
-# =========================
-class Body:
-    def __init__(self, name, mass, pos, vel):
-        self.name = name
-        self.mass = mass
-        self.pos = np.array(pos, dtype=float)         # now 3D
-        self.velocity = np.array(vel, dtype=float)    # now 3D
-        self.acceleration = np.zeros(3)
-        self.dt = dt
-
-bodies = []
 inner = {"metis", "adrastea", "amalthea", "thebe"}
 galilean = {"io", "europa", "ganymede", "callisto"}
 retrograde = {"euporie", "sponde", "autonoe", "callirrhoe",
@@ -99,143 +127,360 @@ prograde = {"themisto", "leda", "ersa", "pandia",
             "elara", "lysithea"
     }
 
-# Groups mapped to their corresponding "view" flags
-view_filters = {
-    'galilean':   (VIEW_GALILEAN,   galilean),
-    'retrograde': (VIEW_RETROGRADE, retrograde),
-    'prograde':   (VIEW_PROGRADE,   prograde),
-    'inner':      (VIEW_INNER,      inner),
-}
-
-for _, (view_flag, group) in view_filters.items():
-    '''apply fade to non-selected groups from view_index'''
-    if not view_flag:
-        for key in group:
-            if key in moon_colors:
-                moon_colors[key] = 'gray'
-                moon_alpha[key] = 0.2
-
-for name, (mass, pos, vel) in jupiter_data.items():
-    body = Body(name, mass, pos, vel)
-    bodies.append(body)
-
-    color = moon_colors.get(name, "gray")
-    alpha = moon_alpha.get(name)
-    size = moon_sizes.get(name, 4)
-    body.color = color
-    body.marker, = ax.plot([], [], [], 'o', color=color, markersize=size, alpha=alpha)
-    body.trail, = ax.plot([], [], [], '-', lw=0.7, color=color, alpha=(alpha/1.667))
-    body.trail_x = []
-    body.trail_y = []
-    body.trail_z = []
-    body.trail_length = 500 if name == "jupiter" else 300
+def view_colors():
+    '''(colors, alpha) of every moon, with the groups outside the selected view faded'''
+    colors, alpha = dict(moon_colors), dict(moon_alpha)
+    # Groups mapped to their corresponding "view" flags
+    view_filters = {
+        'galilean':   (VIEW_GALILEAN,   galilean),
+        'retrograde': (VIEW_RETROGRADE, retrograde),
+        'prograde':   (VIEW_PROGRADE,   prograde),
+        'inner':      (VIEW_INNER,      inner),
+    }
+    for _, (view_flag, group) in view_filters.items():
+        if not view_flag:
+            for key in group:
+                if key in colors:
+                    colors[key] = 'gray'
+                    alpha[key] = 0.2
+    return colors, alpha
+
+def ring_particles(n, seed=0):
+    '''Thin ring of light debris particles on circular orbits, as (names, masses, pos, vel)'''
+    rng = np.random.default_rng(seed)
+    M_jup = jupiter_data["jupiter"][0]
+    r = rng.uniform(1.22e8, 1.29e8, n)  #--- Jupiter's main ring
+    theta = rng.uniform(0, 360, n)
+    inc = rng.normal(0, 0.05, n)
+    pos, vel = inclined_orbit(r, calc_circular_velocity(M_jup, r), inc, theta)
+    names = ["ring_%d" % k for k in range(n)]
+    return names, np.full(n, 1e10), pos.T, vel.T
 
 # =========================
 # PHYSICS
 # =========================
+class JovianSystem(System):
+    """Jupiter's moons plus the PERTURBATIONS (J2 by default) on every moon outside the inner group.
 
-def compute_acceleration(bodies):
-    G = 6.67430e-11
-    jupiter = next(b for b in bodies if b.name == "jupiter")
-    for b in bodies:
-        total_acc = np.zeros(3)
-        if b.name == "jupiter":
-            b.acceleration = np.zeros(3)
-            continue
-        r = jupiter.pos - b.pos
-        dist = np.linalg.norm(r)
-        if dist == 0:
-            b.acceleration = np.zeros(3)
-            continue
-        b.acceleration = G * jupiter.mass * r / dist**3
-
-        total_acc = G * jupiter.mass * r / dist ** 3
-        if b.name != "jupiter" and b.name not in inner:
-            '''J2 Acceleration on Moons beside Inner Planets'''
-            x, y, z = r
-            factor = - (3 * G * jupiter.mass * J2 * R_jup ** 2) / (2 * dist ** 5)
-            ax_j2 = x * (1 - 5 * z ** 2 / dist ** 2)
-            ay_j2 = y * (1 - 5 * z ** 2 / dist ** 2)
-            az_j2 = z * (3 - 5 * z ** 2 / dist ** 2)
-            j2_acc = factor * np.array([ax_j2, ay_j2, az_j2])
-            j2_acc *= 0.1  # try 10% strength
-            total_acc += j2_acc
-            b.acceleration = total_acc
-
-# Symplectic velocity verlet step
-def velocity_verlet_step(bodies, dt):
-    for b in bodies:
-        '''Yoshida 4th Order Time Integrator for Symplectic Purposes'''
-        if b.name.lower() in inner:
-            b.pos += b.velocity * inner_dt + 0.5 * b.acceleration * inner_dt ** 2 #--- Inner Moons
-        elif b.name.lower() in galilean:
-            b.pos += b.velocity * 1000 + 0.5 * b.acceleration * 1000 ** 2 #--- Outer Moons
+    With SOLVER = "jupiter" the moons only feel Jupiter, which is held fixed; "direct" and
+    "barnes-hut" include every mutual moon-moon perturbation.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.jupiter = self.index("jupiter")
+        self.outer = np.array([[name.lower() not in inner] for name in self.names])
+        self.perturbations = make_perturbations()
+
+    def acceleration(self, pos, vel=None, targets=None):
+        G = self.G
+        M_jup = self.mass[self.jupiter]
+        bodies = slice(None) if targets is None else targets
+        # Offsets from Jupiter and their powers, shared by the central pull and the perturbations;
+        # Jupiter sits at the origin of the frame, where every term vanishes
+        frame = Frame(pos, vel, self.mass, G, self.jupiter, bodies, self.t)
+
+        if SOLVER == "direct":
+            acc = pairwise_acceleration(pos, self.mass, G, targets=np.arange(len(pos))[bodies])
+        elif SOLVER == "barnes-hut":
+            acc = tree_acceleration(pos, self.mass, G, theta=THETA, targets=np.arange(len(pos))[bodies])
         else:
-            b.pos += b.velocity * dt + 0.5 * b.acceleration * dt**2 #--- Everything Else
+            acc = -(G * M_jup * frame.inverse(3))[:, np.newaxis] * frame.x
 
-    old_acc = [b.acceleration.copy() for b in bodies]
-    compute_acceleration(bodies)
+        '''Perturbations on Moons beside Inner Planets'''
+        if self.perturbations:
+            acc += self.perturbations.acceleration(frame) * self.outer[bodies]
+        return acc
 
-    for b, a_old in zip(bodies, old_acc):
-        if b.name.lower() in inner:
-            b.velocity += 0.5 * (a_old + b.acceleration) * inner_dt #---- Inner Moons
-        elif b.name.lower() in galilean:
-            b.velocity += 0.5 * (a_old + b.acceleration) * 1000 #--- Outer Moons
+    def potential_energy(self, pos):
+        '''Potential energy of the forces in acceleration; with the "jupiter" solver only moon-Jupiter pairs count'''
+        G = self.G
+        frame = Frame(pos, None, self.mass, G, self.jupiter, slice(None), self.t)
+        if SOLVER == "jupiter":
+            energy = -G * self.mass[self.jupiter] * np.sum(self.mass * frame.inverse(1))
         else:
-            b.velocity += 0.5 * (a_old + b.acceleration) * dt #--- Everything Else
+            energy = pairwise_potential(pos, self.mass, G)
+        if self.perturbations:
+            energy += np.sum(self.mass * self.outer[:, 0] * self.perturbations.potential(frame))
+        return energy
 
-def view_frame():
-    global lim
-    '''limit view frame by selected groups'''
+def make_perturbations():
+    '''The forces named in PERTURBATIONS as one nbody.perturbations pipeline. The solar tide
+    varies with time, so with "sun" the energy diagnostics drift by design'''
+    unknown = set(PERTURBATIONS) - {"j2", "j4", "sun"}
+    if unknown:
+        raise ValueError("Unknown perturbations %s, expected any of 'j2', 'j4' and 'sun'" % sorted(unknown))
+    plugins = []
+    zonal = {}
+    if "j2" in PERTURBATIONS:
+        zonal[2] = J2_STRENGTH * J2
+    if "j4" in PERTURBATIONS:
+        zonal[4] = J4
+    if zonal:
+        plugins.append(Zonal(R_jup, zonal, SPIN_AXIS))
+    if "sun" in PERTURBATIONS:
+        plugins.append(SolarTide(M_sun, a_jup, year_jup, np.radians(obliquity_jup)))
+    return Perturbations(*plugins)
+
+def body_timestep(system):
+    '''Step for each body from its own orbit around Jupiter'''
+    return dynamical_timestep(system, ETA, center=system.jupiter)
+
+def make_stepper():
+    '''Block time steps: each body gets dt / 2**level and forces are only recomputed for bodies that are due.
+    With the "jupiter" solver, inner moons that would need more than MAX_LEVEL levels (outside the inner view)
+    follow their Kepler orbits around Jupiter for the frame instead, which is exact for them as they feel only
+    Jupiter; the "direct" and "barnes-hut" solvers add moon-moon pulls, so there they stop at MAX_LEVEL like
+    every other body.
+    Wisdom-Holman moves every moon on its exact Kepler orbit around Jupiter in one step of dt and
+    applies the PERTURBATIONS (and moon-moon pulls with the "direct" or "barnes-hut" solver) as kicks; with the
+    "jupiter" solver Jupiter stays fixed, as in the force model.
+    Any other INTEGRATOR name advances every body with one shared step of dt'''
+    if INTEGRATOR == "block":
+        names = list(jupiter_data)
+        keplerian = [k for k, name in enumerate(names) if name in inner] if SOLVER == "jupiter" else ()
+        return BlockTimestepper(body_timestep, MAX_LEVEL, center=names.index("jupiter"), keplerian=keplerian)
+    if INTEGRATOR == "wisdom_holman":
+        return get_integrator(INTEGRATOR, central=list(jupiter_data).index("jupiter"), fixed_central=SOLVER == "jupiter")
+    return get_integrator(INTEGRATOR)
+
+def body_radius(system):
+    '''Collision radius of every body: R_jup for Jupiter, a rocky sphere of its mass for the rest'''
+    radius = np.cbrt(3 * system.mass / (4 * np.pi * DENSITY))
+    radius[system.jupiter] = R_jup
+    return radius
+
+def make_monitor(system):
+    '''Collision handling and conservation diagnostics after every step, as set by COLLISIONS and
+    DIAGNOSTICS_EVERY, or None when both are off'''
+    monitors = []
+    if COLLISIONS:
+        monitors.append(Collisions(body_radius(system), COLLISIONS))
+    diagnostics = make_diagnostics()
+    if diagnostics:
+        monitors.append(diagnostics)
+    if not monitors:
+        return None
+
+    def monitor(system):
+        for m in monitors:
+            m(system)
+    return monitor
+
+def make_diagnostics():
+    '''Conservation diagnostics printed every DIAGNOSTICS_EVERY steps, or None when they are off'''
+    return None if DIAGNOSTICS_EVERY is None else Diagnostics(DIAGNOSTICS_EVERY, log=print)
+
+def make_profiler():
+    '''Profiler for the PROFILE setting; when PROFILE is None it is switched off and costs nothing'''
+    if PROFILE not in (None, "phases", "sample"):
+        raise ValueError("Unknown PROFILE %r, expected None, 'phases' or 'sample'" % (PROFILE,))
+    return Profiler(sample_interval=0.005 if PROFILE == "sample" else None, enabled=PROFILE is not None)
+
+def make_system():
+    names = list(jupiter_data)
+    masses = [jupiter_data[name][0] for name in names]
+    positions = [jupiter_data[name][1] for name in names]
+    velocities = [jupiter_data[name][2] for name in names]
+    if N_RING:
+        ring_names, ring_masses, ring_pos, ring_vel = ring_particles(N_RING)
+        names += ring_names
+        masses = np.concatenate([masses, ring_masses])
+        positions = np.concatenate([positions, ring_pos])
+        velocities = np.concatenate([velocities, ring_vel])
+    system = JovianSystem(names, masses, positions, velocities)
+    system.compute_acceleration()
+    return system
+
+def kepler_preview(t):
+    '''Positions (..., N, 3) of Jupiter and its moons at times t (seconds) straight from Kepler's equation,
+    no integration: each moon stays on the circular inclined orbit it starts on, around a fixed Jupiter,
+    ignoring J2 and the other moons'''
+    names = list(jupiter_data)
+    moons = [name for name in names if name in orbital_params]
+    radius = np.array([orbital_params[name][1] for name in moons])
+    inclination = np.radians([orbital_params[name][3] for name in moons])
+    zero = np.zeros(len(moons))
+    orbit, _ = propagate((radius, zero, inclination, zero, zero, zero), G * jupiter_data["jupiter"][0], t)
+
+    preview = np.zeros(np.shape(t) + (len(names), 3))
+    preview[...] = jupiter_data["jupiter"][1]
+    preview[..., [names.index(name) for name in moons], :] += orbit
+    return preview
+
+def view_limit():
+    '''Widest view frame for the selected group'''
     if VIEW_GALILEAN:
-        max_lim = 1.5e9
+        return 1.5e9
     elif VIEW_RETROGRADE:
-        max_lim = 1.6e7
+        return 1.6e7
     elif VIEW_PROGRADE:
-        max_lim = 1.4e7
+        return 1.4e7
     elif VIEW_INNER:
-        max_lim = 2e5
-    else:
-        max_lim = 1
-        print("No Groups Selected")
-        exit()
+        return 2e5
+    print("No Groups Selected")
+    exit()
 
-    if max_lim < lim or lim >= 2e9: # Limit Frame to only this marker.
-        return
+def export_style():
+    '''How nbody.export draws this run: a top-down (x, y) view of the selected group'''
+    names = list(jupiter_data) + ["ring_%d" % k for k in range(N_RING)]
+    half = view_limit()
+    colors, _ = view_colors()
+    return {
+        "names": names,
+        "colors": [colors.get(name, "tan" if name.startswith("ring_") else "gray") for name in names],
+        "sizes": [moon_sizes.get(name, 0.5 if name.startswith("ring_") else 4) for name in names],
+        "trail_length": [0 if name.startswith("ring_") else 500 if name == "jupiter" else 300 for name in names],
+        "limits": (-half, half, -half, half),
+        "title": "Jupiter and its Moons",
+        "facecolor": '#010b19',
+        "axes": "off",
+    }
 
-    lim *= render_speed
-    ax.set_xlim(-lim, lim)
-    ax.set_ylim(-lim, lim)
-    ax.set_zlim(-lim, lim)
+def run(steps, dt=None, path=None, checkpoint=None):
+    """Integrate headless (no figure) and return (t, pos, vel) arrays of shape (steps + 1, N, 3).
+
+    Each step advances every body by dt (by default time_step()), the same as one animation
+    frame. With path, the trajectory is streamed to that file and returned memory-mapped
+    instead. checkpoint (an nbody.checkpoint.Checkpointer) resumes from, and keeps saving to,
+    its file.
+    """
+    dt = time_step() if dt is None else dt
+    system = make_system()
+    frames = None  # trajectory frames already written, for a resumed run
+    if checkpoint is not None:
+        steps -= checkpoint.resume(system)
+        frames = checkpoint.frames
+    stepper = make_stepper()
+    writer = None if path is None else TrajectoryWriter.for_system(path, system, dt, step=stepper, resume=frames,
+                                                                   solver=SOLVER)
+    profiler = make_profiler()
+    profiler.instrument(system)
+    result = integrate(system, steps, dt, step=stepper, writer=writer, checkpoint=checkpoint,
+                       monitor=make_monitor(system), profiler=profiler)
+    profiler.stop()
+    if profiler.enabled:
+        print(profiler.report())
+    return result
 
 # =========================
 # ANIMATE
 # =========================
+def main():
+    global lim
+    import matplotlib.pyplot as plt
+    from matplotlib.animation import FuncAnimation
+
+    # =========================
+    # PLOTTING
+    # =========================
+    lim = 4e4 if VIEW_INNER else 4e6
+    dt = time_step()
+    colors, alphas = view_colors()
+
+    use_font('cambria')
+    fig = plt.figure('auto')
+    ax = fig.add_subplot(111, projection='3d')
+    ax.set_aspect("auto")
+    ax.set_xlim(-lim, lim)
+    ax.set_ylim(-lim, lim)
+    ax.set_zlim(-lim, lim)
+    ax.view_init(elev=30, azim=120)
+    fig.patch.set_facecolor('#010b19')
+    ax.set_facecolor('#010b19')
+    ax.grid(False)
+    for axis in [ax.xaxis, ax.yaxis, ax.zaxis]:
+        axis.set_pane_color((1, 1, 1, 0))
+        axis._axinfo["grid"]['color'] =  (0, 0, 0, 0)
+    ax.set_title("Jupiter and its Moons in 3D", color='white')
+    ax.set_axis_off()
+
+    # =========================
+    # MARKER
+    # =========================
+    system = make_system()
+    stepper = make_stepper()
+    bodies = system.bodies()[:len(jupiter_data)]
+    ring = slice(len(jupiter_data), len(system))
+    ring_dots = ax.scatter([], [], [], s=0.5, color='tan', alpha=0.4)
+    writer = None
+    if SAVE_PATH:
+        writer = TrajectoryWriter.for_system(SAVE_PATH, system, dt, step=stepper, solver=SOLVER)
+        writer.append(system.t, system.pos, system.vel)
+    monitor = make_monitor(system)
+    if monitor:
+        monitor(system)
+    profiler = make_profiler().start()
+    profiler.instrument(system)
+    profiler.instrument_figure(fig)
+
+    for body in bodies:
+        name = body.name
+        color = colors.get(name, "gray")
+        alpha = alphas.get(name)
+        size = moon_sizes.get(name, 4)
+        body.color = color
+        body.marker, = ax.plot([], [], [], 'o', color=color, markersize=size, alpha=alpha)
+        body.trail, = ax.plot([], [], [], '-', lw=0.7, color=color, alpha=(alpha/1.667))
+        body.trail_length = 500 if name == "jupiter" else 300
+    max_trail = max(b.trail_length for b in bodies)
+    trails = Trail(max_trail * SUBSTEPS, dim=3, bodies=len(bodies))  # grown as TARGET_FPS raises the steps per frame
+    pacer = FramePacer(SUBSTEPS, TARGET_FPS)
+
+    def advance():
+        with profiler.phase("step"):
+            stepper(system, dt)
+        system.t += dt
+        if writer:
+            with profiler.phase("record"):
+                writer.append(system.t, system.pos, system.vel)
+        if monitor:
+            with profiler.phase("monitor"):
+                monitor(system)
+        with profiler.phase("trails"):
+            trails.append(system.pos[:len(bodies)])
+
+    def view_frame():
+        global lim
+        '''limit view frame by selected groups'''
+        max_lim = view_limit()
+        if max_lim < lim or lim >= 2e9: # Limit Frame to only this marker.
+            return
+
+        lim *= render_speed
+        ax.set_xlim(-lim, lim)
+        ax.set_ylim(-lim, lim)
+        ax.set_zlim(-lim, lim)
+
+    def init():
+        for b in bodies:
+            b.marker.set_data_3d([b.pos[0]], [b.pos[1]], [b.pos[2]])
+        ring_dots._offsets3d = tuple(system.pos[ring].T)
+        return [b.marker for b in bodies]
+
+    def update(frame):
+        with profiler.phase("physics"):
+            pacer.run(advance)
+            trails.reserve(max_trail * pacer.substeps)
+        with profiler.phase("view"):
+            view_frame()
+
+        with profiler.phase("artists"):
+            for b in bodies:
+                b.marker.set_data_3d([b.pos[0]], [b.pos[1]], [b.pos[2]])
+                b.trail.set_data_3d(*decimate(trails.body(b.index, b.trail_length * pacer.substeps), b.trail_length))
+            ring_dots._offsets3d = tuple(system.pos[ring].T)
+
+        return [b.marker for b in bodies] + [b.trail for b in bodies]
+
+    ani = FuncAnimation(fig, profiler.timed("update", update), init_func=init, frames=1000, interval=15)
+    plt.show()
+    profiler.stop()
+    if writer:
+        writer.close()
+    if profiler.enabled:
+        print(profiler.report())
+
 
-def init():
-    for b in bodies:
-        b.marker.set_data_3d([b.pos[0]], [b.pos[1]], [b.pos[2]])
-    return [b.marker for b in bodies]
-
-def update(frame):
-    global lim, dt
-    for w in [w1, w2, w1]:
-        velocity_verlet_step(bodies, dt * w)
-    view_frame()
-
-    for b in bodies:
-        b.marker.set_data_3d([b.pos[0]], [b.pos[1]], [b.pos[2]])
-        b.trail_x.append(b.pos[0])
-        b.trail_y.append(b.pos[1])
-        b.trail_z.append(b.pos[2])
-        if len(b.trail_x) > b.trail_length:
-            b.trail_x.pop(0)
-            b.trail_y.pop(0)
-            b.trail_z.pop(0)
-        b.trail.set_data_3d(b.trail_x, b.trail_y, b.trail_z)
-
-    return [b.marker for b in bodies] + [b.trail for b in bodies]
-
-compute_acceleration(bodies) #--- Starts Animation
-ani = FuncAnimation(fig, update, init_func=init, frames=1000, interval=15)
-plt.show()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+"""Shared N-body engine used by the simulations in this repository."""
+from .system import G, Body, System, pairwise_acceleration
+from .integrators import (INTEGRATORS, euler_step, get_integrator, rk4_step, velocity_verlet_step,
+                          yoshida4_step, yoshida6_step, yoshida8_step)
+from .adaptive import DOP853, RK45
+from .wisdom_holman import WisdomHolman
+from .driver import integrate, integrate_batch
+from .barnes_hut import Octree, compare_with_direct, tree_acceleration
@@ -0,0 +1,177 @@
+"""Adaptive embedded Runge-Kutta steps: Dormand-Prince 5(4) and DOP853.
+
+Each call still advances the system by exactly dt, but does so in as many internal sub-steps
+as the error estimate asks for, so a fixed animation step can contain a close encounter or a
+merger without losing accuracy. The sub-step size carries over between calls.
+"""
+import numpy as np
+
+
+class AdaptiveRK:
+    """Advance a System by dt with an embedded Runge-Kutta pair and error control.
+
+    Use an instance in place of a step function, e.g. integrate(system, steps, dt, step=RK45()).
+    Forces come from system.acceleration(pos, vel), so velocity-dependent forces work. The
+    error of each sub-step is measured against rtol times the size of the positions and of
+    the velocities (plus atol). After each call h is the proposed next sub-step and
+    evaluations, substeps and rejected count the work done so far.
+    """
+
+    C = A = B = None
+    order = None  # order of the error estimate
+
+    def __init__(self, rtol=1e-9, atol=0.0, safety=0.9, min_factor=0.2, max_factor=10.0):
+        self.rtol = rtol
+        self.atol = atol
+        self.safety = safety
+        self.min_factor = min_factor
+        self.max_factor = max_factor
+        self.h = None
+        self.evaluations = 0
+        self.substeps = 0
+        self.rejected = 0
+
+    def state(self):
+        """The proposed next sub-step (NaN before the first call), for checkpoints."""
+        return {"h": np.float64(np.nan if self.h is None else self.h)}
+
+    def load_state(self, state):
+        h = float(state["h"])
+        self.h = None if np.isnan(h) else h
+
+    def _error(self, h, k_pos, k_vel, pos_scale, vel_scale):
+        """Scaled RMS error of a sub-step from its stage derivatives (including the new state's)."""
+        err_pos = np.tensordot(self.E, k_pos, axes=1) / pos_scale
+        err_vel = np.tensordot(self.E, k_vel, axes=1) / vel_scale
+        return h * np.sqrt((np.sum(err_pos ** 2) + np.sum(err_vel ** 2)) / (err_pos.size + err_vel.size))
+
+    def __call__(self, system, dt):
+        pos, vel = system.pos.copy(), system.vel.copy()
+        stages = len(self.B)
+        k_pos = np.empty((stages + 1,) + pos.shape)
+        k_vel = np.empty((stages + 1,) + pos.shape)
+        k_pos[0] = vel
+        k_vel[0] = system.acceleration(pos, vel)
+        self.evaluations += 1
+
+        h = dt if self.h is None else min(self.h, dt)
+        done = 0.0
+        while done < dt:
+            step = min(h, dt - done)
+            for i in range(1, stages):
+                stage_pos = pos + step * np.tensordot(self.A[i][:i], k_pos[:i], axes=1)
+                stage_vel = vel + step * np.tensordot(self.A[i][:i], k_vel[:i], axes=1)
+                k_pos[i] = stage_vel
+                k_vel[i] = system.acceleration(stage_pos, stage_vel)
+            new_pos = pos + step * np.tensordot(self.B, k_pos[:stages], axes=1)
+            new_vel = vel + step * np.tensordot(self.B, k_vel[:stages], axes=1)
+            k_pos[stages] = new_vel
+            k_vel[stages] = system.acceleration(new_pos, new_vel)
+            self.evaluations += stages
+
+            pos_scale = self.atol + self.rtol * max(np.abs(pos).max(), np.abs(new_pos).max())
+            vel_scale = self.atol + self.rtol * max(np.abs(vel).max(), np.abs(new_vel).max())
+            error = self._error(step, k_pos, k_vel, pos_scale, vel_scale)
+            if error == 0:
+                factor = self.max_factor
+            else:
+                factor = min(self.max_factor, max(self.min_factor, self.safety * error ** (-1.0 / (self.order + 1))))
+
+            if error <= 1:
+                pos, vel = new_pos, new_vel
+                k_pos[0], k_vel[0] = k_pos[stages], k_vel[stages]  # first same as last
+                done += step
+                self.substeps += 1
+                if step == h:  # a shortened final sub-step says nothing about the next one
+                    h = step * factor
+            else:
+                self.rejected += 1
+                h = step * min(factor, 1.0)
+                if h <= 1e-14 * dt:
+                    raise RuntimeError("Adaptive step size underflow at t = %g" % (system.t + done))
+
+        self.h = h
+        system.pos[...] = pos
+        system.vel[...] = vel
+        system.acc[...] = k_vel[0]
+
+
+class RK45(AdaptiveRK):
+    """Dormand-Prince 5(4): 6 force evaluations per sub-step."""
+
+    C = np.array([0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1])
+    A = [
+        [],
+        [1 / 5],
+        [3 / 40, 9 / 40],
+        [44 / 45, -56 / 15, 32 / 9],
+        [19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729],
+        [9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656],
+    ]
+    B = np.array([35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84])
+    E = np.array([-71 / 57600, 0, 71 / 16695, -71 / 1920, 17253 / 339200, -22 / 525, 1 / 40])
+    order = 4
+
+
+class DOP853(AdaptiveRK):
+    """Dormand-Prince 8(5,3) of Hairer, Norsett and Wanner: 12 force evaluations per sub-step."""
+
+    C = np.array([0.0, 0.526001519587677318785587544488e-01, 0.789002279381515978178381316732e-01,
+                  0.118350341907227396726757197510, 0.281649658092772603273242802490,
+                  0.333333333333333333333333333333, 0.25, 0.307692307692307692307692307692,
+                  0.651282051282051282051282051282, 0.6, 0.857142857142857142857142857142, 1.0])
+    A = [
+        [],
+        [5.26001519587677318785587544488e-2],
+        [1.97250569845378994544595329183e-2, 5.91751709536136983633785987549e-2],
+        [2.95875854768068491816892993775e-2, 0, 8.87627564304205475450678981324e-2],
+        [2.41365134159266685502369798665e-1, 0, -8.84549479328286085344864962717e-1,
+         9.24834003261792003115737966543e-1],
+        [3.7037037037037037037037037037e-2, 0, 0, 1.70828608729473871279604482173e-1,
+         1.25467687566822425016691814123e-1],
+        [3.7109375e-2, 0, 0, 1.70252211019544039314978060272e-1, 6.02165389804559606850219397283e-2,
+         -1.7578125e-2],
+        [3.70920001185047927108779319836e-2, 0, 0, 1.70383925712239993810214054705e-1,
+         1.07262030446373284651809199168e-1, -1.53194377486244017527936158236e-2,
+         8.27378916381402288758473766002e-3],
+        [6.24110958716075717114429577812e-1, 0, 0, -3.36089262944694129406857109825,
+         -8.68219346841726006818189891453e-1, 2.75920996994467083049415600797e1,
+         2.01540675504778934086186788979e1, -4.34898841810699588477366255144e1],
+        [4.77662536438264365890433908527e-1, 0, 0, -2.48811461997166764192642586468,
+         -5.90290826836842996371446475743e-1, 2.12300514481811942347288949897e1,
+         1.52792336328824235832596922938e1, -3.32882109689848629194453265587e1,
+         -2.03312017085086261358222928593e-2],
+        [-9.3714243008598732571704021658e-1, 0, 0, 5.18637242884406370830023853209,
+         1.09143734899672957818500254654, -8.14978701074692612513997267357,
+         -1.85200656599969598641566180701e1, 2.27394870993505042818970056734e1,
+         2.49360555267965238987089396762, -3.0467644718982195003823669022],
+        [2.27331014751653820792359768449, 0, 0, -1.05344954667372501984066689879e1,
+         -2.00087205822486249909675718444, -1.79589318631187989172765950534e1,
+         2.79488845294199600508499808837e1, -2.85899827713502369474065508674,
+         -8.87285693353062954433549289258, 1.23605671757943030647266201528e1,
+         6.43392746015763530355970484046e-1],
+    ]
+    B = np.array([5.42937341165687622380535766363e-2, 0, 0, 0, 0, 4.45031289275240888144113950566,
+                  1.89151789931450038304281599044, -5.8012039600105847814672114227,
+                  3.1116436695781989440891606237e-1, -1.52160949662516078556178806805e-1,
+                  2.01365400804030348374776537501e-1, 4.47106157277725905176885569043e-2])
+    E3 = np.append(B, 0.0)
+    E3[[0, 8, 11]] -= [0.244094488188976377952755905512, 0.733846688281611857341361741547,
+                       0.220588235294117647058823529412e-1]
+    E5 = np.zeros(13)
+    E5[[0, 5, 6, 7, 8, 9, 10, 11]] = [0.1312004499419488073250102996e-1, -0.1225156446376204440720569753e+1,
+                                       -0.4957589496572501915214079952, 0.1664377182454986536961530415e+1,
+                                       -0.3503288487499736816886487290, 0.3341791187130174790297318841,
+                                       0.8192320648511571246570742613e-1, -0.2235530786388629525884427845e-1]
+    order = 7
+
+    def _error(self, h, k_pos, k_vel, pos_scale, vel_scale):
+        """Blend of the 5th and 3rd order estimates, as in Hairer's DOP853."""
+        err5 = np.concatenate([(np.tensordot(self.E5, k_pos, axes=1) / pos_scale).ravel(),
+                               (np.tensordot(self.E5, k_vel, axes=1) / vel_scale).ravel()])
+        err3 = np.concatenate([(np.tensordot(self.E3, k_pos, axes=1) / pos_scale).ravel(),
+                               (np.tensordot(self.E3, k_vel, axes=1) / vel_scale).ravel()])
+        err5_2, err3_2 = np.sum(err5 ** 2), np.sum(err3 ** 2)
+        if err5_2 == 0 and err3_2 == 0:
+            return 0.0
+        return h * err5_2 / np.sqrt((err5_2 + 0.01 * err3_2) * err5.size)
@@ -0,0 +1,110 @@
+"""Hierarchical block time steps.
+
+Each body gets its own step dt / 2**level, picked from its local dynamical time, and advances
+with a kick-drift-kick leapfrog on that step. Steps are nested powers of two, so every body is
+back in sync at the end of the outer step, and forces are only recomputed for the bodies whose
+own step ends on the current sub-step.
+
+Levels stop at max_level, which bounds the cost of one outer step at 2**max_level sub-steps.
+Bodies that would need a finer step than that (a moon on a sub-second orbit in a view stepped
+by minutes) can instead follow exact Kepler orbits about a central body for the whole step.
+"""
+import numpy as np
+
+from .kernels import kepler_drift
+
+
+def dynamical_timestep(system, eta=0.05, center=None):
+    """eta * |v| / |a| for every body, the local orbital time scale (P / 2pi for a circular orbit).
+
+    Velocities and accelerations are measured relative to the body at index center, if given.
+    Bodies with no acceleration get an infinite step.
+    """
+    vel, acc = system.vel, system.acc
+    if center is not None:
+        vel, acc = vel - vel[center], acc - acc[center]
+    speed = np.linalg.norm(vel, axis=-1)
+    accel = np.linalg.norm(acc, axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        step = eta * speed / accel
+    step[~(accel > 0)] = np.inf
+    return step
+
+
+def timestep_levels(dt, body_dt, max_level=20):
+    """Smallest level k per body such that dt / 2**k <= body_dt, clipped to [0, max_level]."""
+    with np.errstate(divide='ignore'):
+        ratio = dt / np.asarray(body_dt, dtype=float)
+    levels = np.ceil(np.log2(np.maximum(ratio, 1.0)))
+    return np.clip(levels, 0, max_level).astype(int)
+
+
+class BlockTimestepper:
+    """Advance a System by dt using per-body power-of-two sub-steps.
+
+    Use an instance in place of a step function, e.g. integrate(system, steps, dt, step=stepper).
+    Levels are reassigned at the start of every outer step, when all bodies are synchronised.
+    After each call, levels holds the level used by every body and force_evaluations the number
+    of single-body force evaluations performed (N per step for a shared time step).
+
+    Bodies that need a level above max_level are clamped to it, which is inaccurate for them.
+    keplerian (indices) names bodies that feel nothing but the body center, for which there is
+    an exact alternative: when they need more than max_level they are taken out of the hierarchy,
+    move dt along their Kepler orbits about center and are carried along with it. unresolved
+    holds the bodies drifted on the last call.
+    """
+
+    def __init__(self, timestep=dynamical_timestep, max_level=20, center=None, keplerian=()):
+        self.timestep = timestep
+        self.max_level = max_level
+        self.center = center
+        self.keplerian = np.asarray(keplerian, dtype=int)
+        self.levels = None
+        self.unresolved = np.empty(0, dtype=int)
+        self.force_evaluations = 0
+
+    def __call__(self, system, dt):
+        levels = timestep_levels(dt, self.timestep(system), self.max_level + 1)
+        unresolved = np.empty(0, dtype=int)
+        if self.center is not None and len(self.keplerian):
+            unresolved = self.keplerian[levels[self.keplerian] > self.max_level]
+            levels[unresolved] = 0
+            if len(unresolved):
+                c = self.center
+                start = system.pos[unresolved] - system.pos[c], system.vel[unresolved] - system.vel[c]
+        levels = np.minimum(levels, self.max_level)
+        self.levels = levels
+        self.unresolved = unresolved
+        top = levels.max()
+        n_sub = 2 ** top
+        h = dt / n_sub
+        stride = 2 ** (top - levels)  # sub-steps per body step
+        half_kick = (0.5 * h * stride)[:, np.newaxis]
+
+        # Bodies sorted from finest to coarsest level, so the set of bodies due on any
+        # sub-step is a leading slice of this order; Kepler-drifted bodies are never due
+        order = np.argsort(-levels, kind='stable')
+        order = order[~np.isin(order, unresolved)]
+        due_count = np.searchsorted(-levels[order], -(top - np.arange(top + 1)), side='right')
+
+        system.vel += half_kick * system.acc
+        if len(unresolved):
+            system.vel[unresolved] = system.vel[c]  # ride along with the centre until the Kepler drift
+        for s in range(1, n_sub + 1):
+            system.pos += system.vel * h
+
+            # Bodies whose step ends here: level >= top - (number of trailing zero bits of s)
+            trailing = (s & -s).bit_length() - 1
+            due = order[:due_count[min(trailing, top)]]
+            system.compute_acceleration(due)
+            self.force_evaluations += len(due)
+
+            kick = half_kick[due] * system.acc[due]
+            system.vel[due] += kick if s == n_sub else 2 * kick  # close this step and open the next
+
+        if len(unresolved):
+            mu = system.G * (system.mass[c] + system.mass[unresolved])
+            pos, vel = kepler_drift(start[0], start[1], mu, dt)
+            system.pos[unresolved] = pos + system.pos[c]
+            system.vel[unresolved] = vel + system.vel[c]
+            system.compute_acceleration(unresolved)
@@ -0,0 +1,68 @@
+"""The scripts' body catalogues as arrays, cached in a compact binary form.
+
+planet_data (solar system) and orbital_params (multi-moon's moon_dictionary) are Python
+literals in the scripts. load_catalog reads them without importing the scripts, and so without
+matplotlib. It keeps the result as an .npz in the __pycache__ folder next to the source.
+Later calls load that file instead, until the source changes. nbody.scenarios builds the
+body set of a run from these arrays.
+"""
+import ast
+import os
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name: (source file, dict literal in it, the fields of each entry)
+CATALOGS = {
+    "planets":      (os.path.join("Solar System", "Solar_System.py"), "planet_data", ("mass", "pos", "vel")),
+    "jovian_moons": (os.path.join("multi-moon", "moon_dictionary.py"), "orbital_params",
+                     ("mass", "radius", "speed", "inclination")),
+}
+
+
+def read_literal(path, variable):
+    """Value of the literal assigned to variable at the top level of the Python file path."""
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == variable for t in node.targets):
+            return ast.literal_eval(node.value)
+    raise ValueError("%s assigns no literal %s" % (path, variable))
+
+
+def _build(source, variable, fields):
+    table = read_literal(source, variable)
+    columns = {"names": np.array(list(table), dtype=str)}
+    for k, field in enumerate(fields):
+        columns[field] = np.array([entry[k] for entry in table.values()], dtype=float)
+    return columns
+
+
+def load_catalog(name):
+    """Dict of arrays for the catalogue name: "names" plus one array per field, one row per body."""
+    try:
+        source, variable, fields = CATALOGS[name]
+    except KeyError:
+        raise ValueError("Unknown catalogue %r, expected one of %s" % (name, sorted(CATALOGS)))
+    source = os.path.join(ROOT, source)
+    cache = os.path.join(os.path.dirname(source), "__pycache__", "%s.catalog.npz" % name)
+    stamp = os.stat(source).st_mtime_ns
+
+    try:
+        with np.load(cache) as f:
+            if int(f["source_mtime"]) == stamp:
+                return {key: f[key] for key in f.files if key != "source_mtime"}
+    except (OSError, KeyError, ValueError):
+        pass  # missing, stale format or unreadable: rebuild it
+
+    columns = _build(source, variable, fields)
+    try:
+        os.makedirs(os.path.dirname(cache), exist_ok=True)
+        tmp = cache + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, source_mtime=np.int64(stamp), **columns)
+        os.replace(tmp, cache)
+    except OSError:
+        pass  # a read-only checkout just rebuilds it every time
+    return columns
@@ -0,0 +1,164 @@
+"""Checkpoint and resume long integrations.
+
+A checkpoint is an .npz file holding everything a step function reads: time, step count,
+positions, velocities, cached accelerations and masses, the internal state of stateful
+step functions (the adaptive integrators' next sub-step), plus the state of a random
+generator and any extra arrays a script wants back (e.g. kilonova ejecta). Restoring it into a freshly
+built system and carrying on gives bit-for-bit the same run as one that was never stopped.
+A run streaming to a trajectory file also records how many frames the file held, so the
+resumed run can reopen the file and carry on from there (see TrajectoryWriter's resume).
+
+Files are written to a temporary name and renamed into place, so a run killed mid-save
+always leaves the previous checkpoint intact.
+"""
+import json
+import os
+import time
+
+import numpy as np
+
+
+def save_checkpoint(path, system, step=0, rng=None, integrator=None, frames=None, **extra):
+    """Atomically write the state of system (and rng, a numpy Generator) to path.
+
+    integrator is a dict of arrays from a step function's state(), if it has any. frames is
+    the number of trajectory frames written before this state, if the run keeps a file.
+    """
+    data = {
+        "t": np.float64(system.t),
+        "step": np.int64(step),
+        "names": np.array(system.names),
+        "mass": system.mass,
+        "pos": system.pos,
+        "vel": system.vel,
+        "acc": system.acc,
+    }
+    if rng is not None:
+        data["rng"] = np.array(json.dumps(rng.bit_generator.state))
+    if frames is not None:
+        data["frames"] = np.int64(frames)
+    for name, value in (integrator or {}).items():
+        data["integrator_" + name] = np.asarray(value)
+    for name, value in extra.items():
+        data["extra_" + name] = np.asarray(value)
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, **data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path):
+    """Read a checkpoint into a dict; extra arrays are collected under "extra" and the step
+    function's state under "integrator"."""
+    with np.load(path) as f:
+        data = {name: f[name] for name in f.files}
+    checkpoint = {
+        "t": float(data.pop("t")),
+        "step": int(data.pop("step")),
+        "names": data.pop("names").tolist(),
+        "rng": json.loads(str(data.pop("rng"))) if "rng" in data else None,
+        "frames": int(data.pop("frames")) if "frames" in data else None,
+        "extra": {},
+        "integrator": {},
+    }
+    for name, value in data.items():
+        if name.startswith("extra_"):
+            checkpoint["extra"][name[len("extra_"):]] = value
+        elif name.startswith("integrator_"):
+            checkpoint["integrator"][name[len("integrator_"):]] = value
+        else:
+            checkpoint[name] = value
+    return checkpoint
+
+
+def restore(system, checkpoint, rng=None):
+    """Copy a loaded checkpoint back into system (and rng); the bodies must match by name."""
+    if list(checkpoint["names"]) != list(system.names):
+        raise ValueError("Checkpoint bodies do not match the system being restored")
+    system.t = checkpoint["t"]
+    system.mass[...] = checkpoint["mass"]
+    system.pos[...] = checkpoint["pos"]
+    system.vel[...] = checkpoint["vel"]
+    system.acc[...] = checkpoint["acc"]
+    if rng is not None and checkpoint["rng"] is not None:
+        rng.bit_generator.state = checkpoint["rng"]
+
+
+class Checkpointer:
+    """Save a checkpoint every every_steps steps and/or every every_seconds of wall-clock time.
+
+    Pass one to integrate(..., checkpoint=...), which calls it after every step and saves once
+    more at the end. extra is an optional function returning a dict of arrays to store
+    alongside the system; after resume they are available as restored["extra"].
+
+    Step functions that keep state between steps (those with state() and load_state(), such
+    as the adaptive RK45 and DOP853) must be passed to track(), and so must the run's
+    trajectory writer, if it has one; integrate does this itself. To resume a run with a
+    trajectory file, open its writer with resume=checkpoint.frames.
+    """
+
+    def __init__(self, path, every_steps=None, every_seconds=None, rng=None, extra=None):
+        self.path = path
+        self.every_steps = every_steps
+        self.every_seconds = every_seconds
+        self.rng = rng
+        self.extra = extra
+        self.step = 0
+        self.restored = None
+        self.stepper = None
+        self.writer = None
+        self._last_save = time.monotonic()
+
+    def resume(self, system):
+        """Restore the last checkpoint into system if there is one; returns the steps already done."""
+        if not os.path.exists(self.path):
+            return 0
+        self.restored = load_checkpoint(self.path)
+        restore(system, self.restored, self.rng)
+        self.step = self.restored["step"]
+        return self.step
+
+    @property
+    def frames(self):
+        """Trajectory frames written before the resumed state, or None if nothing was resumed."""
+        return None if self.restored is None else self.restored["frames"]
+
+    def track(self, stepper, writer=None):
+        """Save stepper's state with every checkpoint, and give it back what was resumed, if anything.
+        With writer (a TrajectoryWriter), also save how many frames it holds.
+
+        Plain step functions have no state and are ignored.
+        """
+        if writer is not None and self.restored is not None:
+            if self.frames is None:
+                raise ValueError("%s was saved by a run without a trajectory file, so a resumed file would "
+                                 "start partway through the run" % self.path)
+            if writer.resumed != self.frames:
+                raise ValueError("Resuming from %s would overwrite the trajectory written before it; "
+                                 "open the writer with resume=checkpoint.frames" % self.path)
+        self.writer = writer
+        if not hasattr(stepper, "state"):
+            return
+        self.stepper = stepper
+        if self.restored is not None and self.restored.get("integrator"):
+            stepper.load_state(self.restored["integrator"])
+
+    def save(self, system):
+        extra = self.extra() if self.extra is not None else {}
+        integrator = self.stepper.state() if self.stepper is not None else None
+        frames = None
+        if self.writer is not None:
+            self.writer.flush()
+            frames = self.writer.frames - (self.writer.last_t == system.t)  # the state itself is written on resume
+        save_checkpoint(self.path, system, self.step, self.rng, integrator, frames, **extra)
+        self._last_save = time.monotonic()
+
+    def __call__(self, system):
+        self.step += 1
+        due = self.every_steps is not None and self.step % self.every_steps == 0
+        due = due or (self.every_seconds is not None and time.monotonic() - self._last_save >= self.every_seconds)
+        if due:
+            self.save(system)
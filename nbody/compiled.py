@@ -0,0 +1,256 @@
+"""Numba versions of the kernels in nbody.kernels.
+
+They live in a module of their own so that numba, which takes longer to import than the rest
+of the package together, is only imported when nbody.kernels first calls one of them.
+"""
+import math
+import os
+
+import numba
+import numpy as np
+
+# nbody.ensemble and nbody.export fork worker pools, and forked children of a process that
+# already started TBB or OpenMP threads deadlock on exit; the workqueue layer is fork-safe.
+if "NUMBA_THREADING_LAYER" not in os.environ:
+    numba.config.THREADING_LAYER = "workqueue"
+
+
+@numba.njit(cache=True)
+def pairwise_acceleration_symmetric(pos, mass, G, interactions, use_mask, acc):
+    # Each pair i < j once: one distance, applied to both bodies (Newton's third law)
+    n, dim = pos.shape
+    for i in range(n):
+        for j in range(i + 1, n):
+            i_feels = not use_mask or interactions[i, j]
+            j_feels = not use_mask or interactions[j, i]
+            if not (i_feels or j_feels):
+                continue
+            dist2 = 0.0
+            for k in range(dim):
+                d = pos[j, k] - pos[i, k]
+                dist2 += d * d
+            if dist2 == 0.0:
+                continue
+            w = G / (dist2 * math.sqrt(dist2))
+            for k in range(dim):
+                d = w * (pos[j, k] - pos[i, k])
+                if i_feels:
+                    acc[i, k] += mass[j] * d
+                if j_feels:
+                    acc[j, k] -= mass[i] * d
+    return acc
+
+@numba.njit(cache=True, parallel=True)
+def pairwise_acceleration(pos, mass, G, interactions, use_mask, targets):
+    n, dim = pos.shape
+    acc = np.zeros((len(targets), dim))
+    for a in numba.prange(len(targets)):
+        i = targets[a]
+        for j in range(n):
+            if use_mask and not interactions[i, j]:
+                continue
+            dist2 = 0.0
+            for k in range(dim):
+                d = pos[j, k] - pos[i, k]
+                dist2 += d * d
+            if dist2 == 0.0:
+                continue
+            w = G * mass[j] / (dist2 * math.sqrt(dist2))
+            for k in range(dim):
+                acc[a, k] += w * (pos[j, k] - pos[i, k])
+    return acc
+
+@numba.njit(cache=True, parallel=True)
+def pairwise_acceleration_batch(pos, mass, G, interactions, use_mask, targets, symmetric):
+    n_members, n, dim = pos.shape
+    acc = np.zeros((n_members, len(targets), dim))
+    for m in numba.prange(n_members):
+        if symmetric:
+            pairwise_acceleration_symmetric(pos[m], mass[m], G, interactions, use_mask, acc[m])
+            continue
+        for a in range(len(targets)):
+            i = targets[a]
+            for j in range(n):
+                if use_mask and not interactions[i, j]:
+                    continue
+                dist2 = 0.0
+                for k in range(dim):
+                    d = pos[m, j, k] - pos[m, i, k]
+                    dist2 += d * d
+                if dist2 == 0.0:
+                    continue
+                w = G * mass[m, j] / (dist2 * math.sqrt(dist2))
+                for k in range(dim):
+                    acc[m, a, k] += w * (pos[m, j, k] - pos[m, i, k])
+    return acc
+
+@numba.njit(cache=True)
+def pairwise_potential(pos, mass, G, interactions, use_mask):
+    n, dim = pos.shape
+    energy = 0.0
+    for i in range(n):
+        for j in range(i + 1, n):
+            if use_mask and not interactions[i, j]:
+                continue
+            dist2 = 0.0
+            for k in range(dim):
+                d = pos[j, k] - pos[i, k]
+                dist2 += d * d
+            if dist2 > 0.0:
+                energy -= G * mass[i] * mass[j] / math.sqrt(dist2)
+    return energy
+
+@numba.njit(cache=True, parallel=True)
+def pairwise_potential_batch(pos, mass, G, interactions, use_mask):
+    energy = np.zeros(pos.shape[0])
+    for m in numba.prange(pos.shape[0]):
+        energy[m] = pairwise_potential(pos[m], mass[m], G, interactions, use_mask)
+    return energy
+
+@numba.njit(cache=True)
+def binary_acceleration(pos, vel, G, m1, m2, c, out):
+    dim = pos.shape[1]
+    M = m1 + m2
+    eta = m1 * m2 / M ** 2
+    r2 = 0.0
+    v2 = 0.0
+    for k in range(dim):
+        r2 += (pos[1, k] - pos[0, k]) ** 2
+        v2 += (vel[1, k] - vel[0, k]) ** 2
+    r = math.sqrt(r2)
+    v_dot_n = 0.0
+    for k in range(dim):
+        v_dot_n += (vel[1, k] - vel[0, k]) * (pos[1, k] - pos[0, k]) / r
+    GM_r = G * M / r
+
+    pn1_n = (1 + 3 * eta) * v2 - 2 * (2 + eta) * GM_r - 1.5 * eta * v_dot_n ** 2
+    pn1_v = -2 * (2 - eta) * v_dot_n
+    coeff = (8 / 5) * eta * G ** 2 * M ** 2 / (c ** 5 * r ** 3)
+    pn25_n = coeff * v_dot_n * (18 * v2 + (2 / 3) * GM_r - 25 * v_dot_n ** 2)
+    pn25_v = -coeff * (6 * v2 - 2 * GM_r - 15 * v_dot_n ** 2)
+
+    for k in range(dim):
+        n_hat = (pos[1, k] - pos[0, k]) / r
+        v_vec = vel[1, k] - vel[0, k]
+        a_total = (- GM_r / r * n_hat
+                   - GM_r / r * (n_hat * pn1_n + pn1_v * v_vec) / c ** 2
+                   + pn25_n * n_hat + pn25_v * v_vec)
+        out[0, k] = -(m2 / M) * a_total
+        out[1, k] = (m1 / M) * a_total
+
+@numba.njit(cache=True)
+def binary_rk4_step(pos, vel, dt, G, m1, m2, c):
+    a_k1 = np.empty_like(pos)
+    a_k2 = np.empty_like(pos)
+    a_k3 = np.empty_like(pos)
+    a_k4 = np.empty_like(pos)
+    binary_acceleration(pos, vel, G, m1, m2, c, a_k1)
+    pos_k2 = pos + 0.5 * dt * vel
+    vel_k2 = vel + 0.5 * dt * a_k1
+    binary_acceleration(pos_k2, vel_k2, G, m1, m2, c, a_k2)
+
+    pos_k3 = pos + 0.5 * dt * vel_k2
+    vel_k3 = vel + 0.5 * dt * a_k2
+    binary_acceleration(pos_k3, vel_k3, G, m1, m2, c, a_k3)
+
+    pos_k4 = pos + dt * vel_k3
+    vel_k4 = vel + dt * a_k3
+    binary_acceleration(pos_k4, vel_k4, G, m1, m2, c, a_k4)
+
+    pos_new = pos + (dt / 6) * (vel + 2 * vel_k2 + 2 * vel_k3 + vel_k4)
+    vel_new = vel + (dt / 6) * (a_k1 + 2 * a_k2 + 2 * a_k3 + a_k4)
+    return pos_new, vel_new
+
+@numba.njit(cache=True, parallel=True)
+def binary_acceleration_batch(pos, vel, G, m1, m2, c, out):
+    for m in numba.prange(pos.shape[0]):
+        binary_acceleration(pos[m], vel[m], G, m1[m], m2[m], c, out[m])
+
+@numba.njit(cache=True, parallel=True)
+def binary_rk4_step_batch(pos, vel, dt, G, m1, m2, c):
+    pos_new = np.empty_like(pos)
+    vel_new = np.empty_like(vel)
+    for m in numba.prange(pos.shape[0]):
+        pos_new[m], vel_new[m] = binary_rk4_step(pos[m], vel[m], dt, G, m1[m], m2[m], c)
+    return pos_new, vel_new
+
+@numba.njit(cache=True)
+def stumpff(z):
+    if z > 1.0:
+        s = math.sqrt(z)
+        return (1 - math.cos(s)) / z, (s - math.sin(s)) / (s * s * s)
+    if z < -1.0:
+        s = math.sqrt(-z)
+        return (math.cosh(s) - 1) / -z, (math.sinh(s) - s) / (s * s * s)
+    c2 = 0.0
+    c3 = 0.0
+    power = 1.0
+    fact2 = 2.0  # (2k + 2)!
+    fact3 = 6.0  # (2k + 3)!
+    for k in range(10):
+        c2 += power / fact2
+        c3 += power / fact3
+        power *= -z
+        fact2 *= (2 * k + 3) * (2 * k + 4)
+        fact3 *= (2 * k + 4) * (2 * k + 5)
+    return c2, c3
+
+@numba.njit(cache=True)
+def kepler_drift(pos, vel, mu, dt, tol, max_iter):
+    n, dim = pos.shape
+    new_pos = np.empty_like(pos)
+    new_vel = np.empty_like(vel)
+    for i in range(n):
+        r0 = 0.0
+        v2 = 0.0
+        rv = 0.0
+        for k in range(dim):
+            r0 += pos[i, k] * pos[i, k]
+            v2 += vel[i, k] * vel[i, k]
+            rv += pos[i, k] * vel[i, k]
+        r0 = math.sqrt(r0)
+        if r0 == 0.0 or mu[i] == 0.0:  # no orbit: move in a straight line
+            for k in range(dim):
+                new_pos[i, k] = pos[i, k] + vel[i, k] * dt
+                new_vel[i, k] = vel[i, k]
+            continue
+        sqrt_mu = math.sqrt(mu[i])
+        alpha = 2.0 / r0 - v2 / mu[i]
+        t = dt
+        if alpha > 0:
+            t = np.fmod(t, 2 * math.pi / (sqrt_mu * alpha ** 1.5))
+        sigma0 = rv / sqrt_mu
+        chi = sqrt_mu * t / r0
+        if alpha < 0:
+            a = 1.0 / alpha
+            sign = 1.0 if t >= 0 else -1.0
+            arg = -2 * mu[i] * alpha * t / (rv + sign * math.sqrt(-mu[i] * a) * (1 - r0 * alpha))
+            if arg > 0:
+                guess = sign * math.sqrt(-a) * math.log(arg)
+                if abs(guess) < abs(chi):
+                    chi = guess
+        for _ in range(max_iter):
+            z = alpha * chi * chi
+            c2, c3 = stumpff(z)
+            f = sigma0 * chi * chi * c2 + (1 - alpha * r0) * chi ** 3 * c3 + r0 * chi - sqrt_mu * t
+            df = sigma0 * chi * (1 - z * c3) + (1 - alpha * r0) * chi * chi * c2 + r0
+            ddf = sigma0 * (1 - z * c2) + (1 - alpha * r0) * chi * (1 - z * c3)
+            delta = 5.0 * f / (df + math.sqrt(abs(16.0 * df * df - 20.0 * f * ddf)))
+            chi -= delta
+            if abs(delta) <= tol * max(abs(chi), 1e-300):
+                break
+
+        z = alpha * chi * chi
+        c2, c3 = stumpff(z)
+        f = 1 - chi * chi * c2 / r0
+        g = t - chi ** 3 * c3 / sqrt_mu
+        r = 0.0
+        for k in range(dim):
+            new_pos[i, k] = f * pos[i, k] + g * vel[i, k]
+            r += new_pos[i, k] * new_pos[i, k]
+        r = math.sqrt(r)
+        fdot = sqrt_mu / (r * r0) * chi * (z * c3 - 1)
+        gdot = 1 - chi * chi * c2 / r
+        for k in range(dim):
+            new_vel[i, k] = fdot * pos[i, k] + gdot * vel[i, k]
+    return new_pos, new_vel
@@ -0,0 +1,98 @@
+"""Conservation diagnostics: energy, linear momentum and angular momentum, and their drift.
+
+For an isolated system all three are constant, so their drift from the starting values
+measures the integration error directly. Watching it is how to tell whether a larger dt (or a
+cheaper integrator) still gives a trustworthy run.
+
+The potential energy takes its pair distances from System.geometry, so a collision or merger
+check at the same state reuses them. It cannot reuse the force pass's distances: the force
+kernels never store theirs, as doing so would slow down every step (see nbody.geometry) to
+speed up the occasional diagnostic.
+"""
+import numpy as np
+
+
+def kinetic_energy(mass, vel):
+    return 0.5 * np.sum(mass * np.einsum('...ij,...ij->...i', vel, vel), axis=-1)
+
+
+def linear_momentum(mass, vel):
+    return np.sum(mass[..., np.newaxis] * vel, axis=-2)
+
+
+def angular_momentum(mass, pos, vel):
+    """Total angular momentum about the origin: a scalar (z component) in 2D, a vector in 3D."""
+    if pos.shape[-1] == 2:
+        return np.sum(mass * (pos[..., 0] * vel[..., 1] - pos[..., 1] * vel[..., 0]), axis=-1)
+    return np.sum(mass[..., np.newaxis] * np.cross(pos, vel), axis=-2)
+
+
+def conserved_quantities(system):
+    """(energy, momentum, angular momentum) of system, using its potential_energy for the forces
+    (by default from the pair distances cached in system.geometry())."""
+    mass = system.mass
+    energy = kinetic_energy(mass, system.vel) + system.potential_energy(system.pos)
+    return energy, linear_momentum(mass, system.vel), angular_momentum(mass, system.pos, system.vel)
+
+
+class Diagnostics:
+    """Track the drift of energy, momentum and angular momentum every few steps.
+
+    Pass it as monitor to nbody.integrate (or integrate_batch), or call it after each step.
+    The first call sets the reference values; every `every` calls after that the quantities
+    are evaluated again and their relative drift is stored, and passed to log (e.g. print)
+    if given. Momentum and angular momentum drifts are relative to the sum of the bodies'
+    own |m v| and |m r x v|, since the totals themselves are often zero.
+
+    t, energy, momentum and angular_momentum hold every evaluation; drift() gives the
+    relative drifts of each.
+    """
+
+    def __init__(self, every=100, log=None):
+        self.every = every
+        self.log = log
+        self.calls = 0
+        self.t = []
+        self.energy = []
+        self.momentum = []
+        self.angular_momentum = []
+        self._scale = None
+
+    def __call__(self, system, members=None):
+        self.calls += 1
+        if (self.calls - 1) % self.every:
+            return
+        energy, momentum, spin = conserved_quantities(system)
+        if self._scale is None:
+            speed = np.linalg.norm(system.vel, axis=-1)
+            lever = np.linalg.norm(np.cross(system.pos, system.vel), axis=-1) if system.dim == 3 else \
+                np.abs(system.pos[..., 0] * system.vel[..., 1] - system.pos[..., 1] * system.vel[..., 0])
+            self._scale = (np.abs(energy), np.sum(system.mass * speed, axis=-1), np.sum(system.mass * lever, axis=-1))
+            self._members = None if members is None else len(members)
+        if members is not None:
+            energy, momentum, spin = (self._full(x, members) for x in (energy, momentum, spin))
+        self.t.append(system.t)
+        self.energy.append(energy)
+        self.momentum.append(momentum)
+        self.angular_momentum.append(spin)
+        if self.log is not None:
+            d_energy, d_momentum, d_spin = (np.nanmax(d) for d in self._relative(energy, momentum, spin))
+            self.log("t = %.6g  dE/E = %.3e  dP = %.3e  dL = %.3e" % (system.t, d_energy, d_momentum, d_spin))
+
+    def _full(self, x, members):
+        """x (one entry per running member) widened to every member, NaN for those gone."""
+        full = np.full((self._members,) + np.shape(x)[1:], np.nan)
+        full[members] = x
+        return full
+
+    def _relative(self, energy, momentum, spin):
+        e_scale, p_scale, l_scale = self._scale
+        d_energy = np.abs(energy - self.energy[0]) / e_scale
+        d_momentum = np.linalg.norm(momentum - self.momentum[0], axis=-1) / p_scale
+        d_spin = spin - self.angular_momentum[0]
+        d_spin = (np.linalg.norm(d_spin, axis=-1) if np.ndim(d_spin) > np.ndim(energy) else np.abs(d_spin)) / l_scale
+        return d_energy, d_momentum, d_spin
+
+    def drift(self):
+        """Relative drift of (energy, momentum, angular momentum) at each evaluation, shape (evaluations, ...)."""
+        return self._relative(np.asarray(self.energy), np.asarray(self.momentum), np.asarray(self.angular_momentum))
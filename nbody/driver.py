@@ -0,0 +1,132 @@
+import numpy as np
+
+from .integrators import velocity_verlet_step
+from .profiling import Profiler
+
+_NO_PROFILER = Profiler(enabled=False)
+
+
+def _records(system, steps, dt, step, record_every, stop, checkpoint, monitor, profiler):
+    """Advance the system, yielding after every step that should be recorded."""
+    for i in range(1, steps + 1):
+        h = dt(system) if callable(dt) else dt
+        with profiler.phase("step"):
+            step(system, h)
+        system.t += h
+        if monitor is not None:
+            with profiler.phase("monitor"):
+                monitor(system)
+        if checkpoint is not None:
+            with profiler.phase("checkpoint"):
+                checkpoint(system)
+        done = stop is not None and stop(system)
+        if i % record_every == 0 or done:
+            yield
+        if done:
+            break
+    if checkpoint is not None:
+        checkpoint.save(system)
+
+
+def integrate(system, steps, dt, step=velocity_verlet_step, record_every=1, stop=None, writer=None,
+              checkpoint=None, monitor=None, profiler=None):
+    """Integrate a System with no display attached and return its trajectory.
+
+    Returns (t, pos, vel) where pos and vel have shape (records, N, D). Integration ends
+    early, with the arrays trimmed, as soon as stop(system) returns True. dt may also be a
+    function dt(system) giving each step's size from the current state, e.g. a fraction of
+    an orbital period; the recorded t then tracks the variable steps.
+
+    With a writer (see nbody.trajectory.TrajectoryWriter) the records are streamed to disk
+    instead of kept in memory; the writer is closed at the end and the memory-mapped
+    Trajectory it returns, which unpacks as (t, pos, vel), is returned instead.
+
+    checkpoint (see nbody.checkpoint.Checkpointer) is called after every step to save the
+    state periodically, and once more at the end. It also saves and restores the state of
+    step, if step keeps any (e.g. the adaptive integrators' sub-step size), and the length of
+    the writer's file.
+
+    monitor(system) is called with the initial state and after every step, e.g. an
+    nbody.gw.StrainRecorder sampling the gravitational-wave signal as the run goes.
+
+    profiler (see nbody.profiling.Profiler) times the step, monitor, checkpoint and record
+    phases of every step; it is started here if it is not running already.
+    """
+    profiler = _NO_PROFILER if profiler is None else profiler.start()
+    if checkpoint is not None:
+        checkpoint.track(step, writer)
+    if monitor is not None:
+        monitor(system)
+    if writer is not None:
+        writer.append(system.t, system.pos, system.vel)
+        for _ in _records(system, steps, dt, step, record_every, stop, checkpoint, monitor, profiler):
+            with profiler.phase("record"):
+                writer.append(system.t, system.pos, system.vel)
+        return writer.close()
+
+    n_records = steps // record_every + 1
+    t = np.empty(n_records)
+    pos = np.empty((n_records,) + system.pos.shape)
+    vel = np.empty((n_records,) + system.vel.shape)
+    t[0], pos[0], vel[0] = system.t, system.pos, system.vel
+
+    n = 1
+    for _ in _records(system, steps, dt, step, record_every, stop, checkpoint, monitor, profiler):
+        with profiler.phase("record"):
+            t[n], pos[n], vel[n] = system.t, system.pos, system.vel
+        n += 1
+    return t[:n], pos[:n], vel[:n]
+
+
+def integrate_batch(system, steps, dt, step=velocity_verlet_step, record_every=1, stop=None, monitor=None,
+                    profiler=None):
+    """Integrate every member of a batched System (see System.batch) in one vectorized pass.
+
+    stop(system) returns one flag per running member. A member that stops is frozen and dropped
+    from the batch, so later steps only advance the members still running, and its records
+    after that repeat its final state. Integration ends early, with the arrays trimmed, once
+    every member has stopped; the system is left holding the members that never stopped.
+
+    Returns (t, pos, vel, t_end) where pos and vel have shape (records, M, N, D) and t_end
+    holds the time at which each member stopped (the final time for those that never did).
+
+    monitor(system, members) is called with the initial state and after every step, members
+    being the indices of the members the system still holds. profiler is as in integrate.
+    """
+    profiler = _NO_PROFILER if profiler is None else profiler.start()
+    n_records = steps // record_every + 1
+    t = np.empty(n_records)
+    pos = np.empty((n_records,) + system.pos.shape)
+    vel = np.empty((n_records,) + system.vel.shape)
+    t[0], pos[0], vel[0] = system.t, system.pos, system.vel
+
+    # Latest state of every member, running or frozen
+    state_pos, state_vel = system.pos.copy(), system.vel.copy()
+    t_end = np.full(len(state_pos), np.nan)
+    running = np.arange(len(state_pos))
+    if monitor is not None:
+        monitor(system, running)
+
+    n = 1
+    for i in range(1, steps + 1):
+        with profiler.phase("step"):
+            step(system, dt)
+        system.t += dt
+        state_pos[running], state_vel[running] = system.pos, system.vel
+        if monitor is not None:
+            with profiler.phase("monitor"):
+                monitor(system, running)
+        if stop is not None:
+            done = np.asarray(stop(system), dtype=bool)
+            if done.any():
+                t_end[running[done]] = system.t
+                running = running[~done]
+                system.keep_members(~done)
+        finished = len(running) == 0
+        if i % record_every == 0 or finished:
+            t[n], pos[n], vel[n] = system.t, state_pos, state_vel
+            n += 1
+        if finished:
+            break
+    t_end[running] = system.t
+    return t[:n], pos[:n], vel[:n], t_end
@@ -0,0 +1,184 @@
+"""Close-encounter detection and collision handling.
+
+Bodies are treated as spheres. Finding which of them touch by testing all N^2 / 2 pairs is
+hopeless for ring or debris runs of 10^5 particles, so candidate pairs come from a uniform
+grid instead (a spatial hash): with cells at least as wide as the largest body, two
+touching bodies always sit in the same or neighbouring cells, and each body is only checked
+against the few others near it. Small systems use the shared System.geometry directly.
+
+Collisions applies the outcome after each step: merging the pair into one body (mass and
+momentum conserved) or bouncing them apart.
+"""
+import itertools
+
+import numpy as np
+
+# Systems this small test every pair through System.geometry rather than a spatial hash
+HASH_BODIES = 256
+# Bodies with radii more than this many times the median are checked against every other body
+BIG_RADIUS = 8
+
+
+def _neighbour_offsets(dim):
+    """The zero offset plus one of each +/- pair of neighbouring cell offsets, so each cell pair is seen once."""
+    offsets = [o for o in itertools.product((-1, 0, 1), repeat=dim) if o > (0,) * dim]
+    return np.array([(0,) * dim] + offsets, dtype=np.int64)
+
+
+def candidate_pairs(pos, cell):
+    """Pairs (i, j), i < j, of bodies in the same or adjacent cells of a grid of spacing cell.
+
+    pos has shape (N, D). Every pair closer than cell is included, along with some further apart.
+    """
+    n, dim = pos.shape
+    # Integer cell coordinates, clipped to a window around the median that keeps the cell keys
+    # inside int64; clipping never separates neighbouring cells, so no touching pair is lost
+    cells = np.floor(pos / cell)
+    half = 2.0 ** (62 // dim - 2)
+    cells = np.clip(cells - np.median(cells, axis=0), -half, half).astype(np.int64)
+    coords = cells - cells.min(axis=0) + 1  # one empty cell of padding below, so offsets stay >= 0
+    extent = coords.max(axis=0) + 2
+    strides = np.concatenate([[1], np.cumprod(extent[:-1])])
+    key = coords @ strides
+    order = np.argsort(key, kind='stable')
+    sorted_key = key[order]
+
+    pairs_i, pairs_j = [], []
+    for offset in _neighbour_offsets(dim):
+        neighbour = sorted_key + offset @ strides  # sorted too, which keeps the searches cache-friendly
+        start = np.searchsorted(sorted_key, neighbour, side='left')
+        count = np.searchsorted(sorted_key, neighbour, side='right') - start
+        total = count.sum()
+        if total == 0:
+            continue
+        i = order[np.repeat(np.arange(n), count)]
+        first = np.repeat(start - np.cumsum(count) + count, count)
+        j = order[first + np.arange(total)]
+        if not offset.any():  # same cell: each pair appears both ways round, and with itself
+            keep = i < j
+            i, j = i[keep], j[keep]
+        pairs_i.append(i)
+        pairs_j.append(j)
+    if not pairs_i:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    i, j = np.concatenate(pairs_i), np.concatenate(pairs_j)
+    return np.minimum(i, j), np.maximum(i, j)
+
+
+def touching_pairs(pos, radius):
+    """Pairs (i, j), i < j, of spheres that overlap: |pos_i - pos_j| < radius_i + radius_j.
+
+    Bodies much larger than the typical one (a planet among ring particles) would make every
+    grid cell huge, so they are instead tested against every other body directly.
+    """
+    radius = np.broadcast_to(np.asarray(radius, dtype=float), pos.shape[:1])
+    if len(pos) < 2 or not radius.max() > 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    big = radius > BIG_RADIUS * np.median(radius)
+    small = np.flatnonzero(~big)
+    i, j = np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    if len(small) > 1 and radius[small].max() > 0:
+        i, j = candidate_pairs(pos[small], 2 * radius[small].max())
+        i, j = small[i], small[j]
+    pairs_i, pairs_j = [i], [j]
+    for b in np.flatnonzero(big):
+        others = np.flatnonzero(~big | (np.arange(len(pos)) > b))  # each big-big pair once
+        pairs_i.append(np.minimum(b, others))
+        pairs_j.append(np.maximum(b, others))
+    i, j = np.concatenate(pairs_i), np.concatenate(pairs_j)
+    r = pos[j] - pos[i]
+    touching = np.einsum('pk,pk->p', r, r) < (radius[i] + radius[j]) ** 2
+    return i[touching], j[touching]
+
+
+class Collisions:
+    """Detect touching bodies after each step and merge or bounce them.
+
+    Pass it as monitor to nbody.integrate or call it after every step; it works on single
+    (unbatched) systems. radius is one value for every body or one per body.
+
+    mode "merge" combines each touching pair into the lower-indexed body: masses add, it
+    moves to the pair's centre of mass with their total momentum, and its radius grows to
+    hold both volumes. So that the arrays keep their shape, the other body stays on as a
+    massless passenger riding on the survivor (absorbed[k] is the body it joined, -1 while
+    it is free) and takes no further part. mode "bounce" reverses the approaching part of
+    each pair's relative velocity, scaled by restitution (1 is perfectly elastic).
+
+    events counts the collisions handled so far.
+    """
+
+    def __init__(self, radius, mode="merge", restitution=1.0):
+        if mode not in ("merge", "bounce"):
+            raise ValueError("Unknown collision mode %r, expected 'merge' or 'bounce'" % mode)
+        self.radius = radius
+        self.mode = mode
+        self.restitution = restitution
+        self.absorbed = None
+        self.events = 0
+
+    def pairs(self, system):
+        """Touching pairs (i, j), i < j, among the bodies still free."""
+        radius = np.broadcast_to(np.asarray(self.radius, dtype=float), (len(system),))
+        if len(system) <= HASH_BODIES:
+            geometry = system.geometry()
+            touching = geometry.closer_than(radius[geometry.i] + radius[geometry.j])
+            i, j = geometry.i[touching], geometry.j[touching]
+            keep = (self.absorbed[i] < 0) & (self.absorbed[j] < 0)
+            return i[keep], j[keep]
+        free = np.flatnonzero(self.absorbed < 0)
+        i, j = touching_pairs(system.pos[free], radius[free])
+        return free[i], free[j]
+
+    def __call__(self, system, members=None):
+        if self.absorbed is None:
+            self.absorbed = np.full(len(system), -1)
+            self.radius = np.array(np.broadcast_to(np.asarray(self.radius, dtype=float), (len(system),)))
+        i, j = self.pairs(system)
+        if len(i):
+            if self.mode == "merge":
+                self._merge(system, i, j)
+            else:
+                self._bounce(system, i, j)
+        if self.mode == "merge":
+            self._carry(system)
+
+    def _bounce(self, system, i, j):
+        mass = system.mass
+        normal = system.pos[j] - system.pos[i]
+        dist = np.linalg.norm(normal, axis=-1, keepdims=True)
+        with np.errstate(invalid='ignore'):
+            normal /= dist
+        closing = np.einsum('pk,pk->p', system.vel[j] - system.vel[i], normal)
+        approaching = closing < 0  # False for coincident bodies, which have no normal
+        self.events += np.count_nonzero(approaching)
+        i, j, normal, closing = i[approaching], j[approaching], normal[approaching], closing[approaching]
+        impulse = ((1 + self.restitution) * mass[i] * mass[j] / (mass[i] + mass[j]) * closing)[:, np.newaxis] * normal
+        np.add.at(system.vel, i, impulse / mass[i, np.newaxis])
+        np.add.at(system.vel, j, -impulse / mass[j, np.newaxis])
+
+    def _merge(self, system, i, j):
+        # One pair at a time, as a body may touch several others; pairs whose bodies were
+        # already merged this step are caught on the next one
+        for a, b in zip(i, j):
+            if self.absorbed[a] >= 0 or self.absorbed[b] >= 0:
+                continue
+            m_a, m_b = system.mass[a], system.mass[b]
+            total = m_a + m_b
+            system.pos[a] = (m_a * system.pos[a] + m_b * system.pos[b]) / total
+            system.vel[a] = (m_a * system.vel[a] + m_b * system.vel[b]) / total
+            system.mass[a], system.mass[b] = total, 0.0
+            self.radius[a] = np.cbrt(self.radius[a] ** 3 + self.radius[b] ** 3)
+            self.radius[b] = 0.0
+            self.absorbed[self.absorbed == b] = a
+            self.absorbed[b] = a
+            self.events += 1
+        system.compute_acceleration()
+
+    def _carry(self, system):
+        """Keep absorbed bodies on their survivor, so they neither drift nor pull."""
+        gone = np.flatnonzero(self.absorbed >= 0)
+        if len(gone):
+            host = self.absorbed[gone]
+            system.pos[gone] = system.pos[host]
+            system.vel[gone] = system.vel[host]
+            system.acc[gone] = system.acc[host]
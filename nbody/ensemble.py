@@ -0,0 +1,144 @@
+"""Ensembles of perturbed initial states, integrated across a process pool.
+
+Each member is a copy of a template System started from its own positions and velocities.
+Members are split into chunks, one chunk per task, and every member is compared against the
+unperturbed reference run to measure how fast nearby trajectories separate. By default a chunk
+is integrated as one batched system, so small systems do not pay Python overhead per member.
+"""
+import copy
+import multiprocessing
+import os
+
+import numpy as np
+
+from .driver import integrate, integrate_batch
+from .integrators import velocity_verlet_step
+
+
+# =========================
+# INITIAL STATES
+# =========================
+def random_perturbations(system, n_members, pos_scale=0.0, vel_scale=0.0, bodies=None, seed=None):
+    """n_members copies of the system state with Gaussian kicks; returns (pos, vel) of shape (M, N, D).
+
+    Only the listed bodies (names or indices) are perturbed; by default every body is.
+    """
+    rng = np.random.default_rng(seed)
+    pos = np.repeat(system.pos[np.newaxis], n_members, axis=0)
+    vel = np.repeat(system.vel[np.newaxis], n_members, axis=0)
+    index = _body_index(system, bodies)
+    shape = (n_members, len(index), system.dim)
+    pos[:, index] += pos_scale * rng.standard_normal(shape)
+    vel[:, index] += vel_scale * rng.standard_normal(shape)
+    return pos, vel
+
+
+def grid_perturbations(system, body, pos_offsets=(0.0,), vel_offsets=(0.0,), axis=0):
+    """Every combination of position and velocity offsets applied to one body along one axis."""
+    index = _body_index(system, [body])[0]
+    dp, dv = np.meshgrid(np.asarray(pos_offsets, dtype=float), np.asarray(vel_offsets, dtype=float), indexing='ij')
+    n_members = dp.size
+    pos = np.repeat(system.pos[np.newaxis], n_members, axis=0)
+    vel = np.repeat(system.vel[np.newaxis], n_members, axis=0)
+    pos[:, index, axis] += dp.ravel()
+    vel[:, index, axis] += dv.ravel()
+    return pos, vel
+
+
+def _body_index(system, bodies):
+    if bodies is None:
+        return np.arange(len(system))
+    return np.array([b if isinstance(b, (int, np.integer)) else system.index(b) for b in bodies])
+
+
+# =========================
+# DIVERGENCE
+# =========================
+def phase_distance(pos, vel, ref_pos, ref_vel, length, speed):
+    """Distance in phase space with positions scaled by length and velocities by speed."""
+    dx = (pos - ref_pos) / length
+    dv = (vel - ref_vel) / speed
+    return np.sqrt(np.sum(dx ** 2 + dv ** 2, axis=(-2, -1)))
+
+
+def lyapunov_estimate(t, divergence):
+    """Least-squares slope of ln(divergence) against time for every member (finite-time exponent)."""
+    keep = (t > t[0]) & np.all(divergence > 0, axis=0)
+    if keep.sum() < 2:
+        return np.full(len(divergence), np.nan)
+    x = t[keep] - t[keep].mean()
+    y = np.log(divergence[:, keep])
+    y = y - y.mean(axis=1, keepdims=True)
+    return (y @ x) / (x @ x)
+
+
+# =========================
+# RUNNER
+# =========================
+def _run_chunk(task):
+    template, pos, vel, steps, dt, step, record_every, ref_pos, ref_vel, length, speed, batch = task
+    if batch:
+        system = template.batch(pos, vel)
+        system.compute_acceleration()
+        _, p, v, _ = integrate_batch(system, steps, dt, step=step, record_every=record_every)
+        divergence = phase_distance(p, v, ref_pos[:, np.newaxis], ref_vel[:, np.newaxis], length, speed).T
+        return divergence, p[-1], v[-1]
+
+    divergence = np.empty((len(pos), len(ref_pos)))
+    final_pos, final_vel = np.empty_like(pos), np.empty_like(vel)
+    for m in range(len(pos)):
+        system = copy.deepcopy(template)
+        system.pos[...] = pos[m]
+        system.vel[...] = vel[m]
+        system.compute_acceleration()
+        _, p, v = integrate(system, steps, dt, step=step, record_every=record_every)
+        divergence[m] = phase_distance(p, v, ref_pos, ref_vel, length, speed)
+        final_pos[m], final_vel[m] = p[-1], v[-1]
+    return divergence, final_pos, final_vel
+
+
+def run_ensemble(system, pos, vel, steps, dt, step=velocity_verlet_step, record_every=1,
+                 processes=None, chunk_size=None, batch=True):
+    """Integrate every member state (pos, vel of shape (M, N, D)) and compare it with the reference.
+
+    The reference run is the template system as given. Members are split into chunks of
+    chunk_size (by default four chunks per process) and farmed out to a process pool; with
+    processes=1 everything runs in the calling process. Each chunk advances as one batched
+    system (see System.batch); pass batch=False for step functions that only handle a single
+    system, such as BlockTimestepper, to integrate members one at a time.
+
+    Returns a dict with
+      t           record times, shape (R,)
+      divergence  phase-space distance from the reference run, shape (M, R)
+      lyapunov    finite-time Lyapunov exponent estimate per member, shape (M,)
+      final_pos, final_vel   member states at the end of the run, shape (M, N, D)
+    """
+    reference = copy.deepcopy(system)
+    reference.compute_acceleration()
+    t, ref_pos, ref_vel = integrate(reference, steps, dt, step=step, record_every=record_every)
+
+    # Scales that make position and velocity differences comparable
+    length = np.sqrt(np.mean(ref_pos ** 2)) or 1.0
+    speed = np.sqrt(np.mean(ref_vel ** 2)) or 1.0
+
+    processes = processes or os.cpu_count() or 1
+    n_members = len(pos)
+    chunk_size = chunk_size or max(1, -(-n_members // (4 * processes)))
+    tasks = [(system, pos[i:i + chunk_size], vel[i:i + chunk_size], steps, dt, step, record_every,
+              ref_pos, ref_vel, length, speed, batch)
+             for i in range(0, n_members, chunk_size)]
+
+    if processes == 1:
+        results = [_run_chunk(task) for task in tasks]
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.map(_run_chunk, tasks)
+
+    divergence = np.concatenate([r[0] for r in results])
+    return {
+        "t": t,
+        "divergence": divergence,
+        "lyapunov": lyapunov_estimate(t, divergence),
+        "final_pos": np.concatenate([r[1] for r in results]),
+        "final_vel": np.concatenate([r[2] for r in results]),
+    }
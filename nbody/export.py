@@ -0,0 +1,276 @@
+"""Headless video and GIF export.
+
+The trajectory is integrated first (or read from a trajectory file), then the frames are
+split into contiguous ranges and drawn by a pool of worker processes, each with its own
+offscreen Agg canvas. Finished frames come back in order and are streamed straight into an
+encoder: ffmpeg through a pipe for video, or Pillow for GIFs when ffmpeg is not installed.
+Only WINDOW ranges per process are handed out ahead of the encoder, so the raw frames in
+memory stay bounded however long the video is. The GIF encoder is the exception: Pillow
+writes a GIF in one go, so it keeps every (quantized) frame until the end.
+
+A style dict describes how to draw a run; every simulation provides one via export_style():
+
+    names          body names (defaults to the trajectory header)
+    colors, sizes  marker colour and size per body
+    radii          draw bodies as circles of these radii in data units instead of markers
+    trail_length   frames of trail per body (an int or one per body), 0 for none
+    limits         (xmin, xmax, ymin, ymax), or follow=(body, half_width) to track a body
+    title, facecolor, figsize, dpi, axes ("on" or "off")
+
+Run it from the command line:
+
+    python -m nbody.export solar_system solar.mp4 --steps 2000 --processes 8
+"""
+import argparse
+import collections
+import math
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+
+import numpy as np
+
+from .render import decimate
+from .trajectory import Trajectory, write_trajectory
+
+CHUNK_FRAMES = 64  # Largest range of frames drawn by one task
+WINDOW = 2  # Ranges per process rendered ahead of the encoder
+
+
+# =========================
+# FRAME RENDERING
+# =========================
+class Painter:
+    """Draws frames of a trajectory on an offscreen Agg figure, one per call."""
+
+    def __init__(self, style, n_bodies):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        from matplotlib.patches import Circle
+
+        self.style = style
+        self.figure = Figure(figsize=style.get("figsize", (6, 6)), dpi=style.get("dpi", 100))
+        self.canvas = FigureCanvasAgg(self.figure)
+        facecolor = style.get("facecolor", "black")
+        self.figure.set_facecolor(facecolor)
+        ax = self.ax = self.figure.add_subplot(111)
+        ax.set_facecolor(facecolor)
+        ax.set_aspect("equal")
+        if style.get("title"):
+            ax.set_title(style["title"], color="white")
+        if style.get("axes", "on") == "off":
+            ax.set_axis_off()
+        ax.tick_params(colors="white")
+        for spine in ax.spines.values():
+            spine.set_edgecolor("white")
+        if "limits" in style:
+            xmin, xmax, ymin, ymax = style["limits"]
+            ax.set_xlim(xmin, xmax)
+            ax.set_ylim(ymin, ymax)
+
+        colors = style.get("colors", ["white"] * n_bodies)
+        trail_length = style.get("trail_length", 0)
+        self.trail_length = np.broadcast_to(trail_length, (n_bodies,))
+        self.trails = [ax.plot([], [], "-", lw=0.7, color=color, alpha=0.6)[0] for color in colors]
+        if "radii" in style:
+            self.markers = [Circle((0, 0), r, color=color, zorder=3) for r, color in zip(style["radii"], colors)]
+            for marker in self.markers:
+                ax.add_patch(marker)
+        else:
+            sizes = style.get("sizes", [4] * n_bodies)
+            self.markers = [ax.plot([], [], "o", color=color, markersize=size)[0] for color, size in zip(colors, sizes)]
+
+    def draw(self, pos, k, every=1):
+        """Render record k of pos (records, N, D); trails use every record in their window."""
+        for i, (marker, trail) in enumerate(zip(self.markers, self.trails)):
+            x, y = pos[k, i, 0], pos[k, i, 1]
+            if hasattr(marker, "set_center"):
+                marker.set_center((x, y))
+            else:
+                marker.set_data([x], [y])
+            length = int(self.trail_length[i])
+            if length:
+                window = np.asarray(pos[max(0, k - length * every + 1):k + 1, i, :2]).T
+                trail.set_data(*decimate(window, length))
+        if "follow" in self.style:
+            body, half = self.style["follow"]
+            self.ax.set_xlim(pos[k, body, 0] - half, pos[k, body, 0] + half)
+            self.ax.set_ylim(pos[k, body, 1] - half, pos[k, body, 1] + half)
+        self.canvas.draw()
+        return np.asarray(self.canvas.buffer_rgba())[..., :3].tobytes()
+
+    @property
+    def size(self):
+        return self.canvas.get_width_height()
+
+
+def _render_range(task):
+    path, style, start, stop, every = task
+    trajectory = Trajectory(path)
+    painter = Painter(style, len(trajectory.names))
+    frames = [painter.draw(trajectory.pos, k * every, every) for k in range(start, stop)]
+    return painter.size, frames
+
+
+# =========================
+# ENCODERS
+# =========================
+class FFmpegEncoder:
+    """Pipe raw RGB frames into ffmpeg; the container and codec follow the file extension."""
+
+    def __init__(self, output, size, fps):
+        if shutil.which("ffmpeg") is None:
+            raise RuntimeError("Exporting %s needs ffmpeg on the PATH" % output)
+        width, height = size
+        command = ["ffmpeg", "-y", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "rgb24",
+                   "-s", "%dx%d" % (width, height), "-r", str(fps), "-i", "-"]
+        if not output.lower().endswith(".gif"):
+            command += ["-pix_fmt", "yuv420p", "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2"]
+        self.process = subprocess.Popen(command + [output], stdin=subprocess.PIPE)
+
+    def write(self, frame):
+        self.process.stdin.write(frame)
+
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise RuntimeError("ffmpeg exited with status %d" % self.process.returncode)
+
+
+class GifEncoder:
+    """Quantize frames with Pillow as they arrive and write the GIF when closed.
+
+    Pillow needs every frame to write the file, so they are all kept until then: about a
+    third of the raw size, as one byte per pixel.
+    """
+
+    def __init__(self, output, size, fps):
+        from PIL import Image
+        self.Image = Image
+        self.output = output
+        self.size = size
+        self.duration = int(round(1000 / fps))
+        self.frames = []
+
+    def write(self, frame):
+        image = self.Image.frombytes("RGB", self.size, frame)
+        self.frames.append(image.quantize(colors=256))
+
+    def close(self):
+        first, *rest = self.frames
+        first.save(self.output, save_all=True, append_images=rest, duration=self.duration, loop=0)
+
+
+def open_encoder(output, size, fps):
+    """ffmpeg when it is installed, otherwise Pillow (GIF only)."""
+    if shutil.which("ffmpeg") is not None:
+        return FFmpegEncoder(output, size, fps)
+    if output.lower().endswith(".gif"):
+        return GifEncoder(output, size, fps)
+    raise RuntimeError("Exporting %s needs ffmpeg on the PATH (or export a .gif)" % output)
+
+
+# =========================
+# PIPELINE
+# =========================
+def _in_order(pool, tasks, window):
+    """_render_range of every task, in order, with at most window tasks rendering or waiting."""
+    pending = collections.deque()
+    for task in tasks:
+        if len(pending) == window:
+            yield pending.popleft().get()
+        pending.append(pool.apply_async(_render_range, (task,)))
+    while pending:
+        yield pending.popleft().get()
+
+
+def _encode(results, output, fps):
+    """Feed rendered frame ranges, in order, into an encoder opened on the first one."""
+    encoder = None
+    try:
+        for size, frames in results:
+            if encoder is None:
+                encoder = open_encoder(output, size, fps)
+            for frame in frames:
+                encoder.write(frame)
+    finally:
+        if encoder is not None:
+            encoder.close()
+
+
+def export(trajectory, output, style, fps=30, every=1, processes=None, chunk_size=None):
+    """Render every every-th record of trajectory to output, in parallel.
+
+    trajectory is a trajectory file path, a Trajectory, or (t, pos, vel) arrays. Frames are
+    drawn in contiguous ranges of chunk_size (by default four ranges per process, at most
+    CHUNK_FRAMES) so each worker reuses one figure per range, and at most WINDOW ranges per
+    process are drawn ahead of the encoder; with processes=1 everything runs in the calling
+    process. Returns the number of frames written.
+    """
+    tmp = None
+    if isinstance(trajectory, Trajectory):
+        path = trajectory.path
+    elif isinstance(trajectory, (str, os.PathLike)):
+        path = trajectory
+    else:
+        t, pos, vel = trajectory
+        fd, tmp = tempfile.mkstemp(suffix=".trj")
+        os.close(fd)
+        names = style.get("names", ["body %d" % i for i in range(np.shape(pos)[1])])
+        write_trajectory(tmp, names, np.zeros(len(names)), float(t[1] - t[0]) if len(t) > 1 else 0.0, t, pos, vel)
+        path = tmp
+
+    try:
+        n_frames = (len(Trajectory(path)) - 1) // every + 1
+        processes = processes or os.cpu_count() or 1
+        chunk_size = chunk_size or max(1, min(math.ceil(n_frames / (4 * processes)), CHUNK_FRAMES))
+        tasks = [(path, style, start, min(start + chunk_size, n_frames), every)
+                 for start in range(0, n_frames, chunk_size)]
+
+        if processes == 1:
+            _encode(map(_render_range, tasks), output, fps)
+        else:
+            with multiprocessing.Pool(processes) as pool:
+                _encode(_in_order(pool, tasks, WINDOW * processes), output, fps)
+        return n_frames
+    finally:
+        if tmp is not None:
+            os.remove(tmp)
+
+
+def export_simulation(name, output, steps=1000, dt=None, trajectory=None, **kwargs):
+    """Integrate (or read) a simulation headless and export it with that script's export_style()."""
+    from . import simulations
+    module = simulations.load(name)
+    style = module.export_style()
+    if trajectory is None:
+        fd, trajectory = tempfile.mkstemp(suffix=".trj")
+        os.close(fd)
+        try:
+            simulations.run(name, steps, dt, path=trajectory)
+            return export(trajectory, output, style, **kwargs)
+        finally:
+            os.remove(trajectory)
+    return export(trajectory, output, style, **kwargs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render a simulation to a video or GIF without a display.")
+    parser.add_argument("simulation", help="one of the names in nbody.simulations.SIMULATIONS")
+    parser.add_argument("output", help="output file, e.g. run.mp4 or run.gif")
+    parser.add_argument("--steps", type=int, default=1000, help="steps to integrate (default 1000)")
+    parser.add_argument("--dt", type=float, default=None, help="time step (default: the script's own)")
+    parser.add_argument("--trajectory", default=None, help="read a stored trajectory file instead of integrating")
+    parser.add_argument("--every", type=int, default=1, help="draw every n-th record (default 1)")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+    n = export_simulation(args.simulation, args.output, args.steps, args.dt, args.trajectory,
+                          fps=args.fps, every=args.every, processes=args.processes)
+    print("Wrote %d frames to %s" % (n, args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Pair geometry of one state, computed once and shared.
+
+The potential energy, close-encounter checks and merger tests all need the distance between
+every pair of bodies at the same positions. PairGeometry works it out once, over the pairs
+i < j only (the other half is the same pair seen from the other side), and System.geometry
+keeps it for as long as the positions stay unchanged. It stores O(N^2) numbers, so it is
+meant for systems of up to a few thousand bodies.
+
+The force kernels do not use it. The compiled kernel's fused loop is faster than writing the
+separations out and reading them back, and for the NumPy fallback scattering per-pair forces
+back onto bodies costs more than the halved distance work saves (about 1.2x to 2.4x slower
+from 10 to 1000 bodies), so both take the distances they need directly.
+"""
+import functools
+
+import numpy as np
+
+
+@functools.lru_cache(maxsize=8)
+def pair_indices(n):
+    """Index arrays (i, j) of every pair i < j of n bodies."""
+    i, j = np.triu_indices(n, 1)
+    i.flags.writeable = False
+    j.flags.writeable = False
+    return i, j
+
+
+class PairGeometry:
+    """Separations of every pair i < j of pos, of shape (N, D) or (..., N, D) for a batch.
+
+    r[..., p, :] points from body i[p] to body j[p] and dist holds its length.
+    """
+
+    def __init__(self, pos):
+        self.pos = np.array(pos, dtype=float)
+        self.i, self.j = pair_indices(self.pos.shape[-2])
+        self.r = self.pos[..., self.j, :] - self.pos[..., self.i, :]
+        self.dist = np.sqrt(np.einsum('...pk,...pk->...p', self.r, self.r))
+
+    def matches(self, pos):
+        """True if pos is the state this geometry was computed for."""
+        return np.shape(pos) == self.pos.shape and np.array_equal(pos, self.pos)
+
+    def potential(self, mass, G, interactions=None):
+        """Newtonian potential energy (one value per member of a batch); pairs count where interactions[i, j]."""
+        with np.errstate(divide='ignore'):
+            inv_dist = 1.0 / self.dist
+        inv_dist[self.dist == 0] = 0.0
+        if interactions is not None:
+            inv_dist = inv_dist * interactions[self.i, self.j]
+        return -G * np.sum(mass[..., self.i] * mass[..., self.j] * inv_dist, axis=-1)
+
+    def closer_than(self, distance):
+        """Mask over the pairs (shape (..., P)) of those closer than distance, which may vary per pair."""
+        return self.dist < distance
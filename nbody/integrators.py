@@ -0,0 +1,109 @@
+from .adaptive import DOP853, RK45
+from .wisdom_holman import WisdomHolman
+
+
+def euler_step(system, dt):
+    """Semi-implicit Euler step: kick velocities with the current forces, then drift positions."""
+    system.compute_acceleration()
+    system.vel += system.acc * dt
+    system.pos += system.vel * dt
+
+
+def velocity_verlet_step(system, dt):
+    """Advance a System by one velocity Verlet step, updating its arrays in place."""
+    system.pos += system.vel * dt + 0.5 * system.acc * dt ** 2
+
+    old_acc = system.acc.copy()
+    system.compute_acceleration()
+
+    system.vel += 0.5 * (old_acc + system.acc) * dt
+
+
+def rk4_step(system, dt):
+    """4th order Runge-Kutta step; works with velocity-dependent forces through system.acceleration."""
+    pos, vel = system.pos, system.vel
+
+    a_k1 = system.acceleration(pos, vel)
+    pos_k2 = pos + 0.5 * dt * vel
+    vel_k2 = vel + 0.5 * dt * a_k1
+    a_k2 = system.acceleration(pos_k2, vel_k2)
+
+    pos_k3 = pos + 0.5 * dt * vel_k2
+    vel_k3 = vel + 0.5 * dt * a_k2
+    a_k3 = system.acceleration(pos_k3, vel_k3)
+
+    pos_k4 = pos + dt * vel_k3
+    vel_k4 = vel + dt * a_k3
+    a_k4 = system.acceleration(pos_k4, vel_k4)
+
+    pos_new = pos + (dt / 6) * (vel + 2 * vel_k2 + 2 * vel_k3 + vel_k4)
+    vel_new = vel + (dt / 6) * (a_k1 + 2 * a_k2 + 2 * a_k3 + a_k4)
+    system.pos[...] = pos_new
+    system.vel[...] = vel_new
+
+
+# Yoshida (1990) weights for symmetric compositions of velocity Verlet; 6th order is his
+# solution A and 8th order his solution D. Each weight costs one force evaluation.
+_CBRT2 = 2.0 ** (1.0 / 3.0)
+YOSHIDA4 = (1 / (2 - _CBRT2), -_CBRT2 / (2 - _CBRT2), 1 / (2 - _CBRT2))
+
+
+def _symmetric(weights):
+    w = list(weights)
+    return tuple(w[::-1] + [1 - 2 * sum(w)] + w)
+
+
+YOSHIDA6 = _symmetric([-1.17767998417887, 0.235573213359357, 0.784513610477560])
+YOSHIDA8 = _symmetric([0.102799849391985, -1.96061023297549, 1.93813913762276, -0.158240635368243,
+                       -1.44485223686048, 0.253693336566229, 0.914844246229740])
+
+
+def _compose(system, dt, weights):
+    for w in weights:
+        velocity_verlet_step(system, w * dt)
+
+
+def yoshida4_step(system, dt):
+    """4th order symplectic step: three velocity Verlet sub-steps (YOSHIDA4 weights)."""
+    _compose(system, dt, YOSHIDA4)
+
+
+def yoshida6_step(system, dt):
+    """6th order symplectic step: seven velocity Verlet sub-steps (YOSHIDA6 weights)."""
+    _compose(system, dt, YOSHIDA6)
+
+
+def yoshida8_step(system, dt):
+    """8th order symplectic step: fifteen velocity Verlet sub-steps (YOSHIDA8 weights)."""
+    _compose(system, dt, YOSHIDA8)
+
+
+# Plain functions are step functions; classes are built with the options given to get_integrator.
+INTEGRATORS = {
+    "euler": euler_step,
+    "verlet": velocity_verlet_step,
+    "rk4": rk4_step,
+    "yoshida4": yoshida4_step,
+    "yoshida6": yoshida6_step,
+    "yoshida8": yoshida8_step,
+    "wisdom_holman": WisdomHolman,
+    "rk45": RK45,
+    "dop853": DOP853,
+}
+
+
+def get_integrator(name, **options):
+    """The step function registered as name, e.g. get_integrator("dop853", rtol=1e-12).
+
+    Stateful schemes are classes and a fresh instance is returned on every call; options
+    are passed to their constructor.
+    """
+    try:
+        scheme = INTEGRATORS[name]
+    except KeyError:
+        raise ValueError("Unknown integrator %r, expected one of %s" % (name, sorted(INTEGRATORS)))
+    if isinstance(scheme, type):
+        return scheme(**options)
+    if options:
+        raise TypeError("Integrator %r takes no options" % name)
+    return scheme
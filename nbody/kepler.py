@@ -0,0 +1,203 @@
+"""Two-body (Kepler) motion.
+
+drift moves bodies along exact Kepler orbits about a fixed centre of gravitational parameter
+mu. Universal variables cover elliptic, parabolic and hyperbolic orbits with one formula, so
+every body is advanced in the same vectorised call whatever its orbit.
+
+For bound orbits described by elements (a, e, inc, node, argp, M0), with angles in radians,
+propagate gives positions and velocities at any times directly, without integrating. The
+elements can also be read off a state with state_to_elements.
+"""
+import math
+
+import numpy as np
+
+
+def stumpff(z):
+    """Stumpff functions c2(z) and c3(z), using their series near z = 0 to avoid cancellation."""
+    z = np.asarray(z, dtype=float)
+    c2 = np.empty_like(z)
+    c3 = np.empty_like(z)
+
+    ell = z > 1.0
+    s = np.sqrt(z[ell])
+    c2[ell] = (1 - np.cos(s)) / z[ell]
+    c3[ell] = (s - np.sin(s)) / s ** 3
+
+    hyp = z < -1.0
+    s = np.sqrt(-z[hyp])
+    c2[hyp] = (np.cosh(s) - 1) / -z[hyp]
+    c3[hyp] = (np.sinh(s) - s) / s ** 3
+
+    small = ~(ell | hyp)
+    zs = z[small]
+    term2 = np.zeros_like(zs)
+    term3 = np.zeros_like(zs)
+    power = np.ones_like(zs)
+    for k in range(10):
+        term2 += power / math.factorial(2 * k + 2)
+        term3 += power / math.factorial(2 * k + 3)
+        power = power * -zs
+    c2[small] = term2
+    c3[small] = term3
+    return c2, c3
+
+
+def drift(pos, vel, mu, dt, tol=1e-15, max_iter=50):
+    """Positions and velocities after dt on Kepler orbits about a centre at the origin.
+
+    pos and vel have shape (..., D) and mu broadcasts against pos[..., 0]. The universal
+    anomaly is found with the Laguerre-Conway iteration, which converges from the crude
+    starting guess for any eccentricity; elliptic orbits first drop whole periods from dt.
+    Bodies at the centre itself, or about a massless one, move in a straight line.
+    """
+    pos = np.asarray(pos, dtype=float)
+    vel = np.asarray(vel, dtype=float)
+    r0 = np.linalg.norm(pos, axis=-1)
+    v2 = np.einsum('...i,...i->...', vel, vel)
+    rv = np.einsum('...i,...i->...', pos, vel)
+    mu = np.broadcast_to(np.asarray(mu, dtype=float), r0.shape)
+    straight = (r0 == 0) | (mu == 0)
+    r0 = np.where(straight, 1.0, r0)
+    mu = np.where(straight, 1.0, mu)
+    sqrt_mu = np.sqrt(mu)
+    alpha = 2.0 / r0 - v2 / mu  # 1 / semi-major axis
+    elapsed = np.broadcast_to(np.asarray(dt, dtype=float), r0.shape)
+    dt = elapsed.copy()
+
+    bound = alpha > 0
+    period = np.full_like(alpha, np.inf)
+    period[bound] = 2 * np.pi / (sqrt_mu[bound] * alpha[bound] ** 1.5)
+    dt[bound] = np.fmod(dt[bound], period[bound])
+
+    sigma0 = rv / sqrt_mu
+    chi = sqrt_mu * dt / r0
+    # Far along a hyperbola the linear guess overshoots into overflow; use the asymptotic one
+    unbound = alpha < 0
+    if np.any(unbound):
+        a = 1.0 / alpha[unbound]
+        sign = np.sign(dt[unbound])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            guess = sign * np.sqrt(-a) * np.log(-2 * mu[unbound] * alpha[unbound] * dt[unbound] /
+                                                (rv[unbound] + sign * np.sqrt(-mu[unbound] * a) * (1 - r0[unbound] * alpha[unbound])))
+        linear = chi[unbound]
+        chi[unbound] = np.where(np.isfinite(guess) & (np.abs(guess) < np.abs(linear)), guess, linear)
+    n = 5.0
+    for _ in range(max_iter):
+        z = alpha * chi ** 2
+        c2, c3 = stumpff(z)
+        f = sigma0 * chi ** 2 * c2 + (1 - alpha * r0) * chi ** 3 * c3 + r0 * chi - sqrt_mu * dt
+        df = sigma0 * chi * (1 - z * c3) + (1 - alpha * r0) * chi ** 2 * c2 + r0  # = r > 0
+        ddf = sigma0 * (1 - z * c2) + (1 - alpha * r0) * chi * (1 - z * c3)
+        delta = n * f / (df + np.sqrt(np.abs((n - 1) ** 2 * df ** 2 - n * (n - 1) * f * ddf)))
+        chi = chi - delta
+        if np.all(np.abs(delta) <= tol * np.maximum(np.abs(chi), 1e-300)):
+            break
+
+    z = alpha * chi ** 2
+    c2, c3 = stumpff(z)
+    f = 1 - chi ** 2 * c2 / r0
+    g = dt - chi ** 3 * c3 / sqrt_mu
+    new_pos = f[..., np.newaxis] * pos + g[..., np.newaxis] * vel
+    r = np.linalg.norm(new_pos, axis=-1)
+    fdot = sqrt_mu / (r * r0) * chi * (z * c3 - 1)
+    gdot = 1 - chi ** 2 * c2 / r
+    new_vel = fdot[..., np.newaxis] * pos + gdot[..., np.newaxis] * vel
+    new_pos[straight] = (pos + vel * elapsed[..., np.newaxis])[straight]
+    new_vel[straight] = vel[straight]
+    return new_pos, new_vel
+
+
+def solve_kepler(M, e, tol=1e-15, max_iter=30):
+    """Eccentric anomaly E with E - e sin E = M, for arrays of mean anomalies and eccentricities < 1.
+
+    Newton's method from Danby's starting guess E = M + 0.85 e sign(sin M), with M first
+    reduced to [-pi, pi); converges in a few iterations for any e < 1.
+    """
+    M, e = np.broadcast_arrays(np.asarray(M, dtype=float), np.asarray(e, dtype=float))
+    if np.any((e < 0) | (e >= 1)):
+        raise ValueError("solve_kepler needs 0 <= e < 1")
+    M = np.remainder(M + np.pi, 2 * np.pi) - np.pi
+    E = M + 0.85 * e * np.sign(np.sin(M))
+    for _ in range(max_iter):
+        delta = (E - e * np.sin(E) - M) / (1 - e * np.cos(E))
+        E = E - delta
+        if np.all(np.abs(delta) <= tol):
+            break
+    return E
+
+
+def elements_to_state(a, e, inc, node, argp, M, mu):
+    """Position and velocity, each (..., 3), of bound orbits given their elements and mean anomaly M.
+
+    Every argument broadcasts, so arrays give one state per combination.
+    """
+    a, e, inc, node, argp, M, mu = np.broadcast_arrays(*(np.asarray(x, dtype=float)
+                                                         for x in (a, e, inc, node, argp, M, mu)))
+    E = solve_kepler(M, e)
+    cos_E, sin_E = np.cos(E), np.sin(E)
+    b = np.sqrt(1 - e ** 2)
+    r = a * (1 - e * cos_E)
+    x, y = a * (cos_E - e), a * b * sin_E
+    speed = np.sqrt(mu * a) / r
+    vx, vy = -speed * sin_E, speed * b * cos_E
+
+    cos_O, sin_O = np.cos(node), np.sin(node)
+    cos_w, sin_w = np.cos(argp), np.sin(argp)
+    cos_i, sin_i = np.cos(inc), np.sin(inc)
+    P = np.stack([cos_O * cos_w - sin_O * sin_w * cos_i, sin_O * cos_w + cos_O * sin_w * cos_i, sin_w * sin_i], axis=-1)
+    Q = np.stack([-cos_O * sin_w - sin_O * cos_w * cos_i, -sin_O * sin_w + cos_O * cos_w * cos_i, cos_w * sin_i], axis=-1)
+    pos = x[..., np.newaxis] * P + y[..., np.newaxis] * Q
+    vel = vx[..., np.newaxis] * P + vy[..., np.newaxis] * Q
+    return pos, vel
+
+
+def state_to_elements(pos, vel, mu, eps=1e-12):
+    """Elements (a, e, inc, node, argp, M) of the bound orbits through states pos, vel of shape (..., 2 or 3).
+
+    For equatorial orbits the node is 0 and for circular ones the argument of pericentre is 0,
+    so the angle along the orbit goes entirely into the mean anomaly.
+    """
+    pos = np.asarray(pos, dtype=float)
+    vel = np.asarray(vel, dtype=float)
+    if pos.shape[-1] == 2:
+        pos = np.concatenate([pos, np.zeros(pos.shape[:-1] + (1,))], axis=-1)
+        vel = np.concatenate([vel, np.zeros(vel.shape[:-1] + (1,))], axis=-1)
+    mu = np.asarray(mu, dtype=float)[..., np.newaxis]
+    r = np.linalg.norm(pos, axis=-1, keepdims=True)
+    h = np.cross(pos, vel)
+    h_norm = np.linalg.norm(h, axis=-1, keepdims=True)
+    e_vec = ((np.sum(vel * vel, axis=-1, keepdims=True) - mu / r) * pos
+             - np.sum(pos * vel, axis=-1, keepdims=True) * vel) / mu
+    e = np.linalg.norm(e_vec, axis=-1)
+    if np.any(e >= 1):
+        raise ValueError("state_to_elements needs bound orbits (e < 1)")
+    a = 1 / (2 / r[..., 0] - np.sum(vel * vel, axis=-1) / mu[..., 0])
+    w_hat = h / h_norm
+    inc = np.arccos(np.clip(w_hat[..., 2], -1, 1))
+
+    inclined = np.hypot(h[..., 0], h[..., 1]) > eps * h_norm[..., 0]
+    node = np.where(inclined, np.arctan2(h[..., 0], -h[..., 1]), 0.0)
+    n_hat = np.stack([np.cos(node), np.sin(node), np.zeros_like(node)], axis=-1)
+    m_hat = np.cross(w_hat, n_hat)  # in the orbit plane, 90 degrees ahead of the node
+
+    u = np.arctan2(np.sum(pos * m_hat, axis=-1), np.sum(pos * n_hat, axis=-1))  # argument of latitude
+    argp = np.where(e > eps, np.arctan2(np.sum(e_vec * m_hat, axis=-1), np.sum(e_vec * n_hat, axis=-1)), 0.0)
+    nu = u - argp
+    E = 2 * np.arctan2(np.sqrt(1 - e) * np.sin(nu / 2), np.sqrt(1 + e) * np.cos(nu / 2))
+    M = E - e * np.sin(E)
+    return a, e, inc, node, argp, M
+
+
+def propagate(elements, mu, t):
+    """States at times t of orbits with elements (a, e, inc, node, argp, M0), M0 being the mean anomaly at t = 0.
+
+    The elements broadcast together to some shape S (e.g. one entry per body); t of shape T
+    gives pos and vel of shape T + S + (3,), e.g. (times, bodies, 3).
+    """
+    a, e, inc, node, argp, M0 = (np.asarray(x, dtype=float) for x in elements)
+    shape = np.broadcast(a, e, inc, node, argp, M0, np.asarray(mu)).shape
+    t = np.asarray(t, dtype=float)
+    t = t.reshape(t.shape + (1,) * len(shape))
+    M = M0 + np.sqrt(mu / a ** 3) * t
+    return elements_to_state(a, e, inc, node, argp, M, mu)
@@ -0,0 +1,203 @@
+"""Force and integrator kernels with an optional compiled backend.
+
+Every kernel has a vectorized NumPy implementation. When Numba is installed the hot loops are
+also JIT-compiled (nbody.compiled, imported on first use) and used automatically; set
+NBODY_BACKEND=numpy (or call set_backend) to force the NumPy path. Both backends agree to
+round-off.
+"""
+import importlib
+import importlib.util
+import os
+
+import numpy as np
+
+from . import kepler, pn
+
+BACKENDS = ("numba", "numpy")
+# Only look for numba here: importing it takes a quarter of a second, which short worker
+# processes and NumPy-only runs should not pay, so nbody.compiled loads it on first use
+HAVE_NUMBA = importlib.util.find_spec("numba") is not None
+BACKEND = "numba" if HAVE_NUMBA else "numpy"
+
+
+def set_backend(name):
+    """Select "numba" or "numpy" for every kernel in this module."""
+    global BACKEND
+    if name not in BACKENDS:
+        raise ValueError("Unknown backend %r, expected one of %s" % (name, BACKENDS))
+    if name == "numba" and not HAVE_NUMBA:
+        raise ImportError("The numba backend needs numba installed (pip install numba)")
+    BACKEND = name
+
+
+if os.environ.get("NBODY_BACKEND"):
+    set_backend(os.environ["NBODY_BACKEND"])
+
+
+# =========================
+# NUMPY KERNELS
+# =========================
+def _pairwise_acceleration_numpy(pos, mass, G, interactions, targets):
+    # Every ordered pair: one broadcast beats working out each pair once and scattering the
+    # results back onto both bodies (see nbody.geometry)
+    if targets is None:
+        targets = slice(None)
+    r = pos[..., np.newaxis, :, :] - pos[..., targets, np.newaxis, :]  # r[i, j] points from body i to body j
+    dist2 = np.einsum('...ijk,...ijk->...ij', r, r)
+    with np.errstate(divide='ignore'):
+        inv_dist3 = dist2 ** -1.5
+    inv_dist3[dist2 == 0] = 0.0  # self-pairs (and coincident bodies) exert no force
+    if interactions is not None:
+        inv_dist3 *= interactions[targets]
+    return G * np.einsum('...ij,...ijk->...ik', inv_dist3 * mass[..., np.newaxis, :], r)
+
+
+def _pairwise_potential_numpy(pos, mass, G, interactions):
+    i, j = np.triu_indices(pos.shape[-2], 1)  # each pair once
+    r = pos[..., j, :] - pos[..., i, :]
+    dist = np.sqrt(np.einsum('...ij,...ij->...i', r, r))
+    with np.errstate(divide='ignore'):
+        inv_dist = 1.0 / dist
+    inv_dist[dist == 0] = 0.0
+    if interactions is not None:
+        inv_dist *= interactions[i, j]
+    return -G * np.sum(mass[..., i] * mass[..., j] * inv_dist, axis=-1)
+
+
+def _binary_rk4_step_numpy(pos, vel, dt, G, m1, m2, c):
+    a_k1 = pn.binary_acceleration(pos, vel, G, m1, m2, c)
+    pos_k2 = pos + 0.5 * dt * vel
+    vel_k2 = vel + 0.5 * dt * a_k1
+    a_k2 = pn.binary_acceleration(pos_k2, vel_k2, G, m1, m2, c)
+
+    pos_k3 = pos + 0.5 * dt * vel_k2
+    vel_k3 = vel + 0.5 * dt * a_k2
+    a_k3 = pn.binary_acceleration(pos_k3, vel_k3, G, m1, m2, c)
+
+    pos_k4 = pos + dt * vel_k3
+    vel_k4 = vel + dt * a_k3
+    a_k4 = pn.binary_acceleration(pos_k4, vel_k4, G, m1, m2, c)
+
+    pos_new = pos + (dt / 6) * (vel + 2 * vel_k2 + 2 * vel_k3 + vel_k4)
+    vel_new = vel + (dt / 6) * (a_k1 + 2 * a_k2 + 2 * a_k3 + a_k4)
+    return pos_new, vel_new
+
+
+# =========================
+# DISPATCH
+# =========================
+# Every kernel accepts states with leading batch axes, (..., N, D), so M independent systems
+# advance in one call. Batched inputs run the per-member Numba loops in parallel over members.
+_kernels = None  # nbody.compiled, once the first Numba kernel has been needed
+
+
+def _compiled():
+    """nbody.compiled, importing numba and the compiled kernels the first time."""
+    global _kernels
+    if _kernels is None:
+        _kernels = importlib.import_module(".compiled", __package__)
+    return _kernels
+
+
+def _members(pos, *values):
+    """Flatten leading batch axes of pos to one and broadcast per-member scalars to match."""
+    batch = pos.shape[:-2]
+    flat = np.ascontiguousarray(pos.reshape((-1,) + pos.shape[-2:]))
+    return (batch, flat) + tuple(np.ascontiguousarray(np.broadcast_to(np.asarray(v, dtype=float), batch).ravel())
+                                 for v in values)
+
+
+# Below this many bodies, or on one thread, a single serial pass over each pair once beats
+# splitting the (twice as long) all-ordered-pairs loop across threads
+PARALLEL_BODIES = 1024
+
+
+def pairwise_acceleration(pos, mass, G, interactions=None, targets=None):
+    """Newtonian acceleration on every body from every other body.
+
+    pos has shape (N, D) or (..., N, D) for a batch of systems, with mass of shape (N,) or (..., N).
+    interactions is an optional (N, N) boolean matrix; body i only feels body j where it is True.
+    targets optionally restricts the result to those bodies (all bodies still act as sources).
+    For all bodies, each pair's distance is computed once and applied to both of its bodies.
+    """
+    if BACKEND == "numba":
+        compiled = _compiled()
+        n = pos.shape[-2]
+        index = np.arange(n)[slice(None) if targets is None else targets]
+        use_mask = interactions is not None
+        mask = interactions if use_mask else np.empty((0, 0), dtype=bool)
+        if pos.ndim == 2:
+            if targets is None and (n < PARALLEL_BODIES or compiled.numba.get_num_threads() == 1):
+                return compiled.pairwise_acceleration_symmetric(np.ascontiguousarray(pos, dtype=float),
+                                                                np.ascontiguousarray(mass, dtype=float), float(G),
+                                                                mask, use_mask, np.zeros(pos.shape))
+            return compiled.pairwise_acceleration(pos, mass, float(G), mask, use_mask, index)
+        batch, flat = _members(pos)
+        masses = np.ascontiguousarray(np.broadcast_to(mass, pos.shape[:-1]).reshape(-1, n), dtype=float)
+        acc = compiled.pairwise_acceleration_batch(flat, masses, float(G), mask, use_mask, index, targets is None)
+        return acc.reshape(batch + acc.shape[1:])
+    return _pairwise_acceleration_numpy(pos, mass, G, interactions, targets)
+
+
+def pairwise_potential(pos, mass, G, interactions=None):
+    """Total Newtonian potential energy, summed once over each pair; one value per member of a batch.
+
+    With interactions, a pair counts where interactions[i, j] is True for i < j.
+    """
+    if BACKEND == "numba":
+        compiled = _compiled()
+        n = pos.shape[-2]
+        use_mask = interactions is not None
+        mask = interactions if use_mask else np.empty((0, 0), dtype=bool)
+        if pos.ndim == 2:
+            return compiled.pairwise_potential(np.ascontiguousarray(pos, dtype=float),
+                                               np.ascontiguousarray(mass, dtype=float), float(G), mask, use_mask)
+        batch, flat = _members(pos)
+        masses = np.ascontiguousarray(np.broadcast_to(mass, pos.shape[:-1]).reshape(-1, n), dtype=float)
+        return compiled.pairwise_potential_batch(flat, masses, float(G), mask, use_mask).reshape(batch)
+    return _pairwise_potential_numpy(pos, mass, G, interactions)
+
+
+def binary_acceleration(pos, vel, G, m1, m2, c):
+    """Newtonian + 1PN + 2.5PN accelerations of a binary, pos and vel of shape (2, D) or (..., 2, D).
+
+    For a batch, m1 and m2 may be scalars or arrays over the batch axes.
+    """
+    if BACKEND == "numba":
+        compiled = _compiled()
+        if pos.ndim == 2:
+            out = np.empty_like(pos)
+            compiled.binary_acceleration(pos, vel, float(G), float(m1), float(m2), float(c), out)  # c**5 overflows as int
+            return out
+        batch, flat_pos, m1, m2 = _members(pos, m1, m2)
+        _, flat_vel = _members(vel)
+        out = np.empty_like(flat_pos)
+        compiled.binary_acceleration_batch(flat_pos, flat_vel, float(G), m1, m2, float(c), out)
+        return out.reshape(pos.shape)
+    return pn.binary_acceleration(pos, vel, G, m1, m2, c)
+
+
+def binary_rk4_step(pos, vel, dt, G, m1, m2, c):
+    """One RK4 step of a post-Newtonian binary (or a batch of them); returns the new (pos, vel)."""
+    if BACKEND == "numba":
+        compiled = _compiled()
+        if pos.ndim == 2:
+            return compiled.binary_rk4_step(pos, vel, float(dt), float(G), float(m1), float(m2), float(c))
+        batch, flat_pos, m1, m2 = _members(pos, m1, m2)
+        _, flat_vel = _members(vel)
+        pos_new, vel_new = compiled.binary_rk4_step_batch(flat_pos, flat_vel, float(dt), float(G), m1, m2, float(c))
+        return pos_new.reshape(pos.shape), vel_new.reshape(vel.shape)
+    return _binary_rk4_step_numpy(pos, vel, dt, G, m1, m2, c)
+
+
+def kepler_drift(pos, vel, mu, dt, tol=1e-15, max_iter=50):
+    """Advance (..., D) states dt along Kepler orbits about the origin; see nbody.kepler.drift."""
+    if BACKEND == "numba":
+        compiled = _compiled()
+        shape = np.shape(pos)
+        flat_pos = np.ascontiguousarray(np.reshape(pos, (-1, shape[-1])), dtype=float)
+        flat_vel = np.ascontiguousarray(np.reshape(vel, (-1, shape[-1])), dtype=float)
+        flat_mu = np.ascontiguousarray(np.broadcast_to(np.asarray(mu, dtype=float), shape[:-1]).ravel())
+        new_pos, new_vel = compiled.kepler_drift(flat_pos, flat_vel, flat_mu, float(dt), float(tol), int(max_iter))
+        return new_pos.reshape(shape), new_vel.reshape(shape)
+    return kepler.drift(pos, vel, mu, dt, tol, max_iter)
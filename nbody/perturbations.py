@@ -0,0 +1,247 @@
+"""Perturbing forces as plugins that share one pass over the state.
+
+Most corrections to plain point-mass gravity act on bodies relative to one central body:
+the oblateness (J2, J4) of a planet on its moons, the Sun's tide on a planet's satellites,
+or the post-Newtonian terms of a binary's relative orbit. They need the same intermediates:
+the offsets x from the central body, r^2, r and a few inverse powers of r. Frame computes
+each of those once, when the first plugin asks for it. Perturbations then sums its plugins'
+accelerations over whole arrays, so adding a term costs a few array operations.
+
+A plugin is any object with acceleration(frame), returning the relative acceleration of
+frame's bodies (same shape as frame.x). Plugins whose force has a potential also define
+potential(frame), the potential energy per unit mass of each body.
+"""
+import math
+
+import numpy as np
+
+
+class Frame:
+    """Positions (and velocities) of bodies relative to the central body center, shared by plugins.
+
+    pos and vel have shape (..., N, D); bodies selects the K bodies to perturb. x and v are
+    their offsets and relative velocities, of shape (..., K, D). central_mass has shape (..., 1)
+    and mass (..., K), so that they broadcast together. t is the time, for forces that vary.
+    The central body may be among bodies: at x = 0 every plugin leaves it alone.
+    """
+
+    def __init__(self, pos, vel, mass, G, center, bodies, t=0.0):
+        self.x = pos[..., bodies, :] - pos[..., center, np.newaxis, :]
+        self._vel = vel
+        self.central_mass = mass[..., center, np.newaxis]
+        self.mass = mass[..., bodies]
+        self.G = G
+        self.t = t
+        self.r2 = np.einsum('...k,...k->...', self.x, self.x)
+        self.r = np.sqrt(self.r2)
+        self._center = center
+        self._bodies = bodies
+        self._v = None
+        self._inverse = {}
+        self._unit = None
+        self._radial_velocity = None
+        self._speed2 = None
+
+    def inverse(self, n):
+        """1 / r^n, computed once per power; zero for bodies at the centre, which feel nothing."""
+        if n not in self._inverse:
+            if n == 1:
+                self._inverse[1] = np.divide(1.0, self.r, out=np.zeros_like(self.r), where=self.r > 0)
+            else:
+                self._inverse[n] = self.inverse(n // 2) * self.inverse(n - n // 2)
+        return self._inverse[n]
+
+    @property
+    def v(self):
+        """Velocities relative to the central body, for plugins that need them."""
+        if self._v is None:
+            self._v = self._vel[..., self._bodies, :] - self._vel[..., self._center, np.newaxis, :]
+        return self._v
+
+    @property
+    def unit(self):
+        """x / r, the unit vectors away from the central body."""
+        if self._unit is None:
+            self._unit = self.x * self.inverse(1)[..., np.newaxis]
+        return self._unit
+
+    @property
+    def radial_velocity(self):
+        """v . x / r."""
+        if self._radial_velocity is None:
+            self._radial_velocity = np.einsum('...k,...k->...', self.v, self.unit)
+        return self._radial_velocity
+
+    @property
+    def speed2(self):
+        """|v|^2."""
+        if self._speed2 is None:
+            self._speed2 = np.einsum('...k,...k->...', self.v, self.v)
+        return self._speed2
+
+
+class Perturbations:
+    """The sum of plugins' accelerations (and potentials), evaluated on one shared Frame."""
+
+    def __init__(self, *plugins):
+        self.plugins = list(plugins)
+
+    def __bool__(self):
+        return bool(self.plugins)
+
+    def acceleration(self, frame):
+        acc = np.zeros_like(frame.x)
+        for plugin in self.plugins:
+            acc += plugin.acceleration(frame)
+        return acc
+
+    def potential(self, frame):
+        """Potential energy per unit mass of each body; plugins without a potential add nothing."""
+        phi = np.zeros_like(frame.r)
+        for plugin in self.plugins:
+            if hasattr(plugin, "potential"):
+                phi += plugin.potential(frame)
+        return phi
+
+    def binary(self, pos, vel, mass, G, t=0.0):
+        """Accelerations of both bodies of binaries (pos, vel of shape (..., 2, D)) from their relative one.
+
+        Each body takes its share of the relative acceleration by the other's mass, so the
+        centre of mass stays put.
+        """
+        frame = Frame(pos, vel, mass, G, 0, [1], t)
+        relative = self.acceleration(frame)[..., 0, :]
+        m1, m2 = mass[..., 0, np.newaxis], mass[..., 1, np.newaxis]
+        total = m1 + m2
+        return np.stack([-(m2 / total) * relative, (m1 / total) * relative], axis=-2)
+
+
+# =========================
+# PLUGINS
+# =========================
+def _legendre(n, u):
+    """P_n(u) and its derivative, for the even zonal degrees used here."""
+    if n == 2:
+        return 0.5 * (3 * u ** 2 - 1), 3 * u
+    if n == 4:
+        u2 = u ** 2
+        return (35 * u2 ** 2 - 30 * u2 + 3) / 8, u * (35 * u2 - 15) / 2
+    raise ValueError("Zonal harmonics of degree %d are not implemented, only 2 and 4" % n)
+
+
+class Newtonian:
+    """Point-mass gravity of the relative orbit: -G (M + m) x / r^3."""
+
+    def acceleration(self, frame):
+        GM = frame.G * (frame.central_mass + frame.mass)
+        return -(GM * frame.inverse(3))[..., np.newaxis] * frame.x
+
+    def potential(self, frame):
+        return -frame.G * (frame.central_mass + frame.mass) * frame.inverse(1)
+
+
+class Zonal:
+    """Oblateness of the central body: zonal harmonics J = {degree: J_n} about its spin axis pole.
+
+    The potential per unit mass of degree n is G M J_n R^n P_n(u) / r^(n+1), with u = x . pole / r
+    the sine of the latitude, and radius R the equatorial radius.
+    """
+
+    def __init__(self, radius, J, pole=(0.0, 0.0, 1.0)):
+        self.radius = radius
+        self.J = dict(J)
+        pole = np.asarray(pole, dtype=float)
+        self.pole = pole / np.linalg.norm(pole)
+        for n in self.J:
+            _legendre(n, 0.0)  # reject unknown degrees now rather than mid-run
+
+    def acceleration(self, frame):
+        # -grad of each term: G M J_n R^n / r^(n+2) [((n+1) P_n + u P_n') x/r - P_n' pole]
+        GM = frame.G * frame.central_mass
+        u = frame.unit @ self.pole
+        radial = np.zeros_like(u)
+        polar = np.zeros_like(u)
+        for n, J in self.J.items():
+            p, dp = _legendre(n, u)
+            scale = GM * J * self.radius ** n * frame.inverse(n + 2)
+            radial += scale * ((n + 1) * p + u * dp)
+            polar -= scale * dp
+        return radial[..., np.newaxis] * frame.unit + polar[..., np.newaxis] * self.pole
+
+    def potential(self, frame):
+        GM = frame.G * frame.central_mass
+        u = frame.unit @ self.pole
+        phi = np.zeros_like(u)
+        for n, J in self.J.items():
+            phi += GM * J * self.radius ** n * _legendre(n, u)[0] * frame.inverse(n + 1)
+        return phi
+
+
+class SolarTide:
+    """Tide of a distant star of mass star_mass that the central body orbits on a circle.
+
+    The star sits distance away, going round once per period in a plane tilted by obliquity
+    (radians) from the x-y plane about the x axis, at angle phase at t = 0. Bodies feel the
+    difference between its pull on them and on the central body.
+    """
+
+    def __init__(self, star_mass, distance, period, obliquity=0.0, phase=0.0):
+        self.star_mass = star_mass
+        self.distance = distance
+        self.period = period
+        self.obliquity = obliquity
+        self.phase = phase
+
+    def position(self, t):
+        """Star position relative to the central body at time t."""
+        angle = self.phase + 2 * np.pi * t / self.period
+        ce, se = math.cos(self.obliquity), math.sin(self.obliquity)
+        return self.distance * np.array([math.cos(angle), math.sin(angle) * ce, math.sin(angle) * se])
+
+    def acceleration(self, frame):
+        d = self.position(frame.t)[:frame.x.shape[-1]]
+        s = d - frame.x
+        s3 = np.einsum('...k,...k->...', s, s) ** 1.5
+        GM = frame.G * self.star_mass
+        return GM * (s / s3[..., np.newaxis] - d / self.distance ** 3)
+
+    def potential(self, frame):
+        d = self.position(frame.t)[:frame.x.shape[-1]]
+        s = np.linalg.norm(d - frame.x, axis=-1)
+        GM = frame.G * self.star_mass
+        return -GM * (1 / s - 1 / self.distance - (frame.x @ d) / self.distance ** 3)
+
+
+class FirstPostNewtonian:
+    """1PN correction to the relative orbit of a binary (harmonic gauge): periastron advance."""
+
+    def __init__(self, c):
+        self.c = c
+
+    def acceleration(self, frame):
+        M = frame.central_mass + frame.mass
+        eta = frame.central_mass * frame.mass / M ** 2
+        GM_r = frame.G * M * frame.inverse(1)
+        rdot = frame.radial_velocity
+        radial = (1 + 3 * eta) * frame.speed2 - 2 * (2 + eta) * GM_r - 1.5 * eta * rdot ** 2
+        scale = -frame.G * M * frame.inverse(2) / self.c ** 2
+        return scale[..., np.newaxis] * (radial[..., np.newaxis] * frame.unit
+                                         - (2 * (2 - eta) * rdot)[..., np.newaxis] * frame.v)
+
+
+class RadiationReaction:
+    """2.5PN radiation reaction on the relative orbit of a binary: the gravitational-wave inspiral."""
+
+    def __init__(self, c):
+        self.c = c
+
+    def acceleration(self, frame):
+        M = frame.central_mass + frame.mass
+        eta = frame.central_mass * frame.mass / M ** 2
+        GM_r = frame.G * M * frame.inverse(1)
+        rdot = frame.radial_velocity
+        v2 = frame.speed2
+        scale = (8 / 5) * eta * (frame.G * M) ** 2 / self.c ** 5 * frame.inverse(3)
+        radial = rdot * (18 * v2 + (2 / 3) * GM_r - 25 * rdot ** 2)
+        along = 6 * v2 - 2 * GM_r - 15 * rdot ** 2
+        return scale[..., np.newaxis] * (radial[..., np.newaxis] * frame.unit - along[..., np.newaxis] * frame.v)
@@ -0,0 +1,259 @@
+"""Where a run spends its time: per-phase timers, event counters and an optional sampling profiler.
+
+A Profiler times named phases of the step and draw cycle (forces, integration, trails,
+artist updates, redraws) with one perf_counter pair per entry, so it can stay on in long
+runs. Phases entered inside another are reported beneath it, with whatever the parent spent
+outside its children; a phase entered in several places (force evaluations inside a step
+and in a collision handler called outside it) is timed separately under each. Counters
+record events such as force evaluations and are reported as rates. With sample_interval
+set, a background thread also samples the running stack and reports the functions most
+often seen, for time that falls between the phases.
+
+    profiler = Profiler()
+    profiler.instrument(system)                  # times and counts every force evaluation
+    with profiler:
+        integrate(system, steps, dt, profiler=profiler)
+    print(profiler.report())
+
+A Profiler made with enabled=False does nothing: its phases are a shared null context and
+instrument and timed hand back what they were given, so scripts can leave the calls in.
+"""
+import collections
+import contextlib
+import functools
+import os
+import sys
+import threading
+import time
+
+_NULL_PHASE = contextlib.nullcontext()
+
+
+class _Timing:
+    """Total time and entries of one phase at one place in the nesting; path names the
+    phases it sits in, outermost first, and ends with its own name."""
+
+    __slots__ = ("path", "calls", "total", "_start")
+
+    def __init__(self, path):
+        self.path = path
+        self.calls = 0
+        self.total = 0.0
+        self._start = 0.0
+
+
+class _Phase:
+    """Context manager timing a phase into the _Timing for whichever phase it is entered within."""
+
+    __slots__ = ("name", "_stack", "_timings", "_by_parent")
+
+    def __init__(self, name, stack, timings):
+        self.name = name
+        self._stack = stack
+        self._timings = timings
+        self._by_parent = {}
+
+    def __enter__(self):
+        parent = self._stack[-1] if self._stack else None
+        timing = self._by_parent.get(parent)
+        if timing is None:
+            path = (self.name,) if parent is None else parent.path + (self.name,)
+            timing = self._by_parent[parent] = self._timings.setdefault(path, _Timing(path))
+        self._stack.append(timing)
+        timing._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        timing = self._stack.pop()
+        timing.total += time.perf_counter() - timing._start
+        timing.calls += 1
+
+
+class _Sampler(threading.Thread):
+    """Record the stack of thread_id every interval seconds: the innermost Python function of
+    each sample in own, every function on the stack in total."""
+
+    def __init__(self, interval, thread_id):
+        super().__init__(name="nbody-profiler", daemon=True)
+        self.interval = interval
+        self.thread_id = thread_id
+        self.samples = 0
+        self.own = collections.Counter()
+        self.total = collections.Counter()
+        self._halt = threading.Event()
+
+    def run(self):
+        while not self._halt.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.samples += 1
+            code = frame.f_code
+            self.own[(code.co_filename, code.co_firstlineno, code.co_name)] += 1
+            seen = set()
+            while frame is not None:
+                code = frame.f_code
+                key = (code.co_filename, code.co_firstlineno, code.co_name)
+                if key not in seen:  # recursion counts once per sample
+                    seen.add(key)
+                    self.total[key] += 1
+                frame = frame.f_back
+
+    def halt(self):
+        self._halt.set()
+        self.join()
+
+
+class Profiler:
+    """Per-phase wall-clock timers, event counters and, with sample_interval (seconds), a sampler.
+
+    start() and stop(), or a with block, bound the wall time that the phases are measured
+    against; the sampler runs between them. report() gives the summary.
+    """
+
+    def __init__(self, sample_interval=None, enabled=True):
+        self.enabled = enabled
+        self.sample_interval = sample_interval if enabled else None
+        self.phases = {}  # _Timing by path, e.g. ("step", "forces")
+        self.counters = collections.Counter()
+        self._phases = {}
+        self._stack = []
+        self._started = None
+        self._elapsed = 0.0
+        self._sampler = None
+
+    @property
+    def elapsed(self):
+        """Wall time profiled so far, in seconds."""
+        if self._started is None:
+            return self._elapsed
+        return self._elapsed + time.perf_counter() - self._started
+
+    def start(self):
+        if not self.enabled or self._started is not None:
+            return self
+        self._started = time.perf_counter()
+        if self.sample_interval:
+            self._sampler = _Sampler(self.sample_interval, threading.get_ident())
+            self._sampler.start()
+        return self
+
+    def stop(self):
+        if self._started is None:
+            return
+        self._elapsed += time.perf_counter() - self._started
+        self._started = None
+        if self._sampler is not None:
+            self._sampler.halt()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def phase(self, name):
+        """Context manager timing one entry of the phase name; the same object every time."""
+        if not self.enabled:
+            return _NULL_PHASE
+        try:
+            return self._phases[name]
+        except KeyError:
+            phase = self._phases[name] = _Phase(name, self._stack, self.phases)
+            return phase
+
+    def timed(self, name, function):
+        """function, with every call timed as the phase name."""
+        if not self.enabled:
+            return function
+        phase = self.phase(name)
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            with phase:
+                return function(*args, **kwargs)
+        return timed
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] += n
+
+    def instrument(self, system):
+        """Time system's force evaluations as the phase "forces" and count them.
+
+        "force evaluations" counts calls of system.acceleration and "body forces" the
+        accelerations they return, so block time steps that only update the bodies that are
+        due show up as fewer body forces per evaluation. Batches made from system afterwards
+        are instrumented too.
+        """
+        if not self.enabled:
+            return system
+        acceleration = system.acceleration
+        phase = self.phase("forces")
+        counters = self.counters
+
+        def counted(pos, vel=None, targets=None):
+            with phase:
+                acc = acceleration(pos, vel, targets)
+            counters["force evaluations"] += 1
+            counters["body forces"] += acc.size // acc.shape[-1]
+            return acc
+        system.acceleration = counted
+        return system
+
+    def instrument_figure(self, fig):
+        """Time matplotlib's full redraws of fig as the phase "draw", and blits as "blit"."""
+        if not self.enabled:
+            return fig
+        fig.draw = self.timed("draw", fig.draw)
+        fig.canvas.blit = self.timed("blit", fig.canvas.blit)
+        return fig
+
+    def _children(self, path):
+        return sorted((p for p in self.phases.values() if p.path[:-1] == path and p.calls), key=lambda p: -p.total)
+
+    def _rows(self, path, depth):
+        for timing in self._children(path):
+            yield depth, timing.path[-1], timing.calls, timing.total
+            children = self._children(timing.path)
+            if children:
+                yield from self._rows(timing.path, depth + 1)
+                yield depth + 1, "(own)", None, timing.total - sum(p.total for p in children)
+
+    def report(self, top=15):
+        """The summary: each phase's calls, total, mean and share of the wall time, the counter
+        rates and, if sampling, the functions seen most often."""
+        if not self.enabled:
+            return ""
+        wall = self.elapsed
+        share = (lambda seconds: 100 * seconds / wall) if wall > 0 else (lambda seconds: float("nan"))
+        lines = ["Profile over %.3f s of wall time" % wall,
+                 "%-28s %10s %11s %11s %7s" % ("phase", "calls", "total (s)", "mean (us)", "wall %")]
+        for depth, name, calls, total in self._rows((), 0):
+            label = "  " * depth + name
+            if calls is None:
+                lines.append("%-28s %10s %11.4f %11s %6.1f%%" % (label, "", total, "", share(total)))
+            else:
+                mean = 1e6 * total / calls if calls else 0.0
+                lines.append("%-28s %10d %11.4f %11.1f %6.1f%%" % (label, calls, total, mean, share(total)))
+        outside = wall - sum(p.total for p in self.phases.values() if len(p.path) == 1)
+        lines.append("%-28s %10s %11.4f %11s %6.1f%%" % ("(outside phases)", "", outside, "", share(outside)))
+
+        if self.counters:
+            lines.append("")
+            lines.append("%-28s %10s %15s" % ("counter", "count", "per second"))
+            for name, n in sorted(self.counters.items()):
+                lines.append("%-28s %10d %15.1f" % (name, n, n / wall if wall > 0 else float("nan")))
+
+        sampler = self._sampler
+        if sampler is not None and sampler.samples:
+            lines.append("")
+            lines.append("%d stack samples every %.1f ms; top functions by own samples"
+                         % (sampler.samples, 1e3 * sampler.interval))
+            lines.append("%7s %7s  %s" % ("own %", "total %", "function"))
+            for key, n in sampler.own.most_common(top):
+                filename, line, function = key
+                lines.append("%6.1f%% %6.1f%%  %s (%s:%d)" % (100 * n / sampler.samples,
+                                                              100 * sampler.total[key] / sampler.samples,
+                                                              function, os.path.basename(filename), line))
+        return "\n".join(lines)
@@ -0,0 +1,92 @@
+"""Decouple physics steps from drawn frames.
+
+A FramePacer runs K physics sub-steps per animation frame. K is either fixed or adapted
+after every frame so that physics plus drawing fits a target frame rate, using the measured
+cost of one sub-step and the measured time spent drawing between frames. Trails keep every
+sub-step at full resolution; decimate picks a bounded number of them for display.
+"""
+import math
+import time
+
+
+class FramePacer:
+    """Run substeps physics steps per frame, or adapt them to hold target_fps.
+
+    advance() performs one physics step; pacer.run(advance) calls it K times and returns K.
+    If advance returns True the frame ends early (e.g. on a merger) and that call is not
+    counted as a step. steps counts every physics step taken so far and frames the frames drawn.
+    """
+
+    def __init__(self, substeps=1, target_fps=None, max_substeps=10000, smoothing=0.2):
+        self.substeps = substeps
+        self.target_fps = target_fps
+        self.max_substeps = max_substeps
+        self.smoothing = smoothing
+        self.step_time = None  # seconds per physics step (moving average)
+        self.draw_time = None  # seconds between frames spent outside physics (moving average)
+        self.steps = 0
+        self.frames = 0
+        self._frame_end = None
+
+    def _average(self, old, new):
+        return new if old is None else old + self.smoothing * (new - old)
+
+    def run(self, advance, limit=None):
+        """Advance one frame's worth of steps (at most limit); returns the number taken."""
+        start = time.perf_counter()
+        if self._frame_end is not None:
+            self.draw_time = self._average(self.draw_time, start - self._frame_end)
+
+        k = self.substeps if limit is None else min(self.substeps, limit)
+        taken = 0
+        while taken < k:
+            if advance():
+                break
+            taken += 1
+
+        end = time.perf_counter()
+        if taken:
+            self.step_time = self._average(self.step_time, (end - start) / taken)
+        self._frame_end = end
+        self.steps += taken
+        self.frames += 1
+        if self.target_fps and self.step_time and self.draw_time is not None:
+            budget = 1.0 / self.target_fps - self.draw_time
+            self.substeps = int(min(max(budget / self.step_time, 1), self.max_substeps))
+        return taken
+
+    def frames_until(self, total_steps):
+        """Frame numbers for FuncAnimation that stop once total_steps physics steps are done."""
+        frame = 0
+        while self.steps < total_steps:
+            yield frame
+            frame += 1
+
+
+def decimate(points, max_points):
+    """Every n-th point along the last axis so at most max_points remain, always keeping the newest.
+
+    Returns a strided view, so the full-resolution data is neither copied nor changed.
+    """
+    n = points.shape[-1]
+    if max_points is None or n <= max_points:
+        return points
+    every = math.ceil(n / max_points)
+    return points[..., (n - 1) % every::every]
+
+
+def use_font(*families):
+    """Draw text in the first of families that is installed; returns it, or None to keep the default.
+
+    Naming a font that is not installed makes matplotlib warn and fall back on every lookup,
+    so scripts ask for their preferred fonts through this instead of setting rcParams directly.
+    """
+    import matplotlib
+    from matplotlib import font_manager
+
+    installed = {font.name.lower() for font in font_manager.fontManager.ttflist}
+    for family in families:
+        if family.lower() in installed:
+            matplotlib.rcParams['font.family'] = family
+            return family
+    return None
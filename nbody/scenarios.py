@@ -0,0 +1,388 @@
+"""Scenario files: a whole run described in TOML or JSON instead of edits to a script.
+
+A scenario names a simulation and sets how it runs:
+
+    simulation = "solar_system"     # any name in nbody.simulations.SIMULATIONS
+    duration = 3.156e9              # simulated seconds, or steps = 3650
+    dt = 864000                     # optional, the script's own otherwise
+    integrator = "wisdom_holman"    # optional, any name in nbody.INTEGRATORS
+    bodies = ["sun", "earth", "jupiter"]   # optional, a subset of the script's catalogue
+
+    [settings]                      # any of the script's top-level settings
+    diagnostics_every = 100
+
+    [output]
+    trajectory = "solar.trj"        # paths are relative to the scenario file
+    checkpoint = "solar.npz"
+    checkpoint_seconds = 600        # or checkpoint_every = 1000 (steps)
+    video = "solar.gif"             # rendered with the script's export_style()
+    fps = 30
+    every = 1
+
+Everything is checked when the file is loaded, against the script's source and cached
+catalogue, without importing the script: names and values of the settings, and views that
+cannot be combined. A typo in the 300th file of a sweep fails at once instead of after hours
+of runs. The settings are set on the imported script for the run (see
+nbody.simulations.overrides); a setting the script only reads at import is refused. The run
+uses the bodies built from the catalogue, with the central body always included.
+
+Run files from the command line, validating every file before the first one starts:
+
+    python -m nbody.scenarios runs/*.toml
+    python -m nbody.scenarios --check runs/*.toml
+    python -m nbody.scenarios --show runs/galilean.toml    # the animation instead
+"""
+import argparse
+import ast
+import inspect
+import json
+import math
+import numbers
+import os
+import sys
+
+from . import simulations
+from .catalog import CATALOGS, load_catalog
+from .integrators import INTEGRATORS
+
+KEYS = {"simulation", "steps", "duration", "dt", "integrator", "bodies", "settings", "output"}
+OUTPUT_KEYS = {"trajectory", "checkpoint", "checkpoint_every", "checkpoint_seconds", "video", "fps", "every"}
+
+# simulation: (catalogue, the script's body table, the central body every selection keeps,
+#              the script's function turning catalogue rows into table entries, or None if they are entries)
+BODY_TABLES = {
+    "solar_system": ("planets", "planet_data", "sun", None),
+    "multi_moon":   ("jovian_moons", "jupiter_data", "jupiter", "moon_states"),
+}
+
+# simulation: {setting: the names it may take}; a list setting takes any of them
+CHOICES = {
+    "solar_system": {"profile": {"phases", "sample"}},
+    "multi_moon":   {"SOLVER": {"jupiter", "direct", "barnes-hut"}, "PERTURBATIONS": {"j2", "j4", "sun"},
+                     "COLLISIONS": {"merge", "bounce"}, "PROFILE": {"phases", "sample"}},
+    "kilonova":     {"pn_terms": {"1pn", "2.5pn"}},
+}
+
+
+def _toml():
+    """The TOML reader: tomllib from Python 3.11, else the tomli package, else None."""
+    try:
+        import tomllib
+    except ImportError:
+        try:
+            import tomli as tomllib
+        except ImportError:
+            return None
+    return tomllib
+
+
+def read_scenario(path):
+    """The raw contents of a .toml or .json scenario file, as a dict."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in (".toml", ".json"):
+        raise ValueError("%s: unknown scenario format %r, expected .toml or .json" % (path, extension))
+    toml = _toml() if extension == ".toml" else None
+    if extension == ".toml" and toml is None:
+        raise ValueError("%s: TOML scenarios need Python 3.11+ or the tomli package; use JSON instead" % path)
+    try:
+        if toml is None:
+            with open(path) as f:
+                return json.load(f)
+        with open(path, "rb") as f:
+            return toml.load(f)
+    except (OSError, ValueError) as e:  # both decode errors are ValueErrors
+        raise ValueError("%s: %s" % (path, e))
+
+
+def _is_number(value):
+    return isinstance(value, numbers.Real) and not isinstance(value, bool)
+
+
+def _positive(value, integer=False):
+    return (isinstance(value, numbers.Integral) if integer else _is_number(value)) \
+        and not isinstance(value, bool) and value > 0
+
+
+def _plain(value):
+    """True for values made of bools, numbers, strings, lists and tables only."""
+    if isinstance(value, dict):
+        return all(isinstance(k, str) and _plain(v) for k, v in value.items())
+    if isinstance(value, list):
+        return all(_plain(v) for v in value)
+    return isinstance(value, (bool, numbers.Real, str))
+
+
+def _compatible(value, default):
+    """Whether value may replace a setting whose literal default is default (None: computed, anything goes)."""
+    if default is None:
+        return True
+    if isinstance(default, bool) or isinstance(value, bool):
+        return isinstance(default, bool) and isinstance(value, bool)
+    if _is_number(default):
+        return _is_number(value)
+    if isinstance(default, (list, tuple)):
+        return isinstance(value, list)
+    return isinstance(value, type(default))
+
+
+def integrator_setting(name):
+    """Name of the script's integrator setting ("integrator" or "INTEGRATOR"), or None."""
+    known = simulations.script_settings(name)
+    return next((variable for variable in ("integrator", "INTEGRATOR") if variable in known), None)
+
+
+def choices(name):
+    """{setting: the names it may take} for a simulation, its integrator setting included."""
+    found = dict(CHOICES.get(name, {}))
+    variable = integrator_setting(name)
+    if variable is not None:
+        found[variable] = set(INTEGRATORS) | {simulations.script_settings(name)[variable]}
+    return found
+
+
+def _choice_error(variable, value, allowed, default):
+    """Message if value is not among the allowed names (each of them, for a list setting), else None."""
+    if isinstance(default, (list, tuple)):
+        wrong = [v for v in value if not isinstance(v, str) or v not in allowed] if isinstance(value, list) else []
+        if wrong:
+            return "%s takes any of %s, not %s" % (variable, sorted(allowed), ", ".join(map(repr, wrong)))
+    elif not isinstance(value, str) or value not in allowed:
+        return "%s must be one of %s, not %r" % (variable, sorted(allowed), value)
+    return None
+
+
+def _view_errors(name, data, settings):
+    """Views of the script that the scenario turns on together but that cannot be combined."""
+    known = simulations.script_settings(name)
+    value = lambda variable: settings.get(variable, known.get(variable))
+    if name == "solar_system" and value("zoom") and "bodies" in data:
+        return ["bodies cannot be chosen with zoom on, which keeps only the sun and the inner planets"]
+    if name == "multi_moon":
+        views = [variable for variable in known if variable.startswith("VIEW_")]
+        on = [variable for variable in views if value(variable)]
+        if len(on) != 1:
+            return ["turn on exactly one of %s, not %s" % (", ".join(views), ", ".join(on) or "none")]
+    return []
+
+
+def _run_arguments(name):
+    for node in simulations.parse(name).body:
+        if isinstance(node, ast.FunctionDef) and node.name == "run":
+            return [arg.arg for arg in node.args.args]
+    return []
+
+
+def check(data):
+    """Every problem with the scenario dict data, as a list of messages (empty if it is valid)."""
+    if not isinstance(data, dict):
+        return ["a scenario is a table of settings, not %s" % type(data).__name__]
+    errors = ["unknown key %r (expected %s)" % (key, ", ".join(sorted(KEYS))) for key in sorted(set(data) - KEYS)]
+
+    name = data.get("simulation")
+    if name not in simulations.SIMULATIONS:
+        errors.append("simulation must be one of %s, not %r" % (sorted(simulations.SIMULATIONS), name))
+        return errors
+    known = simulations.script_settings(name)
+    arguments = _run_arguments(name)
+
+    if ("steps" in data) == ("duration" in data):
+        errors.append("give exactly one of steps and duration")
+    if "steps" in data and not _positive(data["steps"], integer=True):
+        errors.append("steps must be a positive integer, not %r" % (data["steps"],))
+    if "duration" in data and not _positive(data["duration"]):
+        errors.append("duration must be a positive number of seconds, not %r" % (data["duration"],))
+    if "dt" in data and not _positive(data["dt"]):
+        errors.append("dt must be a positive number of seconds, not %r" % (data["dt"],))
+
+    allowed = choices(name)
+    if "integrator" in data:
+        variable = integrator_setting(name)
+        if variable is None:
+            errors.append("%s has no integrator to choose" % name)
+        else:
+            error = _choice_error("integrator", data["integrator"], allowed[variable], known[variable])
+            if error:
+                errors.append(error)
+
+    settings = data.get("settings", {})
+    if not isinstance(settings, dict):
+        errors.append("settings must be a table")
+        settings = {}
+    for variable, value in settings.items():
+        if variable not in known:
+            errors.append("%s has no setting %r" % (name, variable))
+        elif not _plain(value):
+            errors.append("setting %s must be made of numbers, strings, booleans, lists and tables" % variable)
+        elif not _compatible(value, known[variable]):
+            errors.append("setting %s = %r does not match its default %r" % (variable, value, known[variable]))
+        elif variable in simulations.read_at_import(name):
+            errors.append("setting %s is only read while %s is imported (line %s), so a scenario cannot change it"
+                          % (variable, simulations.SIMULATIONS[name],
+                             ", ".join(map(str, simulations.read_at_import(name)[variable]))))
+        elif variable in allowed:
+            error = _choice_error(variable, value, allowed[variable], known[variable])
+            if error:
+                errors.append(error)
+    if "integrator" in data and integrator_setting(name) in settings:
+        errors.append("give the integrator once, not also under settings")
+    errors += _view_errors(name, data, settings)
+
+    if "bodies" in data:
+        bodies = data["bodies"]
+        if name not in BODY_TABLES:
+            errors.append("%s has no body catalogue to choose from" % name)
+        elif not isinstance(bodies, list) or not all(isinstance(body, str) for body in bodies):
+            errors.append("bodies must be a list of names")
+        else:
+            catalogue, _, central, _ = BODY_TABLES[name]
+            available = set(load_catalog(catalogue)["names"].tolist()) | {central}
+            unknown = [body for body in bodies if body not in available]
+            if unknown:
+                errors.append("unknown bodies %s (the %s catalogue has %s)"
+                              % (", ".join(unknown), catalogue, ", ".join(sorted(available))))
+
+    output = data.get("output", {})
+    if not isinstance(output, dict):
+        errors.append("output must be a table")
+        output = {}
+    errors += ["unknown output %r (expected %s)" % (key, ", ".join(sorted(OUTPUT_KEYS)))
+               for key in sorted(set(output) - OUTPUT_KEYS)]
+    for key in ("trajectory", "checkpoint", "video"):
+        if key in output and not isinstance(output[key], str):
+            errors.append("output %s must be a file name" % key)
+    for key in ("checkpoint_every", "fps", "every"):
+        if key in output and not _positive(output[key], integer=True):
+            errors.append("output %s must be a positive integer, not %r" % (key, output[key]))
+    if "checkpoint_seconds" in output and not _positive(output["checkpoint_seconds"]):
+        errors.append("output checkpoint_seconds must be a positive number")
+    if "checkpoint" in output and "checkpoint" not in arguments:
+        errors.append("%s cannot resume from a checkpoint" % name)
+    if ("checkpoint_every" in output or "checkpoint_seconds" in output) and "checkpoint" not in output:
+        errors.append("a checkpoint interval needs an output checkpoint file")
+    return errors
+
+
+class Scenario:
+    """A validated scenario, ready to run; see the module docstring for the fields.
+
+    Relative output paths are taken from folder (by default the working directory).
+    """
+
+    def __init__(self, data, source="<scenario>", folder=None):
+        errors = check(data)
+        if errors:
+            raise ValueError("%s: %s" % (source, "; ".join(errors)))
+        self.source = source
+        self.simulation = data["simulation"]
+        self.steps = data.get("steps")
+        self.duration = data.get("duration")
+        self.dt = data.get("dt")
+        self.bodies = data.get("bodies")
+        self.settings = dict(data.get("settings", {}))
+        if "integrator" in data:
+            self.settings[integrator_setting(self.simulation)] = data["integrator"]
+
+        folder = os.getcwd() if folder is None else folder
+        self.output = dict(data.get("output", {}))
+        for key in ("trajectory", "checkpoint", "video"):
+            if key in self.output:
+                self.output[key] = os.path.join(folder, os.path.expanduser(self.output[key]))
+
+    def module(self):
+        """The simulation script, imported once; run and show change its settings while they last."""
+        return simulations.load(self.simulation)
+
+    def _body_table(self, module):
+        """The script's body table for bodies (and its central body), built from the catalogue."""
+        catalogue, variable, central, build = BODY_TABLES[self.simulation]
+        _, _, fields = CATALOGS[catalogue]
+        columns = load_catalog(catalogue)
+        rows = {str(body): [columns[field][k] for field in fields] for k, body in enumerate(columns["names"])
+                if body in self.bodies or body == central}
+        if build is None:
+            return rows
+        table = {central: getattr(module, variable)[central]}
+        table.update(getattr(module, build)(rows))
+        return table
+
+    def _applied(self, module):
+        """Context manager giving the script this scenario's settings and bodies."""
+        settings = dict(self.settings)
+        if self.bodies is not None:
+            settings[BODY_TABLES[self.simulation][1]] = self._body_table(module)
+        return simulations.overrides(module, settings)
+
+    def step_count(self, module):
+        """steps, or the steps covering duration at the scenario's dt or else the script's own;
+        call it with the settings applied, as the script's time step may depend on them."""
+        if self.steps is not None:
+            return self.steps
+        dt = self.dt if self.dt is not None else inspect.signature(module.run).parameters["dt"].default
+        if dt is None:
+            dt = module.time_step()
+        return max(1, math.ceil(self.duration / dt - 1e-9))
+
+    def run(self):
+        """Run the scenario and write its outputs; returns run()'s (t, pos, vel)."""
+        from .checkpoint import Checkpointer
+        from .export import export
+
+        module = self.module()
+        output = self.output
+        kwargs = {} if self.dt is None else {"dt": self.dt}
+        if "checkpoint" in output:
+            kwargs["checkpoint"] = Checkpointer(output["checkpoint"], output.get("checkpoint_every"),
+                                                output.get("checkpoint_seconds"))
+        with self._applied(module):
+            result = module.run(self.step_count(module), path=output.get("trajectory"), **kwargs)
+            if "video" in output:
+                export(output.get("trajectory", result), output["video"], module.export_style(),
+                       fps=output.get("fps", 30), every=output.get("every", 1))
+        return result
+
+    def show(self):
+        """Open the script's animation with this scenario's settings and bodies."""
+        module = self.module()
+        with self._applied(module):
+            module.main()
+
+
+def load_scenario(path):
+    """Read and validate a scenario file, raising ValueError with every problem found."""
+    return Scenario(read_scenario(path), path, os.path.dirname(os.path.abspath(path)))
+
+
+def run_scenario(path):
+    """Shortcut for load_scenario(path).run()."""
+    return load_scenario(path).run()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate scenario files, then run them one after another.")
+    parser.add_argument("scenarios", nargs="+", help=".toml or .json scenario files")
+    parser.add_argument("--check", action="store_true", help="only validate the files")
+    parser.add_argument("--show", action="store_true", help="animate each scenario instead of running it headless")
+    args = parser.parse_args(argv)
+
+    scenarios, failed = [], False
+    for path in args.scenarios:
+        try:
+            scenarios.append(load_scenario(path))
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            failed = True
+    if failed:
+        sys.exit(1)
+    if args.check:
+        print("%d scenario(s) valid" % len(scenarios))
+        return
+    for scenario in scenarios:
+        if args.show:
+            scenario.show()
+            continue
+        t, _, _ = scenario.run()
+        print("%s: %d records to t = %.6g s" % (scenario.source, len(t), t[-1]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Load the simulation scripts as modules so their run() functions can be used headless.
+
+A script's settings are its top-level variables. The scripts read most of them when their
+functions are called, so overrides(module, settings) can change them on the loaded module
+for a while, and run() then uses the new values. read_at_import lists the settings that a
+script only reads while it is imported; changing those afterwards would have no effect.
+"""
+import ast
+import contextlib
+import functools
+import importlib.util
+import os
+import sys
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SIMULATIONS = {
+    "solar_system":     os.path.join("Solar System", "Solar_System.py"),
+    "three_body":       os.path.join("Three Body System", "three-body-system.py"),
+    "orbital_modeling": os.path.join("Orbital Modeling", "orbital-modeling.py"),
+    "multi_moon":       os.path.join("multi-moon", "multi-moon.py"),
+    "kilonova":         os.path.join("kilonovae", "kilonova.py"),
+}
+
+
+def script_path(name):
+    try:
+        return os.path.join(ROOT, SIMULATIONS[name])
+    except KeyError:
+        raise ValueError("Unknown simulation %r, expected one of %s" % (name, sorted(SIMULATIONS)))
+
+
+def _module_level(body):
+    """Statements run at import: the top level and the blocks of top-level if/for/with/try, not defs."""
+    for node in body:
+        yield node
+        if isinstance(node, (ast.If, ast.For, ast.While, ast.With, ast.Try)):
+            for block in ("body", "orelse", "finalbody"):
+                yield from _module_level(getattr(node, block, []))
+            for handler in getattr(node, "handlers", []):
+                yield from _module_level(handler.body)
+
+
+def _assigned(node):
+    """Name set by a plain `name = value` assignment, else None."""
+    if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+        return node.targets[0].id
+    if isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name) and node.value is not None:
+        return node.target.id
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def parse(name):
+    """The syntax tree of a script's source, parsed once."""
+    path = script_path(name)
+    with open(path) as f:
+        return ast.parse(f.read(), path)
+
+
+def script_settings(name):
+    """The settings of a script: {name: default} for every variable it assigns at import.
+
+    The default is the literal value in the source, or None where it is computed.
+    """
+    found = {}
+    for node in _module_level(parse(name).body):
+        variable = _assigned(node)
+        if variable is not None and variable not in found:
+            try:
+                found[variable] = ast.literal_eval(node.value)
+            except (ValueError, TypeError, SyntaxError):
+                found[variable] = None
+    return found
+
+
+def _is_main_block(node):
+    """True for the script's `if __name__ == "__main__":` block, which an import skips."""
+    test = node.test if isinstance(node, ast.If) else None
+    return isinstance(test, ast.Compare) and isinstance(test.left, ast.Name) and test.left.id == "__name__"
+
+
+def _import_time(body):
+    """(line, expression) for every expression evaluated at import: statements outside functions,
+    function defaults and decorators, and class bodies."""
+    for node in body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            for expression in node.args.defaults + node.args.kw_defaults + node.decorator_list:
+                if expression is not None:
+                    yield node.lineno, expression
+        elif isinstance(node, ast.ClassDef):
+            for expression in node.bases + node.decorator_list:
+                yield node.lineno, expression
+            yield from _import_time(node.body)
+        elif isinstance(node, (ast.If, ast.For, ast.While, ast.With, ast.Try)):
+            if _is_main_block(node):
+                continue
+            for field in ("test", "iter", "target", "items"):
+                value = getattr(node, field, None)
+                for expression in (value if isinstance(value, list) else [value]):
+                    if expression is not None:
+                        yield node.lineno, expression
+            for block in ("body", "orelse", "finalbody"):
+                yield from _import_time(getattr(node, block, []))
+            for handler in getattr(node, "handlers", []):
+                yield from _import_time(handler.body)
+        elif not isinstance(node, (ast.Import, ast.ImportFrom)):
+            yield node.lineno, node
+
+
+@functools.lru_cache(maxsize=None)
+def read_at_import(name):
+    """{setting: lines} for the settings a script reads while it is imported.
+
+    Values derived from these at import keep the old setting, so they cannot be overridden.
+    """
+    settings = script_settings(name)
+    found = {}
+    for line, expression in _import_time(parse(name).body):
+        for node in ast.walk(expression):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load) and node.id in settings:
+                found.setdefault(node.id, set()).add(line)
+    return {variable: sorted(lines) for variable, lines in found.items()}
+
+
+def load(name):
+    """Import a simulation script by name, once; importing never opens a figure."""
+    path = script_path(name)
+    module_name = "sleepy_sunrise_" + name
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    folder = os.path.dirname(path)
+    if folder not in sys.path:
+        sys.path.append(folder)  # multi-moon imports moon_dictionary from its own folder
+
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[module_name]
+        raise
+    return module
+
+
+@contextlib.contextmanager
+def overrides(module, settings):
+    """Set the settings ({variable: value}) on a loaded script, and restore them afterwards.
+
+    A list replacing an array setting becomes an array.
+    """
+    missing = [variable for variable in settings if not hasattr(module, variable)]
+    if missing:
+        raise ValueError("%s has no setting %s" % (module.__name__, ", ".join(sorted(missing))))
+    saved = {variable: getattr(module, variable) for variable in settings}
+    try:
+        for variable, value in settings.items():
+            if isinstance(value, list) and isinstance(saved[variable], np.ndarray):
+                value = np.asarray(value, dtype=saved[variable].dtype)
+            setattr(module, variable, value)
+        yield module
+    finally:
+        for variable, value in saved.items():
+            setattr(module, variable, value)
+
+
+def run(name, steps, dt=None, path=None, settings=None):
+    """Shortcut for load(name).run(steps, dt, path=path), with settings overridden for the run."""
+    module = load(name)
+    with overrides(module, settings or {}):
+        return module.run(steps, path=path) if dt is None else module.run(steps, dt, path=path)
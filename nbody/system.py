@@ -0,0 +1,176 @@
+import copy
+
+import numpy as np
+
+from . import kernels
+from .geometry import PairGeometry
+
+# =========================
+# CONSTANTS
+# =========================
+G = 6.67430e-11  # Gravitational constant (m^3 kg^-1 s^-2)
+
+
+# =========================
+# FORCE KERNEL
+# =========================
+def pairwise_acceleration(pos, mass, G=G, interactions=None, targets=None):
+    """Newtonian acceleration on every body from every other body in one pass.
+
+    interactions is an optional (N, N) boolean matrix; body i only feels body j where it is True.
+    targets optionally restricts the result to those bodies (all bodies still act as sources).
+    The work is done by the compiled kernel when Numba is available (see nbody.kernels).
+    """
+    return kernels.pairwise_acceleration(pos, mass, G, interactions, targets)
+
+
+def pairwise_potential(pos, mass, G=G, interactions=None):
+    """Newtonian potential energy of the whole system (one value per member of a batch)."""
+    return kernels.pairwise_potential(pos, mass, G, interactions)
+
+
+# =========================
+# STATE
+# =========================
+class System:
+    """Masses, positions, velocities and accelerations stored as contiguous (N, D) arrays.
+
+    A batched system (see batch) holds M independent copies with arrays of shape (M, N, D);
+    the force kernels and step functions advance every member in the same call.
+    """
+
+    def __init__(self, names, masses, positions, velocities, G=G, interactions=None):
+        self.names = list(names)
+        self.mass = np.array(masses, dtype=float)
+        self.pos = np.array(positions, dtype=float)
+        self.vel = np.array(velocities, dtype=float)
+        self.acc = np.zeros_like(self.pos)
+        self.G = G
+        self.interactions = None if interactions is None else np.array(interactions, dtype=bool)
+        self.t = 0.0
+        self._geometry = None
+        self._index = {name: i for i, name in enumerate(self.names)}
+
+    @classmethod
+    def from_dict(cls, data, **kwargs):
+        """Build a system from a {name: [mass, pos, vel]} table such as planet_data."""
+        names = list(data)
+        masses = [data[name][0] for name in names]
+        positions = [data[name][1] for name in names]
+        velocities = [data[name][2] for name in names]
+        return cls(names, masses, positions, velocities, **kwargs)
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def dim(self):
+        return self.pos.shape[-1]
+
+    @property
+    def members(self):
+        """Number of systems in a batch, or None for a single system."""
+        return self.pos.shape[0] if self.pos.ndim == 3 else None
+
+    def batch(self, pos, vel, mass=None):
+        """A copy of this system holding M states at once, pos and vel of shape (M, N, D).
+
+        mass defaults to the masses of this system, shared by every member; pass an (M, N)
+        array to give each member its own. Accelerations start at zero, as in a new System.
+        """
+        batched = copy.copy(self)
+        batched.pos = np.array(pos, dtype=float)
+        batched.vel = np.array(vel, dtype=float)
+        batched.mass = np.array(self.mass if mass is None else mass, dtype=float)
+        batched.acc = np.zeros_like(batched.pos)
+        batched._geometry = None
+        return batched
+
+    def keep_members(self, keep):
+        """Drop members of a batch in place, keeping those selected by the mask or index keep."""
+        self.pos = self.pos[keep]
+        self.vel = self.vel[keep]
+        self.acc = self.acc[keep]
+        if self.mass.ndim == 2:
+            self.mass = self.mass[keep]
+
+    def index(self, name):
+        return self._index[name]
+
+    def body(self, key):
+        """Return a Body view by name or index."""
+        return Body(self, key if isinstance(key, int) else self.index(key))
+
+    def bodies(self, cls=None):
+        cls = cls or Body
+        return [cls(self, i) for i in range(len(self))]
+
+    def acceleration(self, pos, vel=None, targets=None):
+        """Acceleration of every body (or just targets) for the given state, which is left untouched."""
+        return pairwise_acceleration(pos, self.mass, self.G, self.interactions, targets)
+
+    def geometry(self, pos=None):
+        """PairGeometry of pos (default the current positions), reused until the positions change."""
+        pos = self.pos if pos is None else pos
+        if self._geometry is None or not self._geometry.matches(pos):
+            self._geometry = PairGeometry(pos)
+        return self._geometry
+
+    def potential_energy(self, pos):
+        """Potential energy of the forces in acceleration; override it alongside acceleration."""
+        return self.geometry(pos).potential(self.mass, self.G, self.interactions)
+
+    def compute_acceleration(self, targets=None):
+        """Refresh the cached accelerations, optionally only for the target bodies."""
+        if targets is None:
+            self.acc[...] = self.acceleration(self.pos, self.vel)
+        else:
+            self.acc[..., targets, :] = self.acceleration(self.pos, self.vel, targets)
+        return self.acc
+
+
+class Body:
+    """A named view onto one row of a System; reads and writes go straight to its arrays.
+
+    On a batched system the view covers that body in every member, e.g. pos has shape (M, D).
+    """
+
+    def __init__(self, system, index):
+        self.system = system
+        self.index = index
+
+    @property
+    def name(self):
+        return self.system.names[self.index]
+
+    @property
+    def mass(self):
+        return self.system.mass[..., self.index]
+
+    @mass.setter
+    def mass(self, value):
+        self.system.mass[..., self.index] = value
+
+    @property
+    def pos(self):
+        return self.system.pos[..., self.index, :]
+
+    @pos.setter
+    def pos(self, value):
+        self.system.pos[..., self.index, :] = value
+
+    @property
+    def velocity(self):
+        return self.system.vel[..., self.index, :]
+
+    @velocity.setter
+    def velocity(self, value):
+        self.system.vel[..., self.index, :] = value
+
+    @property
+    def acceleration(self):
+        return self.system.acc[..., self.index, :]
+
+    @acceleration.setter
+    def acceleration(self, value):
+        self.system.acc[..., self.index, :] = value
@@ -0,0 +1,74 @@
+"""Fixed-length position trails for animations.
+
+Points go into a preallocated ring buffer that is written twice, at i and i + length. The
+last n points therefore always sit next to each other in memory, so a trail is read as a
+plain slice: appending is O(1) and plotting needs no copy or reordering.
+"""
+import numpy as np
+
+# reserve never grows a trail's buffer past this many bytes
+MAX_BYTES = 2 ** 27
+
+
+class Trail:
+    """The last length positions of one body, or of several bodies at once.
+
+    With bodies=None points have shape (dim,); otherwise append takes one (bodies, dim) array
+    per frame, e.g. system.pos, so every body's trail advances in a single write.
+    """
+
+    def __init__(self, length, dim=2, bodies=None):
+        self.length = length
+        shape = (dim, 2 * length) if bodies is None else (bodies, dim, 2 * length)
+        self._buffer = np.zeros(shape)
+        self._head = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, point):
+        self._buffer[..., self._head] = point
+        self._buffer[..., self._head + self.length] = point
+        self._head = (self._head + 1) % self.length
+        self.count = min(self.count + 1, self.length)
+
+    def extend(self, points):
+        """Append points stacked along the last axis, oldest first: shape (dim, n) or (bodies, dim, n)."""
+        for k in range(np.shape(points)[-1]):
+            self.append(np.asarray(points)[..., k])
+
+    def reserve(self, length, max_bytes=MAX_BYTES):
+        """Grow to hold at least length points, keeping those stored; returns the new length.
+
+        The buffer at least doubles each time it grows, so a length that creeps up costs few
+        copies, and never passes max_bytes (or shrinks), so length may not be reached.
+        """
+        if length <= self.length:
+            return self.length
+        per_point = self._buffer.nbytes // (2 * self.length)
+        length = min(max(length, 2 * self.length), max_bytes // (2 * per_point))
+        if length > self.length:
+            data = self.data.copy()
+            self._buffer = np.zeros(self._buffer.shape[:-1] + (2 * length,))
+            self.length = length
+            self.clear()
+            self._buffer[..., :data.shape[-1]] = data
+            self._buffer[..., length:length + data.shape[-1]] = data
+            self._head = self.count = data.shape[-1]
+        return self.length
+
+    def clear(self):
+        self._head = 0
+        self.count = 0
+
+    @property
+    def data(self):
+        """Oldest-to-newest view of shape (dim, count), or (bodies, dim, count)."""
+        end = self._head + self.length
+        return self._buffer[..., end - self.count:end]
+
+    def body(self, index, length=None):
+        """View of one body's trail, (dim, n), optionally limited to its newest length points."""
+        data = self.data[index]
+        return data if length is None else data[:, max(0, data.shape[-1] - length):]
@@ -0,0 +1,194 @@
+"""Trajectory files: chunked streaming writes, memory-mapped reads.
+
+A file starts with a small header, then a flat run of fixed-size records, one per body per
+frame, frame after frame:
+
+    magic (8 bytes)  header length (uint64)  JSON header, padded to a 64-byte boundary
+    records          (t, body, x, y, z, vx, vy, vz), float64 except body (int32)
+
+The JSON header holds the body names and masses, dt, the integrator name, the dimension of
+the run and anything else passed to the writer. Systems with D < 3 are padded with zeros.
+Because records have a fixed size, a reader maps the file with np.memmap and only touches
+the pages it indexes, so runs far larger than memory can be post-processed. A run cut short
+mid-write is still readable: a trailing partial frame is ignored. A run resumed from a
+checkpoint reopens its file and carries on after the frames the checkpoint covers.
+"""
+import json
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b"NBODYTRJ"
+VERSION = 1
+RECORD = np.dtype([("t", "<f8"), ("body", "<i4"), ("pos", "<f8", (3,)), ("vel", "<f8", (3,))], align=True)
+
+
+def _step_name(step):
+    return getattr(step, "__name__", type(step).__name__)
+
+
+# =========================
+# WRITER
+# =========================
+class TrajectoryWriter:
+    """Append frames to a trajectory file, buffering chunk frames between writes.
+
+    Use as a context manager, or call close(), which flushes the last partial chunk and
+    returns the file opened as a Trajectory.
+
+    resume (a frame count, see nbody.checkpoint.Checkpointer.frames) reopens the file of an
+    interrupted run instead of starting a new one: its header must match, and only its first
+    resume frames are kept, so the frames written after the checkpoint are replaced.
+    """
+
+    def __init__(self, path, names, mass, dt, integrator=None, dim=3, chunk=1024, resume=None, **metadata):
+        self.path = path
+        self.n_bodies = len(names)
+        self.dim = dim
+        header = dict(metadata, version=VERSION, names=list(names), mass=np.asarray(mass, dtype=float).tolist(),
+                      dt=dt, integrator=integrator, dim=dim)
+        if resume is None:
+            text = json.dumps(header).encode()
+            text += b" " * (-(len(MAGIC) + 8 + len(text)) % 64)
+            self._file = open(path, "wb")
+            self._file.write(MAGIC + struct.pack("<Q", len(text)) + text)
+        else:
+            self._file = self._reopen(header, resume)
+        self._buffer = np.zeros((chunk, self.n_bodies), dtype=RECORD)
+        self._buffer["body"] = np.arange(self.n_bodies)
+        self._filled = 0
+        self.frames = 0 if resume is None else resume
+        self.resumed = resume
+        self.last_t = None
+
+    def _reopen(self, header, frames):
+        """The existing file at self.path, cut to its first frames frames and positioned after them."""
+        existing, offset = read_header(self.path)
+        for key in ("names", "dim", "dt", "integrator"):
+            if existing.get(key) != header[key]:
+                raise ValueError("%s was written by a different run: its %s is %r, not %r"
+                                 % (self.path, key, existing.get(key), header[key]))
+        end = offset + frames * self.n_bodies * RECORD.itemsize
+        if os.path.getsize(self.path) < end:
+            raise ValueError("%s holds fewer than the %d frames to resume from" % (self.path, frames))
+        f = open(self.path, "r+b")
+        f.truncate(end)
+        f.seek(end)
+        return f
+
+    @classmethod
+    def for_system(cls, path, system, dt, step=None, chunk=1024, resume=None, **metadata):
+        """Writer whose header describes system, with the integrator named after step."""
+        integrator = None if step is None else _step_name(step)
+        return cls(path, system.names, system.mass, dt, integrator=integrator, dim=system.dim,
+                   chunk=chunk, resume=resume, **metadata)
+
+    def append(self, t, pos, vel):
+        """Add one frame (pos, vel of shape (N, D)) or several ((K, N, D) with K times)."""
+        t = np.atleast_1d(np.asarray(t, dtype=float))
+        pos = np.reshape(pos, (len(t), self.n_bodies, -1))
+        vel = np.reshape(vel, (len(t), self.n_bodies, -1))
+        done = 0
+        while done < len(t):
+            k = min(len(t) - done, len(self._buffer) - self._filled)
+            rows = self._buffer[self._filled:self._filled + k]
+            rows["t"] = t[done:done + k, np.newaxis]
+            rows["pos"][..., :self.dim] = pos[done:done + k]
+            rows["vel"][..., :self.dim] = vel[done:done + k]
+            self._filled += k
+            done += k
+            if self._filled == len(self._buffer):
+                self.flush()
+        self.last_t = t[-1]
+
+    def flush(self):
+        self._file.write(self._buffer[:self._filled].tobytes())
+        self._file.flush()
+        self.frames += self._filled
+        self._filled = 0
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+        return Trajectory(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_trajectory(path, names, mass, dt, t, pos, vel, integrator=None, **metadata):
+    """Write a whole in-memory trajectory (pos, vel of shape (records, N, D)) in one go."""
+    pos = np.asarray(pos)
+    with TrajectoryWriter(path, names, mass, dt, integrator=integrator, dim=pos.shape[-1], **metadata) as writer:
+        writer.append(t, pos, vel)
+    return Trajectory(path)
+
+
+# =========================
+# READER
+# =========================
+def read_header(path):
+    """The JSON header of a trajectory file and the byte offset of its first record."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("%s is not a trajectory file" % path)
+        length, = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(length))
+    return header, len(MAGIC) + 8 + length
+
+
+class Trajectory:
+    """Memory-mapped view of a trajectory file.
+
+    t, pos and vel are views into the file with shapes (frames,), (frames, N, D) and
+    (frames, N, D); nothing is read until they are indexed. A Trajectory unpacks as
+    t, pos, vel, like the arrays returned by integrate.
+    """
+
+    def __init__(self, path, mode="r"):
+        self.path = path
+        self.header, offset = read_header(path)
+        self.names = self.header["names"]
+        self.mass = np.array(self.header["mass"])
+        self.dt = self.header["dt"]
+        self.integrator = self.header["integrator"]
+        self.dim = self.header["dim"]
+        self._index = {name: i for i, name in enumerate(self.names)}
+
+        frame_size = RECORD.itemsize * len(self.names)
+        frames = (os.path.getsize(path) - offset) // frame_size if frame_size else 0
+        if frames:
+            self.records = np.memmap(path, dtype=RECORD, mode=mode, offset=offset, shape=(frames, len(self.names)))
+        else:
+            self.records = np.zeros((0, len(self.names)), dtype=RECORD)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter((self.t, self.pos, self.vel))
+
+    @property
+    def t(self):
+        return self.records["t"][:, 0]
+
+    @property
+    def pos(self):
+        return self.records["pos"][..., :self.dim]
+
+    @property
+    def vel(self):
+        return self.records["vel"][..., :self.dim]
+
+    def index(self, name):
+        return self._index[name]
+
+    def body(self, key):
+        """(pos, vel) of one body over the whole run, by name or index."""
+        i = key if isinstance(key, int) else self.index(key)
+        return self.pos[:, i], self.vel[:, i]
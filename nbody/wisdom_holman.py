@@ -0,0 +1,92 @@
+"""Wisdom-Holman mixed-variable symplectic step in democratic heliocentric coordinates.
+
+Positions are taken relative to a dominant central body and velocities relative to the
+barycentre. The Hamiltonian then splits into Keplerian motion about the centre, solved
+exactly by nbody.kepler.drift, a small interaction part applied as kicks, and a "jump" from
+the motion of the centre. The step error scales with the planet-to-star mass ratio rather
+than with the full force, so steps can be a sizeable fraction of the shortest orbit.
+"""
+import numpy as np
+
+from .kernels import kepler_drift
+
+
+class WisdomHolman:
+    """Advance a System by dt with a kick-jump-Kepler-jump-kick Wisdom-Holman step.
+
+    Use an instance in place of a step function, e.g. integrate(system, steps, dt, step=WisdomHolman()).
+    central is the index of the dominant body. The kicks apply whatever system.acceleration
+    returns minus the centre's Newtonian pull, so extra forces (oblateness, interaction masks)
+    ride along as perturbations. Like velocity_verlet_step, it expects system.acc to hold the
+    accelerations at the current positions and leaves it updated.
+
+    With fixed_central the centre is an external potential rather than a body that recoils:
+    it moves at constant velocity, the other bodies orbit G * M about it, and there is no
+    jump. Use it when the model holds the centre in place (it feels no pull back).
+    """
+
+    def __init__(self, central=0, fixed_central=False):
+        self.central = central
+        self.fixed_central = fixed_central
+
+    def _kick(self, system, pos, vel, acc, dt):
+        c = self.central
+        others = np.arange(pos.shape[-2]) != c
+        rel = pos[..., others, :] - pos[..., c:c + 1, :]
+        r3 = np.linalg.norm(rel, axis=-1, keepdims=True) ** 3
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pull = -system.G * system.mass[..., c, np.newaxis, np.newaxis] * rel / r3
+        pull[np.broadcast_to(r3 == 0, pull.shape)] = 0.0  # bodies on the centre feel no pull, as in the force kernels
+        vel[..., others, :] += dt * (acc[..., others, :] - pull)
+
+    def _fixed_step(self, system, dt):
+        c = self.central
+        others = np.arange(len(system)) != c
+        v0 = system.vel[..., c:c + 1, :].copy()
+        vel = system.vel - v0
+        self._kick(system, system.pos, vel, system.acc, 0.5 * dt)
+
+        q = system.pos[..., others, :] - system.pos[..., c:c + 1, :]
+        q, v = kepler_drift(q, vel[..., others, :], system.G * system.mass[..., c, np.newaxis], dt)
+        system.pos[..., c:c + 1, :] += v0 * dt
+        system.pos[..., others, :] = q + system.pos[..., c:c + 1, :]
+        vel[..., others, :] = v
+
+        system.compute_acceleration()
+        self._kick(system, system.pos, vel, system.acc, 0.5 * dt)
+        system.vel[..., others, :] = vel[..., others, :] + v0
+
+    def __call__(self, system, dt):
+        if self.fixed_central:
+            return self._fixed_step(system, dt)
+        c = self.central
+        mass = system.mass
+        others = np.arange(len(system)) != c
+        m0 = mass[..., c, np.newaxis]
+        m = mass[..., others, np.newaxis]
+        total = np.sum(mass, axis=-1)[..., np.newaxis]
+        com = np.sum(mass[..., np.newaxis] * system.pos, axis=-2) / total
+        v_com = np.sum(mass[..., np.newaxis] * system.vel, axis=-2) / total
+
+        # Barycentric velocities, kicked by the interaction part
+        vel = system.vel - v_com[..., np.newaxis, :]
+        self._kick(system, system.pos, vel, system.acc, 0.5 * dt)
+
+        # Heliocentric positions: jump, Kepler drift about the centre, jump
+        q = system.pos[..., others, :] - system.pos[..., c:c + 1, :]
+        v = vel[..., others, :]
+        q += 0.5 * dt * np.sum(m * v, axis=-2)[..., np.newaxis, :] / m0[..., np.newaxis]
+        q, v = kepler_drift(q, v, system.G * m0, dt)
+        q += 0.5 * dt * np.sum(m * v, axis=-2)[..., np.newaxis, :] / m0[..., np.newaxis]
+
+        # Back to inertial coordinates; the barycentre moves uniformly
+        com += v_com * dt
+        centre = com - np.sum(m * q, axis=-2) / total
+        system.pos[..., c, :] = centre
+        system.pos[..., others, :] = q + centre[..., np.newaxis, :]
+        vel[..., others, :] = v
+
+        system.compute_acceleration()
+        self._kick(system, system.pos, vel, system.acc, 0.5 * dt)
+        vel[..., c, :] = -np.sum(m * vel[..., others, :], axis=-2) / m0  # zero barycentric momentum
+        system.vel[...] = vel + v_com[..., np.newaxis, :]
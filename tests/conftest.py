@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nbody import System  # noqa: E402
+
+
+def _planets():
+    system = System(
+        ["star", "inner", "outer", "moon"],
+        [1.0, 1e-3, 3e-4, 1e-6],
+        [[0, 0, 0], [1, 0, 0], [0, 2.2, 0.05], [1.01, 0, 0]],
+        [[0, 0, 0], [0, 1, 0], [-0.67, 0, 0], [0, 1.3, 0.01]],
+        G=1.0,
+    )
+    system.compute_acceleration()
+    return system
+
+
+@pytest.fixture
+def make_planets():
+    """Builds a star with two planets and a moon, in units with G = 1; a fresh copy per call."""
+    return _planets
+
+
+@pytest.fixture
+def planets():
+    return _planets()
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from nbody import INTEGRATORS, get_integrator, integrate
+from nbody.blocksteps import BlockTimestepper
+from nbody.checkpoint import Checkpointer
+from nbody.trajectory import Trajectory, TrajectoryWriter
+
+
+STEPPERS = sorted(INTEGRATORS) + ["block"]
+
+
+def make_stepper(name):
+    if name == "block":
+        return BlockTimestepper(max_level=4)
+    return get_integrator(name)
+
+
+@pytest.mark.parametrize("name", STEPPERS)
+def test_resume_is_bit_for_bit(make_planets, tmp_path, name):
+    steps, dt = 40, 0.01
+    straight = make_planets()
+    integrate(straight, steps, dt, step=make_stepper(name), record_every=steps)
+
+    path = str(tmp_path / "run.npz")
+    first = make_planets()
+    integrate(first, steps // 2, dt, step=make_stepper(name), record_every=steps,
+              checkpoint=Checkpointer(path, every_steps=7))
+
+    resumed = make_planets()
+    checkpoint = Checkpointer(path, every_steps=7)
+    remaining = steps - checkpoint.resume(resumed)
+    assert remaining == steps // 2
+    integrate(resumed, remaining, dt, step=make_stepper(name), record_every=steps, checkpoint=checkpoint)
+
+    assert resumed.t == straight.t
+    np.testing.assert_array_equal(resumed.pos, straight.pos)
+    np.testing.assert_array_equal(resumed.vel, straight.vel)
+
+
+def test_adaptive_step_size_is_saved(planets, tmp_path):
+    path = str(tmp_path / "run.npz")
+    step = get_integrator("dop853")
+    integrate(planets, 3, 0.05, step=step, checkpoint=Checkpointer(path, every_steps=1))
+
+    checkpoint = Checkpointer(path)
+    checkpoint.resume(planets)
+    fresh = get_integrator("dop853")
+    checkpoint.track(fresh)
+    assert fresh.h == step.h
+
+
+class Preempted(Exception):
+    pass
+
+
+def preempt_after(steps):
+    count = [0]
+
+    def monitor(system):
+        count[0] += 1
+        if count[0] > steps:
+            raise Preempted
+    return monitor
+
+
+def test_resumed_trajectory_continues_the_file(make_planets, tmp_path):
+    steps, dt = 40, 0.01
+    t, pos, vel = integrate(make_planets(), steps, dt, step=get_integrator("verlet"))
+
+    path, trajectory = str(tmp_path / "run.npz"), str(tmp_path / "run.trj")
+    first = make_planets()
+    writer = TrajectoryWriter.for_system(trajectory, first, dt, step=get_integrator("verlet"), chunk=4)
+    with pytest.raises(Preempted):
+        integrate(first, steps, dt, step=get_integrator("verlet"), writer=writer,
+                  checkpoint=Checkpointer(path, every_steps=10), monitor=preempt_after(25))
+    writer.flush()  # frames past the last checkpoint reach the file
+    assert len(Trajectory(trajectory)) > 21
+
+    resumed = make_planets()
+    checkpoint = Checkpointer(path, every_steps=10)
+    remaining = steps - checkpoint.resume(resumed)
+    assert checkpoint.frames == 20
+    with pytest.raises(ValueError):  # a new file would start partway through the run
+        checkpoint.track(get_integrator("verlet"), TrajectoryWriter.for_system(str(tmp_path / "new.trj"), resumed, dt))
+    writer = TrajectoryWriter.for_system(trajectory, resumed, dt, step=get_integrator("verlet"),
+                                         resume=checkpoint.frames)
+    result = integrate(resumed, remaining, dt, step=get_integrator("verlet"), writer=writer, checkpoint=checkpoint)
+
+    assert len(result) == steps + 1
+    np.testing.assert_array_equal(result.t, t)
+    np.testing.assert_array_equal(result.pos, pos)
+    np.testing.assert_array_equal(result.vel, vel)
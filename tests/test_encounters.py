@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from nbody import System, encounters
+from nbody.encounters import Collisions, candidate_pairs, touching_pairs
+
+
+def brute_force(pos, radius):
+    i, j = np.triu_indices(len(pos), 1)
+    dist = np.linalg.norm(pos[j] - pos[i], axis=-1)
+    touching = dist < radius[i] + radius[j]
+    return set(zip(i[touching].tolist(), j[touching].tolist()))
+
+
+@pytest.mark.parametrize("dim", [2, 3])
+def test_touching_pairs_match_brute_force(dim):
+    rng = np.random.default_rng(dim)
+    pos = rng.uniform(-1, 1, (2000, dim))
+    radius = rng.uniform(0.005, 0.02, len(pos))
+    radius[[3, 700]] = 0.4  # big bodies, tested against everything
+    i, j = touching_pairs(pos, radius)
+    assert np.all(i < j)
+    assert len(set(zip(i.tolist(), j.tolist()))) == len(i)
+    assert set(zip(i.tolist(), j.tolist())) == brute_force(pos, radius)
+
+
+def test_candidate_pairs_include_every_close_pair():
+    rng = np.random.default_rng(1)
+    pos = rng.normal(scale=[1e8, 1.0, 1e-3], size=(3000, 3))  # very uneven extents
+    cell = 0.05
+    i, j = candidate_pairs(pos, cell)
+    candidates = set(zip(i.tolist(), j.tolist()))
+    assert len(candidates) == len(i)
+    assert brute_force(pos, np.full(len(pos), cell / 2)) <= candidates
+
+
+def random_system(n, seed):
+    rng = np.random.default_rng(seed)
+    system = System(range(n), rng.uniform(0.5, 2.0, n), rng.uniform(-1, 1, (n, 3)), rng.normal(size=(n, 3)), G=1.0)
+    return system, rng.uniform(0.01, 0.04, n)
+
+
+def test_hash_and_geometry_agree(monkeypatch):
+    system, radius = random_system(200, 2)
+    collisions = Collisions(radius)
+    collisions.absorbed = np.full(len(system), -1)
+    collisions.absorbed[[5, 17]] = 0
+    direct = collisions.pairs(system)
+    monkeypatch.setattr(encounters, "HASH_BODIES", 0)
+    hashed = collisions.pairs(system)
+    assert len(direct[0])
+    assert set(zip(*map(np.ndarray.tolist, direct))) == set(zip(*map(np.ndarray.tolist, hashed)))
+
+
+def momentum(system):
+    return np.einsum('i,ik->k', system.mass, system.vel)
+
+
+def kinetic_energy(system):
+    return 0.5 * np.einsum('i,ik,ik->', system.mass, system.vel, system.vel)
+
+
+@pytest.mark.parametrize("hash_bodies", [encounters.HASH_BODIES, 0])
+def test_merge_conserves_mass_and_momentum(monkeypatch, hash_bodies):
+    monkeypatch.setattr(encounters, "HASH_BODIES", hash_bodies)
+    system, radius = random_system(300, 3)
+    mass, p = system.mass.sum(), momentum(system)
+    collisions = Collisions(radius, mode="merge")
+    collisions(system)
+    assert collisions.events > 0
+    assert system.mass.sum() == pytest.approx(mass, rel=1e-14)
+    np.testing.assert_allclose(momentum(system), p, rtol=0, atol=1e-12 * np.abs(p).max())
+    absorbed = collisions.absorbed >= 0
+    assert np.all(system.mass[absorbed] == 0)
+    np.testing.assert_array_equal(system.pos[absorbed], system.pos[collisions.absorbed[absorbed]])
+
+
+@pytest.mark.parametrize("hash_bodies", [encounters.HASH_BODIES, 0])
+def test_elastic_bounce_conserves_energy_and_momentum(monkeypatch, hash_bodies):
+    monkeypatch.setattr(encounters, "HASH_BODIES", hash_bodies)
+    system, radius = random_system(300, 4)
+    energy, p = kinetic_energy(system), momentum(system)
+    collisions = Collisions(radius, mode="bounce", restitution=1.0)
+    collisions(system)
+    assert collisions.events > 0
+    assert kinetic_energy(system) == pytest.approx(energy, rel=1e-12)
+    np.testing.assert_allclose(momentum(system), p, rtol=0, atol=1e-12 * np.abs(p).max())
+
+
+def test_bounce_separates_a_head_on_pair():
+    system = System(["a", "b"], [1.0, 3.0], [[0, 0, 0], [0.15, 0, 0]], [[1, 0, 0], [-1, 0, 0]], G=1.0)
+    Collisions(0.1, mode="bounce", restitution=1.0)(system)
+    np.testing.assert_allclose(system.vel, [[-2, 0, 0], [0, 0, 0]])
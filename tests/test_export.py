@@ -0,0 +1,30 @@
+import numpy as np
+from PIL import Image, ImageChops
+
+from nbody.export import export
+
+STYLE = {"names": ["a", "b"], "colors": ["red", "blue"], "sizes": [4, 4], "trail_length": 3,
+         "limits": (-2, 2, -2, 2), "figsize": (2, 2), "dpi": 40}
+
+
+def frames(path):
+    with Image.open(path) as image:
+        found = []
+        for k in range(image.n_frames):
+            image.seek(k)
+            found.append(image.convert("RGB"))
+    return found
+
+
+def test_parallel_export_keeps_the_frame_order(tmp_path):
+    t = np.arange(20.0)
+    angle = 0.3 * t
+    pos = np.stack([np.stack([np.cos(angle), np.sin(angle)], -1), -np.stack([np.cos(angle), np.sin(angle)], -1)], 1)
+    serial, parallel = str(tmp_path / "serial.gif"), str(tmp_path / "parallel.gif")
+    assert export((t, pos, pos), serial, STYLE, processes=1) == 20
+    assert export((t, pos, pos), parallel, STYLE, processes=2, chunk_size=3) == 20
+
+    expected = frames(serial)
+    assert len(expected) == 20
+    for a, b in zip(frames(parallel), expected):
+        assert ImageChops.difference(a, b).getbbox() is None
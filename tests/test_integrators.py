@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+from nbody import System, get_integrator, integrate
+from nbody.adaptive import DOP853, RK45
+from nbody.blocksteps import BlockTimestepper
+from nbody.kepler import drift
+
+
+def binary():
+    """A planet on an inclined, eccentric orbit about a star (G = 1)."""
+    system = System(["star", "planet"], [1.0, 1e-3], [[0, 0, 0], [1, 0, 0]], [[0, 0, 0], [0, 1.2, 0.1]], G=1.0)
+    system.compute_acceleration()
+    return system
+
+
+def relative_error(name, steps, duration=2.0):
+    """Error of the star-planet separation after duration, against the exact Kepler orbit."""
+    system = binary()
+    pos, vel = system.pos[1] - system.pos[0], system.vel[1] - system.vel[0]
+    integrate(system, steps, duration / steps, step=get_integrator(name), record_every=steps)
+    exact, _ = drift(pos, vel, system.G * np.sum(system.mass), duration)
+    return np.linalg.norm(system.pos[1] - system.pos[0] - exact)
+
+
+@pytest.mark.parametrize("name, order, steps", [
+    ("rk4", 4, 20),
+    ("yoshida4", 4, 20),
+    ("yoshida6", 6, 10),
+    ("yoshida8", 8, 8),
+])
+def test_convergence_order(name, order, steps):
+    measured = np.log2(relative_error(name, steps) / relative_error(name, 2 * steps))
+    assert measured == pytest.approx(order, abs=0.5)
+
+
+def energy(system):
+    kinetic = 0.5 * np.sum(system.mass * np.sum(system.vel ** 2, axis=-1))
+    return kinetic + system.potential_energy(system.pos)
+
+
+def test_wisdom_holman_energy_stays_bounded(make_planets):
+    planets = make_planets()
+    system = System(planets.names[:3], planets.mass[:3], planets.pos[:3], planets.vel[:3], G=1.0)
+    system.compute_acceleration()
+    start = energy(system)
+    step = get_integrator("wisdom_holman")
+    errors = []
+    for _ in range(40):  # about 40 orbits of the inner planet, at 20 steps per orbit
+        integrate(system, 20, 2 * np.pi / 20, step=step, record_every=20)
+        errors.append(abs(energy(system) / start - 1))
+    assert max(errors) < 1e-5
+    assert max(errors[20:]) < 2 * max(errors[:20])  # oscillates rather than drifts
+
+
+def test_fixed_central_matches_a_fixed_centre_force_model():
+    """With a centre that feels nothing and bodies that feel only the centre, every step is exact."""
+    interactions = [[False, False, False], [True, False, False], [True, False, False]]
+    system = System(["jupiter", "io", "europa"], [1.0, 1e-5, 2e-5],
+                    [[0.5, 0, 0], [1.5, 0, 0], [0.5, -1.6, 0.1]], [[0.01, 0, 0], [0.01, 0.9, 0], [0.8, 0, 0]],
+                    G=1.0, interactions=interactions)
+    system.compute_acceleration()
+    centre = system.pos[0].copy()
+    pos, vel = system.pos[1:] - system.pos[0], system.vel[1:] - system.vel[0]
+    integrate(system, 3, 1.7, step=get_integrator("wisdom_holman", fixed_central=True), record_every=3)
+
+    exact_pos, exact_vel = drift(pos, vel, 1.0, 3 * 1.7)
+    np.testing.assert_allclose(system.pos[0], centre + 3 * 1.7 * system.vel[0])
+    np.testing.assert_allclose(system.pos[1:] - system.pos[0], exact_pos, atol=1e-12)
+    np.testing.assert_allclose(system.vel[1:] - system.vel[0], exact_vel, atol=1e-12)
+
+
+@pytest.mark.parametrize("cls", [RK45, DOP853])
+def test_adaptive_state_resumes_bit_for_bit(make_planets, cls):
+    straight = make_planets()
+    step = cls()
+    integrate(straight, 6, 0.05, step=step, record_every=6)
+
+    resumed = make_planets()
+    first = cls()
+    integrate(resumed, 3, 0.05, step=first, record_every=3)
+    second = cls()
+    second.load_state(first.state())
+    integrate(resumed, 3, 0.05, step=second, record_every=3)
+
+    assert second.h == step.h
+    np.testing.assert_array_equal(resumed.pos, straight.pos)
+    np.testing.assert_array_equal(resumed.vel, straight.vel)
+
+
+def test_fresh_adaptive_state_loads_as_fresh():
+    step = RK45()
+    step.load_state(RK45().state())
+    assert step.h is None
+
+
+def test_block_levels_are_clamped_at_max_level(planets):
+    stepper = BlockTimestepper(max_level=3)
+    t = planets.t
+    integrate(planets, 1, 1.0, step=stepper)
+
+    assert planets.t == pytest.approx(t + 1.0)
+    assert stepper.levels.max() == 3
+    assert stepper.levels[planets.index("moon")] == 3  # needs far more than 3 levels
+    assert stepper.force_evaluations <= len(planets) * 2 ** 3
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from nbody.kepler import drift, elements_to_state, state_to_elements
+
+MU = 1.3
+
+
+def random_elements(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return (rng.uniform(0.5, 5, count), rng.uniform(0.01, 0.95, count), rng.uniform(0.05, 3.0, count),
+            rng.uniform(-np.pi, np.pi, count), rng.uniform(-np.pi, np.pi, count), rng.uniform(-np.pi, np.pi, count))
+
+
+def test_elements_round_trip():
+    elements = random_elements(50)
+    pos, vel = elements_to_state(*elements, MU)
+    found = state_to_elements(pos, vel, MU)
+    for expected, actual in zip(elements[:3], found[:3]):  # a, e, inc
+        np.testing.assert_allclose(actual, expected, rtol=1e-9)
+    for expected, actual in zip(elements[3:], found[3:]):  # angles, up to whole turns
+        np.testing.assert_allclose(np.angle(np.exp(1j * (actual - expected))), 0, atol=1e-8)
+
+    again = elements_to_state(*found, MU)
+    np.testing.assert_allclose(again[0], pos, rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(again[1], vel, rtol=1e-9, atol=1e-12)
+
+
+def test_state_to_elements_refuses_unbound_orbits():
+    with pytest.raises(ValueError):
+        state_to_elements([1.0, 0, 0], [0, 2.0, 0], 1.0)
+
+
+def test_elliptic_drift_over_a_period_returns_to_the_start():
+    a, e, inc, node, argp, M = random_elements(50, seed=1)
+    pos, vel = elements_to_state(a, e, inc, node, argp, M, MU)
+    period = 2 * np.pi * np.sqrt(a ** 3 / MU)
+    for periods in (1, 3.5):
+        after, after_vel = drift(pos, vel, MU, periods * period)
+        if periods == 1:
+            np.testing.assert_allclose(after, pos, atol=1e-9 * a.max())
+            np.testing.assert_allclose(after_vel, vel, atol=1e-9 * np.abs(vel).max())
+        else:  # half a period on, the body is at the opposite mean anomaly
+            expected = elements_to_state(a, e, inc, node, argp, M + np.pi, MU)
+            np.testing.assert_allclose(after, expected[0], atol=1e-9 * a.max())
+
+
+@pytest.mark.parametrize("speed", [2.0, 3.0])  # escape speed is sqrt(2 MU / r) = 1.61 at r = 1
+def test_unbound_drift_there_and_back(speed):
+    pos = np.array([[1.0, 0, 0], [0, -1.0, 0.2]])
+    vel = np.array([[0.3, speed, 0.1], [speed, 0.2, 0]])
+    out, out_vel = drift(pos, vel, MU, 7.0)
+    back, back_vel = drift(out, out_vel, MU, -7.0)
+    np.testing.assert_allclose(back, pos, atol=1e-10)
+    np.testing.assert_allclose(back_vel, vel, atol=1e-10)
+
+    energy = 0.5 * np.sum(vel ** 2, axis=-1) - MU / np.linalg.norm(pos, axis=-1)
+    energy_out = 0.5 * np.sum(out_vel ** 2, axis=-1) - MU / np.linalg.norm(out, axis=-1)
+    np.testing.assert_allclose(energy_out, energy, rtol=1e-10)
+    np.testing.assert_allclose(np.cross(out, out_vel), np.cross(pos, vel), rtol=1e-10)
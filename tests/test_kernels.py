@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+
+from nbody import kernels
+
+pytestmark = pytest.mark.skipif(not kernels.HAVE_NUMBA, reason="needs numba")
+
+G = 1.3
+
+
+def both(function, *args, **kwargs):
+    """function's result with the NumPy backend and with the numba backend."""
+    previous = kernels.BACKEND
+    try:
+        kernels.set_backend("numpy")
+        expected = function(*args, **kwargs)
+        kernels.set_backend("numba")
+        actual = function(*args, **kwargs)
+    finally:
+        kernels.set_backend(previous)
+    return expected, actual
+
+
+def agree(pair, rtol=1e-12):
+    expected, actual = pair
+    if isinstance(expected, tuple):
+        for e, a in zip(expected, actual):
+            np.testing.assert_allclose(a, e, rtol=rtol, atol=0)
+    else:
+        assert np.shape(actual) == np.shape(expected)
+        np.testing.assert_allclose(actual, expected, rtol=rtol, atol=0)
+
+
+@pytest.fixture
+def bodies():
+    rng = np.random.default_rng(3)
+    pos = rng.normal(size=(12, 3))
+    pos[5] = pos[4]  # coincident bodies exert no force on each other
+    mass = rng.uniform(0.1, 2.0, 12)
+    mask = rng.random((12, 12)) < 0.7
+    return pos, mass, mask
+
+
+def test_acceleration(bodies):
+    pos, mass, _ = bodies
+    agree(both(kernels.pairwise_acceleration, pos, mass, G))
+
+
+def test_acceleration_with_mask(bodies):
+    pos, mass, mask = bodies
+    agree(both(kernels.pairwise_acceleration, pos, mass, G, mask))
+
+
+@pytest.mark.parametrize("targets", [np.array([0, 4, 11]), np.array([7]), np.arange(12) % 2 == 0])
+def test_acceleration_for_targets(bodies, targets):
+    pos, mass, mask = bodies
+    agree(both(kernels.pairwise_acceleration, pos, mass, G, targets=targets))
+    agree(both(kernels.pairwise_acceleration, pos, mass, G, mask, targets))
+
+
+def test_targets_match_the_full_result(bodies):
+    pos, mass, mask = bodies
+    targets = np.array([2, 9])
+    full = kernels.pairwise_acceleration(pos, mass, G, mask)
+    np.testing.assert_allclose(kernels.pairwise_acceleration(pos, mass, G, mask, targets), full[targets],
+                               rtol=1e-12)
+
+
+@pytest.mark.parametrize("masked", [False, True])
+@pytest.mark.parametrize("targets", [None, np.array([1, 3])])
+def test_batch(bodies, masked, targets):
+    pos, mass, mask = bodies
+    rng = np.random.default_rng(4)
+    batch = pos + 0.1 * rng.normal(size=(2, 3) + pos.shape)
+    masses = mass * rng.uniform(0.5, 1.5, (2, 3, len(mass)))
+    mask = mask if masked else None
+    for m in (mass, masses):
+        expected, actual = both(kernels.pairwise_acceleration, batch, m, G, mask, targets)
+        agree((expected, actual))
+        # every member matches the same member computed on its own
+        np.testing.assert_allclose(actual[1, 2],
+                                   kernels.pairwise_acceleration(batch[1, 2], np.broadcast_to(m, batch.shape[:-1])[1, 2],
+                                                                 G, mask, targets), rtol=1e-12)
+
+
+@pytest.mark.parametrize("masked", [False, True])
+def test_potential(bodies, masked):
+    pos, mass, mask = bodies
+    mask = mask if masked else None
+    agree(both(kernels.pairwise_potential, pos, mass, G, mask))
+    batch = np.stack([pos, 2 * pos, pos[::-1]])
+    agree(both(kernels.pairwise_potential, batch, mass, G, mask))
+
+
+def binary():
+    pos = np.array([[1.0, 0.2, 0.0], [-0.8, -0.1, 0.05]])
+    vel = np.array([[0.0, 0.3, 0.01], [0.02, -0.35, 0.0]])
+    return pos, vel, 1.0, 1.4, 0.8, 30.0
+
+
+def test_binary_acceleration():
+    agree(both(kernels.binary_acceleration, *binary()))
+    pos, vel, g, m1, m2, c = binary()
+    agree(both(kernels.binary_acceleration, np.stack([pos, 1.1 * pos]), np.stack([vel, vel]), g,
+               np.array([m1, 2 * m1]), m2, c))
+
+
+def test_binary_rk4_step():
+    pos, vel, g, m1, m2, c = binary()
+    agree(both(kernels.binary_rk4_step, pos, vel, 0.01, g, m1, m2, c))
+    agree(both(kernels.binary_rk4_step, np.stack([pos, 1.1 * pos]), np.stack([vel, vel]), 0.01, g,
+               np.array([m1, 2 * m1]), m2, c))
+
+
+def test_kepler_drift():
+    pos = np.array([[1.0, 0.0, 0.0], [0.0, 2.0, 0.3], [3.0, 0.0, 0.0]])
+    vel = np.array([[0.0, 1.1, 0.0], [-0.6, 0.0, 0.1], [0.0, 2.0, 0.0]])  # elliptic, elliptic, hyperbolic
+    agree(both(kernels.kepler_drift, pos, vel, np.array([1.0, 1.0, 1.0]), 2.7), rtol=1e-9)
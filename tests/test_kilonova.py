@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from nbody import simulations
+
+
+@pytest.fixture
+def kilonova():
+    return simulations.load("kilonova")
+
+
+def test_sweep_starts_at_zero_without_the_fast_forward(kilonova):
+    expected = kilonova.sweep(init_dist=[1e5, 1.1e5], steps=200)
+    with simulations.overrides(kilonova, {"start_separation": 3e5}):
+        t, pos, vel, t_merge = kilonova.sweep(init_dist=[1e5, 1.1e5], steps=200)
+    assert t[0] == 0
+    for a, b in zip((t, pos, vel, t_merge), expected):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_sweep_refuses_period_fraction(kilonova):
+    with simulations.overrides(kilonova, {"period_fraction": 0.02}):
+        with pytest.raises(ValueError):
+            kilonova.sweep(steps=10)
+
+
+def test_templates_match_waveform(kilonova):
+    t, h_plus, h_cross = kilonova.waveform(steps=300)
+    t_batch, h_plus_batch, h_cross_batch, _ = kilonova.templates(steps=300)
+    np.testing.assert_array_equal(t_batch, t)
+    np.testing.assert_allclose(h_plus_batch[:, 0], h_plus, rtol=1e-9, atol=1e-12 * np.abs(h_plus).max())
+    np.testing.assert_allclose(h_cross_batch[:, 0], h_cross, rtol=1e-9, atol=1e-12 * np.abs(h_cross).max())
+
+
+def test_templates_start_at_zero_with_start_separation(kilonova):
+    expected = kilonova.templates(steps=100)
+    with simulations.overrides(kilonova, {"start_separation": 3e5}):
+        templates = kilonova.templates(steps=100)
+    for a, b in zip(templates, expected):
+        np.testing.assert_array_equal(a, b)
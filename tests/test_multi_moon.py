@@ -0,0 +1,9 @@
+from nbody import simulations
+
+
+def test_inner_moons_drift_on_kepler_orbits_only_without_moon_moon_forces():
+    multi_moon = simulations.load("multi_moon")
+    assert len(multi_moon.make_stepper().keplerian) == len(multi_moon.inner)
+    for solver in ("direct", "barnes-hut"):
+        with simulations.overrides(multi_moon, {"SOLVER": solver}):
+            assert len(multi_moon.make_stepper().keplerian) == 0
@@ -0,0 +1,29 @@
+import time
+
+from nbody.profiling import Profiler
+
+
+def test_phase_entered_in_two_places_is_timed_under_each():
+    profiler = Profiler()
+    forces = profiler.phase("forces")
+    with profiler:
+        with forces:  # e.g. a collision merge, outside any step
+            time.sleep(0.01)
+        for _ in range(2):
+            with profiler.phase("step"):
+                with forces:
+                    time.sleep(0.01)
+
+    outer, inner = profiler.phases[("forces",)], profiler.phases[("step", "forces")]
+    assert (outer.calls, inner.calls) == (1, 2)
+    assert profiler.phases[("step",)].total >= inner.total
+    outside = profiler.elapsed - outer.total - profiler.phases[("step",)].total
+    assert outside >= 0
+
+
+def test_disabled_profiler_does_nothing():
+    profiler = Profiler(enabled=False)
+    with profiler, profiler.phase("step"):
+        pass
+    assert profiler.phases == {}
+    assert profiler.report() == ""
@@ -0,0 +1,15 @@
+from nbody.render import FramePacer
+
+
+def test_an_advance_that_ends_the_frame_is_not_a_step():
+    calls = []
+
+    def advance():
+        calls.append(len(calls))
+        return len(calls) == 3  # e.g. a merger found before stepping
+
+    pacer = FramePacer(substeps=5)
+    assert pacer.run(advance) == 2
+    assert pacer.steps == 2
+    assert pacer.run(lambda: None, limit=4) == 4
+    assert pacer.steps == 6
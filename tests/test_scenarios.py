@@ -0,0 +1,41 @@
+import os
+
+import numpy as np
+import pytest
+
+from nbody import simulations
+from nbody.scenarios import Scenario, check, read_scenario
+
+SCENARIOS = os.path.join(simulations.ROOT, "scenarios")
+
+
+@pytest.mark.parametrize("data", [
+    {"simulation": "solar_system", "steps": 10, "settings": {"integrator": "verelt"}},
+    {"simulation": "multi_moon", "steps": 10, "settings": {"PERTURBATIONS": ["j3"]}},
+    {"simulation": "solar_system", "steps": 10, "bodies": ["earth"], "settings": {"zoom": True}},
+    {"simulation": "multi_moon", "steps": 10, "settings": {"VIEW_GALILEAN": True}},
+    {"simulation": "kilonova", "steps": 10, "settings": {"Num_ejecta": 10}},
+])
+def test_check_rejects_settings(data):
+    assert check(data)
+
+
+@pytest.mark.parametrize("name", sorted(os.listdir(SCENARIOS)))
+def test_examples_are_valid(name):
+    assert check(read_scenario(os.path.join(SCENARIOS, name))) == []
+
+
+def test_settings_apply_for_the_run_only():
+    scenario = Scenario({"simulation": "solar_system", "duration": 86400 * 3, "settings": {"zoom": True}})
+    t, pos, _ = scenario.run()
+    assert pos.shape == (4, 5, 2)
+    np.testing.assert_allclose(np.diff(t), 86400)
+    assert simulations.load("solar_system").zoom is False
+
+
+def test_bodies_come_from_the_catalogue():
+    scenario = Scenario({"simulation": "solar_system", "steps": 2, "bodies": ["earth"]})
+    _, pos, _ = scenario.run()
+    assert pos.shape == (3, 2, 2)
+    planet_data = simulations.load("solar_system").planet_data
+    np.testing.assert_array_equal(pos[0], [planet_data["sun"][1], planet_data["earth"][1]])
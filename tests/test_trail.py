@@ -0,0 +1,21 @@
+import numpy as np
+
+from nbody.trail import Trail
+
+
+def test_reserve_keeps_the_newest_points():
+    trail = Trail(3, dim=2, bodies=2)
+    for k in range(5):
+        trail.append(np.full((2, 2), k))
+    assert trail.reserve(4) == 6
+    np.testing.assert_array_equal(trail.data[0, 0], [2, 3, 4])
+    for k in range(5, 10):
+        trail.append(np.full((2, 2), k))
+    np.testing.assert_array_equal(trail.data[1, 1], [4, 5, 6, 7, 8, 9])
+    np.testing.assert_array_equal(trail.body(0, 2)[0], [8, 9])
+
+
+def test_reserve_is_bounded():
+    trail = Trail(10, dim=3)
+    assert trail.reserve(10 ** 9, max_bytes=3 * 8 * 2 * 100) == 100
+    assert trail.reserve(50) == 100
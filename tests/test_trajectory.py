@@ -0,0 +1,54 @@
+import numpy as np
+
+from nbody import get_integrator, integrate
+from nbody.trajectory import Trajectory, TrajectoryWriter, read_header, write_trajectory
+
+
+def test_integrate_streams_the_same_records(make_planets, tmp_path):
+    steps, dt = 50, 0.01
+    t, pos, vel = integrate(make_planets(), steps, dt, step=get_integrator("yoshida4"), record_every=5)
+
+    system = make_planets()
+    path = str(tmp_path / "run.trj")
+    writer = TrajectoryWriter.for_system(path, system, dt, step=get_integrator("yoshida4"), chunk=3, run="test")
+    trajectory = integrate(system, steps, dt, step=get_integrator("yoshida4"), record_every=5, writer=writer)
+
+    assert isinstance(trajectory, Trajectory)
+    assert len(trajectory) == len(t)
+    np.testing.assert_array_equal(trajectory.t, t)
+    np.testing.assert_array_equal(trajectory.pos, pos)
+    np.testing.assert_array_equal(trajectory.vel, vel)
+    assert trajectory.names == system.names
+    np.testing.assert_array_equal(trajectory.mass, system.mass)
+    assert trajectory.dt == dt
+    assert trajectory.integrator == "yoshida4_step"
+    assert trajectory.header["run"] == "test"
+
+
+def test_two_dimensional_round_trip(tmp_path):
+    rng = np.random.default_rng(0)
+    t = np.arange(7) * 0.5
+    pos, vel = rng.normal(size=(2, 7, 3, 2))
+    path = str(tmp_path / "flat.trj")
+    trajectory = write_trajectory(path, ["a", "b", "c"], [1.0, 2.0, 3.0], 0.5, t, pos, vel)
+
+    assert trajectory.dim == 2
+    t_read, pos_read, vel_read = trajectory
+    np.testing.assert_array_equal(t_read, t)
+    np.testing.assert_array_equal(pos_read, pos)
+    np.testing.assert_array_equal(vel_read, vel)
+    np.testing.assert_array_equal(trajectory.body("b")[0], pos[:, 1])
+
+
+def test_partial_frame_is_ignored(tmp_path):
+    t = np.arange(4.0)
+    pos = np.ones((4, 2, 3))
+    path = str(tmp_path / "cut.trj")
+    write_trajectory(path, ["a", "b"], [1.0, 1.0], 1.0, t, pos, pos)
+    _, offset = read_header(path)
+    with open(path, "r+b") as f:
+        f.truncate(offset + 3 * 2 * Trajectory(path).records.itemsize + 10)
+
+    trajectory = Trajectory(path)
+    assert len(trajectory) == 3
+    np.testing.assert_array_equal(trajectory.t, t[:3])